@@ -0,0 +1,76 @@
+"""
+Local backfill throughput (src/backfill.py, LocalBackfill engine) over a synthetic Bronze mirror:
+one gzip NDJSON object per poll, every park in it, for several days. Each concurrency level
+rebuilds the whole range into a fresh output folder.
+
+    PYTHONPATH=.:src:dev python dev/bench_backfill.py
+    PYTHONPATH=.:src:dev python dev/bench_backfill.py --days 30 --parks 40 --concurrency 1 2 4 8
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from local_fakes import MockQueueTimesAPI
+
+
+def write_bronze(root: str, first_day: date, days: int, parks: int, interval_minutes: int) -> int:
+    """Writes the raw objects in the Bronze layout. Returns the number of ride readings."""
+    api = MockQueueTimesAPI(parks=parks)
+    readings = 0
+    start = datetime(first_day.year, first_day.month, first_day.day, tzinfo=timezone.utc)
+    for poll in range(days * 24 * 60 // interval_minutes):
+        minute = start + timedelta(minutes=poll * interval_minutes)
+        lines = []
+        for park_id in range(1, parks + 1):
+            payload = api.queue_times_payload(park_id)
+            payload["park_id"] = park_id
+            readings += len(payload["rides"]) + sum(len(land["rides"]) for land in payload["lands"])
+            lines.append(json.dumps(payload))
+        folder = os.path.join(
+            root, "layer=bronze/source=queue_times",
+            f"year={minute.year}/month={minute.month:02d}/day={minute.day:02d}/hour={minute.hour:02d}/minute={minute.minute:02d}"
+        )
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "part-00000.json.gz"), "wb") as f:
+            f.write(gzip.compress("\n".join(lines).encode("utf-8")))
+    return readings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=8)
+    parser.add_argument("--parks", type=int, default=20)
+    parser.add_argument("--interval-minutes", type=int, default=15)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        first_day = date(2026, 1, 5)
+        last_day = first_day + timedelta(days=args.days - 1)
+        readings = write_bronze(os.path.join(root, "data"), first_day, args.days, args.parks, args.interval_minutes)
+        print(f"{args.days} days, {args.parks} parks every {args.interval_minutes} min: {readings:,} ride readings, {os.cpu_count()} CPU(s)")
+
+        # Imported after the mirror exists so the worker processes share the settings
+        from backfill import Backfill, LocalBackfill
+
+        baseline = None
+        for concurrency in args.concurrency:
+            output_dir = os.path.join(root, f"silver_{concurrency}")
+            engine = LocalBackfill(data_dir=os.path.join(root, "data"), output_dir=output_dir)
+            backfill = Backfill(engine, first_day, last_day, concurrency=concurrency, checkpoint_path=os.path.join(output_dir, "checkpoint.json"))
+            start = time.perf_counter()
+            report = backfill.run(replace_table=True)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(
+                f"  concurrency {concurrency:>2}: {seconds:6.2f}s, {report['rows'] / seconds:>10,.0f} rows/s, "
+                f"{report['shards'] / seconds * 60:6.1f} shards/min, speedup {baseline / seconds:4.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
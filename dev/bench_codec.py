@@ -0,0 +1,71 @@
+"""
+Per-payload cost of the ingestion hot path with the typed codec (shared/queue_times_codec.py)
+against the previous dict path: json.loads of the body, a sorted json.dumps for the content hash
+and a second json.dumps for the NDJSON line. Payloads come from the mock API, at several park sizes.
+
+    PYTHONPATH=.:src:dev python dev/bench_codec.py
+    PYTHONPATH=.:src:dev python dev/bench_codec.py --rides-per-land 5 20 50 --iterations 5000
+"""
+import argparse
+import hashlib
+import json
+import time
+from typing import Callable, Dict
+
+from local_fakes import MockQueueTimesAPI
+from shared.park_state import payload_hash
+from shared.queue_times_codec import decode_queue_times
+
+
+def dict_path(content: bytes, park_id: int) -> bytes:
+    data = json.loads(content)
+    hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+    data["park_id"] = park_id
+    return (json.dumps(data) + "\n").encode("utf-8")
+
+
+def typed_path(content: bytes, park_id: int) -> bytes:
+    payload = decode_queue_times(content, park_id)
+    payload_hash(payload.ndjson_line())
+    return payload.ndjson_line()
+
+
+def per_call(function: Callable[[], object], iterations: int) -> float:
+    """Best of 3 rounds, microseconds per call."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rides-per-land", type=int, nargs="+", default=[3, 10, 25])
+    parser.add_argument("--lands", type=int, default=6)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"  {'rides':>6}{'bytes':>8}{'dict us':>10}{'typed us':>10}{'speedup':>9}{'decode us':>11}{'encode us':>11}")
+    for rides_per_land in args.rides_per_land:
+        api = MockQueueTimesAPI(parks=1, lands_per_park=args.lands, rides_per_land=rides_per_land)
+        raw: Dict = api.queue_times_payload(1)
+        content = json.dumps(raw).encode("utf-8")
+
+        # Same records in Bronze: the typed line decodes to the dict the old path wrote
+        assert json.loads(typed_path(content, 1)) == json.loads(dict_path(content, 1))
+
+        rides = len(raw["rides"]) + sum(len(land["rides"]) for land in raw["lands"])
+        dict_us = per_call(lambda: dict_path(content, 1), args.iterations)
+        typed_us = per_call(lambda: typed_path(content, 1), args.iterations)
+        decode_us = per_call(lambda: decode_queue_times(content, 1), args.iterations)
+        payload = decode_queue_times(content, 1)
+        # Bypasses the cache to time one encoding
+        encode_us = per_call(lambda: type(payload).__pydantic_serializer__.to_json(payload), args.iterations)
+        print(f"  {rides:>6}{len(content):>8,}{dict_us:>10.1f}{typed_us:>10.1f}{dict_us / typed_us:>8.2f}x{decode_us:>11.1f}{encode_us:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Bronze -> Silver rides flattening of the local backend (src/local_transformation.py): the Arrow JSON reader
+and list unnest of LocalTransformation.load_rides against flattening every payload into Python dicts
+with flatten_queue_times_payload. The minute objects are written from the mock API into a temporary mirror.
+
+    PYTHONPATH=.:src:dev python dev/bench_local_transformation.py
+    PYTHONPATH=.:src:dev python dev/bench_local_transformation.py --parks 500 --runs 24
+"""
+import argparse
+import gzip
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from local_fakes import MockQueueTimesAPI
+from local_transformation import QUEUE_TIMES_PREFIX, LocalTransformation
+from shared.queue_times_records import RIDE_COLUMNS, decode_bronze_object, flatten_queue_times_payload, parse_minute_partition
+
+
+def write_mirror(root: Path, parks: int, runs: int) -> None:
+    api = MockQueueTimesAPI(parks=parks)
+    lines = "\n".join(json.dumps(dict(api.queue_times_payload(park_id), park_id=park_id)) for park_id in range(1, parks + 1))
+    content = gzip.compress(lines.encode("utf-8"))
+    # One object per 5 minute run
+    for run in range(runs):
+        path = root / QUEUE_TIMES_PREFIX / f"year=2025/month=11/day={1 + run // 288:02d}/hour={run // 12 % 24:02d}/minute={run % 12 * 5:02d}/part-00000.json.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+
+def record_path(transformer: LocalTransformation) -> pd.DataFrame:
+    records = []
+    for path in transformer._bronze_files(QUEUE_TIMES_PREFIX, "*.json*"):
+        minute = parse_minute_partition(path.as_posix())
+        for payload in decode_bronze_object(path.name, path.read_bytes()):
+            records.extend(flatten_queue_times_payload(payload, minute))
+    return pd.DataFrame.from_records(records, columns=list(RIDE_COLUMNS)).astype(RIDE_COLUMNS)
+
+
+def best_of(function: Callable[[], pd.DataFrame], rounds: int = 3) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parks", type=int, default=100)
+    parser.add_argument("--runs", type=int, nargs="+", default=[12, 48, 288])
+    args = parser.parse_args()
+
+    print(f"  {'objects':>8}{'rows':>12}{'records s':>11}{'arrow s':>9}{'speedup':>9}{'arrow rows/s':>14}")
+    for runs in args.runs:
+        with tempfile.TemporaryDirectory() as root:
+            write_mirror(Path(root), args.parks, runs)
+            transformer = LocalTransformation(data_dir=root)
+
+            # Same frame from both paths
+            rows = transformer.load_rides()
+            pd.testing.assert_frame_equal(rows, record_path(transformer))
+
+            records_s = best_of(lambda: record_path(transformer))
+            arrow_s = best_of(transformer.load_rides)
+            print(f"  {runs:>8}{len(rows):>12,}{records_s:>11.2f}{arrow_s:>9.2f}{records_s / arrow_s:>8.1f}x{len(rows) / arrow_s:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
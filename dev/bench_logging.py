@@ -0,0 +1,81 @@
+"""
+Caller-side cost of the logging modes: what the event loop pays per record.
+
+Each mode logs bursts of per-park records (one DEBUG line for the file, one INFO line for the
+file and the console), then waits for the listener to drain, as the loop does while it awaits
+the API. Reported per record: the CPU time of the calling thread and the wall time the loop is
+blocked. --sink-latency-us makes every console write block that long (e.g. a log agent applying
+backpressure on stdout). Log files go to a temporary directory.
+
+    PYTHONPATH=. python dev/bench_logging.py --records 20000
+    PYTHONPATH=. python dev/bench_logging.py --records 5000 --sink-latency-us 200
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Dict
+
+
+class SlowSink(io.StringIO):
+    """Console stream whose writes block like a full pipe."""
+    def __init__(self, latency_us: float) -> None:
+        super().__init__()
+        self.latency = latency_us / 1e6
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return len(text)
+
+
+async def log_bursts(logger: logging.Logger, records: int, burst: int) -> Dict[str, float]:
+    """Logs the per-park lines of the ingestion hot path, returns the caller cost per record."""
+    from tools.logger import _log_queue, log_context
+
+    blocked = cpu = 0.0
+    for first in range(0, records, burst):
+        start, start_cpu = time.perf_counter(), time.thread_time()
+        for park_id in range(first, min(first + burst, records)):
+            with log_context(park_id=park_id):
+                logger.debug("Fetching URL: %s", f"https://queue-times.com/parks/{park_id}/queue_times.json")
+                logger.info("Park %s: %s rides", park_id, 19)
+        blocked += time.perf_counter() - start
+        cpu += time.thread_time() - start_cpu
+        # The loop awaits the network while the listener writes
+        while not _log_queue.empty():
+            await asyncio.sleep(0.005)
+    lines = 2 * records
+    return {"cpu_us": cpu / lines * 1e6, "blocked_us": blocked / lines * 1e6}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000, help="parks logged (two records each)")
+    parser.add_argument("--burst", type=int, default=500, help="parks logged between two awaits")
+    parser.add_argument("--sink-latency-us", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # Read when tools.logger is imported: keep the benchmark's files out of the repository
+    log_dir = tempfile.mkdtemp(prefix="bench_logging_")
+    os.environ["LOG_DIR"] = log_dir
+    console, sys.stdout = sys.stdout, SlowSink(args.sink_latency_us)
+    try:
+        from tools.logger import get_logger
+        # Both loggers are built with the slow console
+        loggers = {mode: get_logger(f"bench_logging.{mode}", mode=mode) for mode in ("sync", "queue")}
+        results = {mode: asyncio.run(log_bursts(logger, args.records, args.burst)) for mode, logger in loggers.items()}
+    finally:
+        sys.stdout = console
+
+    for mode, result in results.items():
+        print(f"{mode:>5}: {result['cpu_us']:8.2f} us CPU, {result['blocked_us']:8.2f} us blocked per record on the event loop")
+    print(f"(console sink latency {args.sink_latency_us:.0f} us, log files under {log_dir})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+End-to-end benchmark of DataOrchestration.run_pipeline without network or cloud:
+mock queue-times API, filesystem bucket and the local transformation backend, or with
+--backend bigquery the BigQuery transform DAG against a local client (SQL rendered and
+jobs submitted and polled, but not executed; the Silver and Gold tables already exist,
+so the run takes the incremental path).
+Each scenario runs in its own process so the peak RSS is its own.
+
+    PYTHONPATH=.:src python dev/bench_pipeline.py
+    PYTHONPATH=.:src python dev/bench_pipeline.py --parks 1000 --backend bigquery --job-latency-ms 2000
+    PYTHONPATH=.:src python dev/bench_pipeline.py --parks 100 1000 10000 --latency-ms 20 --error-rate 0.01
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+
+def run_scenario(parks: int, latency_ms: float, error_rate: float, backend: str, job_latency_ms: float) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="park_bench_")
+    # The settings are read at import time: configure the run before importing the pipeline
+    os.environ.update({
+        "PARK_STATE_BACKEND": "local",
+        "PARK_STATE_PATH": f"{workdir}/state/park_state.json",
+        "POLLING_SCHEDULER": "false",
+        "TRANSFORM_BACKEND": "local",
+        "LOCAL_DOWNLOAD_BRONZE": "false",
+        "METRICS_DIR": f"{workdir}/metrics",
+        "METRICS_GCS_PREFIX": "",
+        "LOG_MODE": os.environ.get("LOG_MODE", "queue"),
+        "LOG_RATE_LIMIT": os.environ.get("LOG_RATE_LIMIT", "5"),
+    })
+
+    import asyncio
+    from data_ingestion import DataIngestion
+    from data_orchestration import DataOrchestration
+    from data_ingestion import settings
+    from local_fakes import LocalBigQueryClient, LocalGCSHandler, MockQueueTimesAPI
+
+    api = MockQueueTimesAPI(parks=parks, latency_ms=latency_ms, error_rate=error_rate)
+    gcs = LocalGCSHandler(f"{workdir}/bucket")
+
+    class NoTransformation:
+        async def run_dag(self, full_rebuild=None) -> None:
+            pass
+
+    bigquery = None
+    if backend == "local":
+        from local_transformation import LocalTransformation
+        transformer = LocalTransformation(data_dir=str(gcs.root), output_dir=f"{workdir}/silver")
+    elif backend == "bigquery":
+        from data_transformation import DataTransformation
+        bigquery = LocalBigQueryClient(f"{workdir}/bigquery", job_latency_ms, tables=[
+            f"{settings.GCP_PROJECT_ID}.{settings.DERIVED_DATASET}.{settings.QUEUE_TIMES_SILVER_TABLE}",
+            f"{settings.GCP_PROJECT_ID}.{settings.GOLD_DATASET}.{settings.GOLD_RIDE_HOURLY_TABLE}",
+        ])
+        transformer = DataTransformation(client=bigquery)
+    else:
+        transformer = NoTransformation()
+    orchestrator = DataOrchestration(DataIngestion(gcs=gcs), transformer=transformer, http_transport=api.transport())
+
+    start = time.perf_counter()
+    asyncio.run(orchestrator.run_pipeline())
+    wall = time.perf_counter() - start
+
+    # Each run has its own metrics, read back from its report
+    report = json.loads(next(Path(f"{workdir}/metrics").glob("run_*.json")).read_text())
+    ingestion_seconds = report["stages_seconds"].get("ingestion", wall)
+    gcs.clear()
+    return {
+        "parks": parks,
+        "latency_ms": latency_ms,
+        "error_rate": error_rate,
+        "parks_written": report["counters"].get("parks_written", 0),
+        "parks_per_second": report["counters"].get("parks_written", 0) / ingestion_seconds if ingestion_seconds else 0.0,
+        "wall_seconds": wall,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages_seconds": report["stages_seconds"],
+        "fetch_seconds": report["histograms"].get("fetch_seconds", {}),
+        "api_requests": api.requests,
+        "bigquery_jobs": bigquery.jobs if bigquery else 0,
+    }
+
+
+def _run_in_child(queue: multiprocessing.Queue, *args: Any) -> None:
+    queue.put(run_scenario(*args))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parks", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-transform", action="store_true", help="Skip the Silver transformation")
+    parser.add_argument("--backend", choices=["local", "bigquery"], default="local", help="Transformation backend")
+    parser.add_argument("--job-latency-ms", type=float, default=1000.0, help="Duration of each BigQuery job (--backend bigquery)")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for parks in args.parks:
+        queue = context.Queue()
+        process = context.Process(target=_run_in_child, args=(queue, parks, args.latency_ms, args.error_rate, "none" if args.no_transform else args.backend, args.job_latency_ms))
+        process.start()
+        result = queue.get()
+        process.join()
+        results.append(result)
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result["stages_seconds"].items())
+        print(
+            f"{parks:>6} parks: {result['parks_per_second']:8.1f} parks/s, "
+            f"peak RSS {result['peak_rss_mb']:7.1f} MB, {stages}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
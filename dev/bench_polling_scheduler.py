@@ -0,0 +1,66 @@
+"""
+Requests avoided by the polling scheduler (src/polling_scheduler.py) over one day of runs, compared with
+polling every park every run. Parks are spread over the mock API timezones. Learned profiles are synthetic:
+open 9:00-22:00 local time, changing often only around midday (busy parks) or never (quiet parks).
+Also reports the plan without any profile (default opening hours) and the planning time per run.
+
+    PYTHONPATH=.:src:dev python dev/bench_polling_scheduler.py
+    PYTHONPATH=.:src:dev python dev/bench_polling_scheduler.py --parks 5000 --busy-ratio 0.5
+"""
+import argparse
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from data_ingestion import settings
+from local_fakes import MockQueueTimesAPI
+from polling_scheduler import ParkProfile, estimate_savings, extract_park_timezones, plan_polling
+
+
+def synthetic_profiles(park_ids, busy_ratio: float, seed: int = 42) -> Dict[int, ParkProfile]:
+    generator = random.Random(seed)
+    profiles = {}
+    for park_id in park_ids:
+        busy = generator.random() < busy_ratio
+        profiles[park_id] = ParkProfile(
+            open_ratio={hour: 0.95 if 9 <= hour < 22 else 0.0 for hour in range(24)},
+            change_ratio={hour: 0.6 if busy and 11 <= hour < 18 else 0.1 for hour in range(24)},
+        )
+    return profiles
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parks", type=int, default=1000)
+    parser.add_argument("--busy-ratio", type=float, default=0.3)
+    args = parser.parse_args()
+
+    timezones = extract_park_timezones(MockQueueTimesAPI(parks=args.parks).parks_payload())
+    profiles = synthetic_profiles(timezones, args.busy_ratio)
+    start = datetime(2026, 1, 5, tzinfo=timezone.utc)
+    runs = 24 * 60 // settings.POLL_INTERVAL_MINUTES
+
+    print(f"{args.parks} parks in {len(set(timezones.values()))} timezones, {runs} runs/day (every {settings.POLL_INTERVAL_MINUTES} min)")
+    for name, scenario_profiles in [("learned profiles", profiles), ("default hours", {})]:
+        begin = time.perf_counter()
+        savings = estimate_savings(timezones, scenario_profiles, start, runs)
+        seconds = time.perf_counter() - begin
+
+        tiers: Counter = Counter()
+        for index in range(runs):
+            now = start + timedelta(minutes=index * settings.POLL_INTERVAL_MINUTES)
+            tiers.update({tier: len(ids) for tier, ids in plan_polling(timezones, scenario_profiles, now).items()})
+
+        avoided = savings["baseline_calls"] - savings["planned_calls"]
+        print(
+            f"  {name:<17} {savings['planned_calls']:>9,} / {savings['baseline_calls']:,} requests, "
+            f"{avoided:>9,} avoided ({savings['saved_ratio']:.1%}), "
+            f"polled per tier: {', '.join(f'{tier} {count:,}' for tier, count in tiers.items())}, "
+            f"plan {seconds / runs * 1000:.2f} ms/run"
+        )
+
+
+if __name__ == "__main__":
+    main()
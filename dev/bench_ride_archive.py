@@ -0,0 +1,122 @@
+"""
+Size and decode speed of the ride history archive (shared/ride_history_archive.py)
+against the Bronze formats it replaces for history reads: one gzip NDJSON object per poll
+(the raw layout) and the compacted Parquet files. Data is synthetic: waits in steps of 5 minutes
+changing on ~25% of the polls, parks closed at night.
+
+    PYTHONPATH=.:src python dev/bench_ride_archive.py
+    PYTHONPATH=.:src python dev/bench_ride_archive.py --rides 2000 --days 14 --interval-minutes 5
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from shared.queue_times_records import RIDE_COLUMNS, decode_bronze_object, flatten_queue_times_payload
+from shared.ride_history_archive import RideHistoryArchive
+
+
+def synthetic_polls(rides: int, days: int, interval_minutes: int, rides_per_park: int, seed: int = 42) -> Tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
+    """Wait times and open flags of shape (polls, rides)."""
+    generator = np.random.default_rng(seed)
+    times = pd.date_range("2026-01-05", periods=days * 24 * 60 // interval_minutes, freq=f"{interval_minutes}min", tz="UTC")
+    steps = np.where(generator.random((len(times), rides)) < 0.25, generator.choice([-5, 5], (len(times), rides)), 0)
+    wait_times = np.clip(np.cumsum(steps, axis=0) + generator.choice(np.arange(5, 60, 5), rides), 0, 180)
+    hours = times.hour.to_numpy()[:, None]
+    is_open = (hours >= 8) & (hours < 22) & np.ones((1, rides), dtype=bool)
+    # Parks report 0 for closed rides
+    return times, np.where(is_open, wait_times, 0), is_open
+
+
+def bronze_objects(times: pd.DatetimeIndex, wait_times: np.ndarray, is_open: np.ndarray, rides_per_park: int) -> List[bytes]:
+    """One gzip NDJSON object per poll, one line per park, shaped like the Queue Times payload."""
+    objects = []
+    for poll, timestamp in enumerate(times):
+        updated = (timestamp - pd.Timedelta(minutes=1)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        lines = []
+        for first in range(0, wait_times.shape[1], rides_per_park):
+            park_id = first // rides_per_park + 1
+            rides = [
+                {"id": 1000 + ride, "name": f"Ride {1000 + ride}", "is_open": bool(is_open[poll, ride]),
+                 "wait_time": int(wait_times[poll, ride]), "last_updated": updated}
+                for ride in range(first, min(first + rides_per_park, wait_times.shape[1]))
+            ]
+            lines.append(json.dumps({"park_id": park_id, "lands": [{"id": park_id * 10, "name": "Main Street", "rides": rides}], "rides": []}))
+        objects.append(gzip.compress("\n".join(lines).encode("utf-8")))
+    return objects
+
+
+def decode_ndjson(objects: List[bytes], times: pd.DatetimeIndex) -> pd.DataFrame:
+    """What LocalTransformation.load_rides does with the raw objects."""
+    records: List[Dict[str, Any]] = []
+    for timestamp, content in zip(times, objects):
+        for payload in decode_bronze_object("part-00000.json.gz", content):
+            records.extend(flatten_queue_times_payload(payload, timestamp.to_pydatetime()))
+    return pd.DataFrame.from_records(records, columns=list(RIDE_COLUMNS)).astype(RIDE_COLUMNS)
+
+
+def timed(function, *args, **kwargs) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rides", type=int, default=500)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--interval-minutes", type=int, default=5)
+    parser.add_argument("--rides-per-park", type=int, default=40)
+    args = parser.parse_args()
+
+    times, wait_times, is_open = synthetic_polls(args.rides, args.days, args.interval_minutes, args.rides_per_park)
+    objects = bronze_objects(times, wait_times, is_open, args.rides_per_park)
+    raw_bytes = sum(len(gzip.decompress(content)) for content in objects)
+    gzip_bytes = sum(len(content) for content in objects)
+
+    rides, ndjson_seconds = timed(decode_ndjson, objects, times)
+    rows = len(rides)
+
+    buffer = io.BytesIO()
+    rides.to_parquet(buffer, index=False, compression="snappy")
+    parquet_bytes = len(buffer.getvalue())
+    _, parquet_seconds = timed(pd.read_parquet, io.BytesIO(buffer.getvalue()))
+
+    archive, encode_seconds = timed(RideHistoryArchive.from_readings, rides, max_gap_seconds=3 * args.interval_minutes * 60)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.npz")
+        archive.save(path)
+        archive_bytes = os.path.getsize(path)
+        loaded, load_seconds = timed(RideHistoryArchive.load, path)
+    series, series_seconds = timed(loaded.regular_series, f"{args.interval_minutes}min")
+    _, runs_seconds = timed(loaded.runs)
+
+    # The regular series must give back every poll (rides are stored in ride_id order)
+    order = np.argsort(series["ride_ids"])
+    assert len(series["times"]) == len(times)
+    assert np.array_equal(series["wait_time"][order].T, wait_times)
+    assert np.array_equal(series["state"][order].T == 1, is_open)
+
+    print(f"{rows / 1e6:.2f}M readings ({args.rides} rides, {args.days} days every {args.interval_minutes} min), {loaded.run_count} runs ({rows / loaded.run_count:.1f} readings/run)")
+    print(f"  {'format':<22}{'bytes':>14}{'vs NDJSON':>11}{'vs gzip':>9}{'decode':>9}{'M rows/s':>10}")
+    for name, size, seconds in [
+        ("NDJSON", raw_bytes, None),
+        ("NDJSON gzip (Bronze)", gzip_bytes, ndjson_seconds),
+        ("Parquet (compacted)", parquet_bytes, parquet_seconds),
+        ("archive -> grid", archive_bytes, load_seconds + series_seconds),
+        ("archive -> runs", archive_bytes, load_seconds + runs_seconds),
+    ]:
+        decode = f"{seconds:8.3f}s{rows / seconds / 1e6:10.2f}" if seconds is not None else f"{'':>19}"
+        print(f"  {name:<22}{size:>14,}{raw_bytes / size:>10.1f}x{gzip_bytes / size:>8.1f}x{decode}")
+    print(f"  archive encode {encode_seconds:.3f}s ({rows / encode_seconds / 1e6:.2f}M rows/s)")
+
+
+if __name__ == "__main__":
+    main()
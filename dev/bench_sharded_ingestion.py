@@ -0,0 +1,96 @@
+"""
+Scaling of the sharded ingestion (src/sharded_ingestion.py) with the local process pool:
+the same parks are ingested by 1, 2, 4... worker processes against the mock API and a
+filesystem bucket. The transformation is replaced by a counter file, which also checks
+that the coordinator triggers it exactly once per run. Wall time only scales with the cores
+available; the total CPU time shows the work is split, not repeated, across the workers.
+
+    PYTHONPATH=.:src:dev python dev/bench_sharded_ingestion.py
+    PYTHONPATH=.:src:dev python dev/bench_sharded_ingestion.py --parks 5000 --workers 1 2 4 8 --latency-ms 20
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+
+def bench_worker(assignment) -> None:
+    """Pool worker: the real shard run, with the mock API and the local bucket of the benchmark."""
+    import asyncio
+    from data_ingestion import DataIngestion
+    from data_orchestration import DataOrchestration
+    from local_fakes import LocalGCSHandler, MockQueueTimesAPI
+    from sharded_ingestion import configure_shard
+
+    workdir = os.environ["BENCH_WORKDIR"]
+
+    class CountingTransformation:
+        async def run_dag(self, full_rebuild=None) -> None:
+            with open(os.path.join(workdir, "transformations"), "a") as f:
+                f.write(f"{assignment.run_id}\n")
+
+    configure_shard(assignment.index)
+    api = MockQueueTimesAPI(parks=int(os.environ["BENCH_PARKS"]), latency_ms=float(os.environ["BENCH_LATENCY_MS"]), seed=assignment.index)
+    orchestrator = DataOrchestration(
+        DataIngestion(gcs=LocalGCSHandler(os.path.join(workdir, "bucket"))),
+        transformer=CountingTransformation(),
+        http_transport=api.transport(),
+        shard=assignment
+    )
+    asyncio.run(orchestrator.run_pipeline())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parks", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    print(f"{args.parks} parks, mock latency {args.latency_ms:.0f} ms, {os.cpu_count()} CPU(s)")
+    baseline = None
+    for workers in args.workers:
+        workdir = tempfile.mkdtemp(prefix=f"shard_bench_{workers}_")
+        # Read by the spawned workers when they import the settings
+        os.environ.update({
+            "BENCH_WORKDIR": workdir,
+            "BENCH_PARKS": str(args.parks),
+            "BENCH_LATENCY_MS": str(args.latency_ms),
+            "PARK_STATE_BACKEND": "local",
+            "PARK_STATE_PATH": f"{workdir}/state/park_state.json",
+            "POLLING_SCHEDULER": "false",
+            "METRICS_DIR": f"{workdir}/metrics",
+            "METRICS_GCS_PREFIX": "",
+            "LOG_MODE": os.environ.get("LOG_MODE", "queue"),
+            "LOG_RATE_LIMIT": os.environ.get("LOG_RATE_LIMIT", "5"),
+        })
+        from sharded_ingestion import run_local_pool
+
+        cpu_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        failed = run_local_pool(workers, worker=bench_worker)
+        wall = time.perf_counter() - start
+        cpu_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = (cpu_after.ru_utime + cpu_after.ru_stime) - (cpu_before.ru_utime + cpu_before.ru_stime)
+
+        reports = [json.loads(path.read_text()) for path in Path(workdir, "metrics").glob("run_*.json")]
+        shard_parks = [report["counters"].get("parks_polled", 0) for report in reports]
+        written = sum(report["counters"].get("parks_written", 0) for report in reports)
+        ingestion = max(report["stages_seconds"].get("ingestion", 0.0) for report in reports)
+        counter = Path(workdir, "transformations")
+        transformations = counter.read_text().splitlines() if counter.exists() else []
+        objects = list(Path(workdir, "bucket", "layer=bronze", "source=queue_times").rglob("*.json.gz"))
+        baseline = baseline or wall
+        print(
+            f"  {workers:>2} worker(s): {written}/{args.parks} parks in {wall:6.2f}s wall ({written / wall:7.1f} parks/s, "
+            f"speedup {baseline / wall:4.2f}x), slowest shard ingestion {ingestion:5.2f}s, "
+            f"largest shard {max(shard_parks) / (sum(shard_parks) / workers):4.2f}x the mean, CPU {cpu:5.2f}s, "
+            f"{len(objects)} object(s), {len(transformations)} transformation(s), {failed} failed"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Cold start of the ingestion job, each run in a fresh interpreter:
+time to import the entry point, and time from process launch to the first API request
+(imports, settings, clients, bucket check and park state load included).
+The API is mocked and the bucket is a local folder, so only startup work is measured.
+
+    PYTHONPATH=.:src python dev/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+# Runs in the child: prints the timings as JSON and exits on the first queue-times/parks request
+CHILD = """
+import json, os, sys, time
+launched = float(sys.argv[1])
+import asyncio
+import httpx
+from data_orchestration import DataOrchestration
+from data_ingestion import DataIngestion
+from local_fakes import LocalGCSHandler
+imported = time.time()
+
+def first_request(request):
+    print(json.dumps({"import_seconds": imported - launched, "first_request_seconds": time.time() - launched}), flush=True)
+    os._exit(0)
+
+orchestrator = DataOrchestration(DataIngestion(gcs=LocalGCSHandler(sys.argv[2])), http_transport=httpx.MockTransport(first_request))
+asyncio.run(orchestrator.run_pipeline())
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def child_env(workdir: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "PARK_STATE_BACKEND": "local",
+        "PARK_STATE_PATH": f"{workdir}/park_state.json",
+        "POLLING_SCHEDULER": "false",
+        "METRICS_DIR": f"{workdir}/metrics",
+        "METRICS_GCS_PREFIX": "",
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.dirname(__file__), os.environ.get("PYTHONPATH")])),
+    }
+
+
+def time_to_first_request(workdir: str) -> Dict[str, float]:
+    launched = time.time()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, str(launched), f"{workdir}/bucket"],
+        env=child_env(workdir), capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def heaviest_imports(module: str, workdir: str, limit: int) -> Tuple[float, List[Tuple[str, float]]]:
+    """Total import time of `module` and its heaviest direct imports (cumulative seconds), from -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=child_env(workdir), capture_output=True, text=True, check=True
+    ).stderr
+    total, direct = 0.0, []
+    for match in IMPORT_LINE.finditer(stderr):
+        cumulative, depth, name = int(match.group(2)) / 1e6, len(match.group(3)), match.group(4)
+        if name == module and depth == 1:
+            total = cumulative
+        elif depth == 3:
+            direct.append((name, cumulative))
+    return total, sorted(direct, key=lambda item: item[1], reverse=True)[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="data_orchestration")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="park_startup_")
+    runs = [time_to_first_request(workdir) for _ in range(args.runs)]
+    total, imports = heaviest_imports(args.module, workdir, args.top)
+
+    results = {
+        "import_seconds": statistics.median(run["import_seconds"] for run in runs),
+        "first_request_seconds": statistics.median(run["first_request_seconds"] for run in runs),
+        "importtime_seconds": total,
+        "heaviest_imports": dict(imports),
+    }
+    print(f"median over {args.runs} runs: imports done {results['import_seconds']:.3f}s, first request {results['first_request_seconds']:.3f}s after launch")
+    print(f"-X importtime {args.module}: {total:.3f}s, heaviest imports:")
+    for name, seconds in imports:
+        print(f"  {seconds:7.3f}s  {name}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Timings of src/trend_analysis.py on synthetic Silver data, pinned to one core.
+
+    PYTHONPATH=.:src python dev/bench_trend_analysis.py
+    PYTHONPATH=.:src python dev/bench_trend_analysis.py --rides 500 2000 5000 --days 14 --interval-minutes 5
+"""
+import os
+
+# One core: no BLAS/OpenMP threads behind NumPy
+for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(variable, "1")
+
+import argparse
+import resource
+import time
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+import trend_analysis
+from local_fakes import TIMEZONES
+
+
+def synthetic_silver(rides: int, days: int, interval_minutes: int, rides_per_park: int = 40, seed: int = 42) -> pd.DataFrame:
+    """Readings of every ride every interval_minutes, with a daily cycle, closed nights and noise."""
+    generator = np.random.default_rng(seed)
+    times = pd.date_range("2026-01-05", periods=days * 24 * 60 // interval_minutes, freq=f"{interval_minutes}min", tz="UTC")
+    n = rides * len(times)
+
+    ride_index = np.repeat(np.arange(rides), len(times))
+    hours = np.tile(times.hour.to_numpy(), rides)
+    base = np.repeat(generator.uniform(5, 60, rides), len(times))
+    wait_times = np.clip(base * (1 + np.sin((hours - 9) / 24 * 2 * np.pi)) + generator.normal(0, 5, n), 0, None)
+    is_open = (hours >= 8) & (hours < 22) & (generator.random(n) > 0.02)
+
+    return pd.DataFrame({
+        "timestamp": np.tile(times.to_numpy(), rides),
+        "park_id": ride_index // rides_per_park + 1,
+        "ride_id": ride_index + 1000,
+        "is_open": is_open,
+        "wait_time": np.round(wait_times).astype(np.int64),
+    })
+
+
+def timed(function: Callable, *args) -> Tuple[object, float]:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run(rides: int, days: int, interval_minutes: int, freq: str) -> Dict[str, float]:
+    silver = synthetic_silver(rides, days, interval_minutes)
+    timezones = {park_id: TIMEZONES[park_id % len(TIMEZONES)] for park_id in silver["park_id"].unique()}
+
+    timings = {}
+    grid, timings["grid"] = timed(trend_analysis.build_grid, silver, freq)
+    slots_per_hour = int(pd.Timedelta("1h") / pd.Timedelta(freq))
+    _, timings["rolling_p90"] = timed(trend_analysis.rolling_percentile, grid, 4 * slots_per_hour, 0.9)
+    cells, timings["cells"] = timed(trend_analysis.slot_cells, grid, timezones)
+    profile, timings["profile"] = timed(trend_analysis.seasonal_profile, grid, cells)
+    _, timings["week_over_week"] = timed(trend_analysis.week_over_week, grid)
+    _, timings["anomalies"] = timed(trend_analysis.anomaly_scores, grid, cells, profile)
+    timings["total"] = sum(timings.values())
+    timings["rows"] = len(silver)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rides", type=int, nargs="+", default=[500, 2000, 5000])
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--interval-minutes", type=int, default=5)
+    parser.add_argument("--freq", default="15min", help="Grid resolution")
+    args = parser.parse_args()
+
+    for rides in args.rides:
+        timings = run(rides, args.days, args.interval_minutes, args.freq)
+        rows = timings.pop("rows")
+        total = timings.pop("total")
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+        print(
+            f"{rides:>5} rides, {rows / 1e6:6.2f}M rows: {total:6.2f}s ({rows / total / 1e6:5.2f}M rows/s), "
+            f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:7.1f} MB | {steps}"
+        )
+
+
+if __name__ == "__main__":
+    main()
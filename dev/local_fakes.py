@@ -0,0 +1,294 @@
+"""
+Local stand-ins for the benchmark harness: a mock queue-times API served through
+httpx.MockTransport and filesystem-backed replacements of GCSHandler / BigQueryHandler
+and of the BigQuery client used by DataTransformation.
+"""
+import asyncio
+import gzip
+import json
+import random
+import re
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from tools.metrics import get_metrics
+
+metrics = get_metrics()
+
+TIMEZONES = ["Europe/Paris", "America/New_York", "America/Los_Angeles", "Asia/Tokyo", "Australia/Sydney"]
+
+
+class MockQueueTimesAPI:
+    """
+    Serves synthetic parks.json and parks/{id}/queue_times.json payloads.
+    Latency is drawn around latency_ms, error_rate of the park requests answer 500 or 429.
+    """
+    def __init__(
+        self,
+        parks: int,
+        latency_ms: float = 50.0,
+        error_rate: float = 0.0,
+        lands_per_park: int = 4,
+        rides_per_land: int = 8,
+        seed: int = 42
+    ) -> None:
+        self.parks = parks
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.lands_per_park = lands_per_park
+        self.rides_per_land = rides_per_land
+        self.random = random.Random(seed)
+        self.requests = 0
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def parks_payload(self) -> List[Dict[str, Any]]:
+        # Companies of 10 parks, like the groups of the real parks.json
+        return [
+            {
+                "id": company,
+                "name": f"Company {company}",
+                "parks": [
+                    {
+                        "id": park_id,
+                        "name": f"Park {park_id}",
+                        "country": "Nowhere",
+                        "continent": "Europe",
+                        "latitude": "48.8",
+                        "longitude": "2.3",
+                        "timezone": TIMEZONES[park_id % len(TIMEZONES)],
+                    }
+                    for park_id in range(company * 10 + 1, min(company * 10 + 10, self.parks) + 1)
+                ],
+            }
+            for company in range((self.parks + 9) // 10)
+        ]
+
+    def queue_times_payload(self, park_id: int) -> Dict[str, Any]:
+        def ride(ride_id: int) -> Dict[str, Any]:
+            wait_time = self.random.choice([0, 5, 10, 15, 20, 30, 45, 60, 90])
+            return {
+                "id": ride_id,
+                "name": f"Ride {ride_id}",
+                "is_open": wait_time > 0,
+                "wait_time": wait_time,
+                "last_updated": "2025-11-22T14:03:00.000Z",
+            }
+
+        base = park_id * 1000
+        return {
+            "lands": [
+                {
+                    "id": base + land,
+                    "name": f"Land {land}",
+                    "rides": [ride(base + land * 50 + index) for index in range(self.rides_per_land)],
+                }
+                for land in range(self.lands_per_park)
+            ],
+            "rides": [ride(base + 999)],
+        }
+
+    @staticmethod
+    def json_response(data: Any) -> httpx.Response:
+        # Streamed like a network response, so the client counts its bytes (num_bytes_downloaded)
+        body = json.dumps(data).encode("utf-8")
+        return httpx.Response(200, headers={"Content-Type": "application/json"}, stream=httpx.ByteStream(body))
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency_ms, self.latency_ms / 4)) / 1000)
+
+        parts = request.url.path.strip("/").split("/")
+        if parts == ["parks.json"]:
+            return self.json_response(self.parks_payload())
+        if len(parts) == 3 and parts[0] == "parks" and parts[2] == "queue_times.json":
+            park_id = int(parts[1])
+            if park_id > self.parks:
+                return httpx.Response(404)
+            if self.random.random() < self.error_rate:
+                if self.random.random() < 0.5:
+                    return httpx.Response(429, headers={"Retry-After": "1"})
+                return httpx.Response(500)
+            return self.json_response(self.queue_times_payload(park_id))
+        return httpx.Response(404)
+
+
+class LocalGCSHandler:
+    """Same async interface as GCSHandler, objects are files under `root`."""
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self.bucket_name = self.root.name
+
+    def _path(self, path: str) -> Path:
+        return self.root / path
+
+    def _write(self, path: str, content: bytes) -> None:
+        target = self._path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        metrics.increment("gcs_bytes_uploaded", len(content))
+
+    async def create_bucket_if_not_exists(self, location: str = "EU") -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    async def upload_json_data(self, path: str, data: Any, compress: bool = False) -> None:
+        if isinstance(data, list):
+            content = "\n".join([json.dumps(record) for record in data])
+        else:
+            content = json.dumps(data)
+        encoded = content.encode("utf-8")
+        self._write(path, gzip.compress(encoded) if compress else encoded)
+
+    async def upload_bytes(self, path: str, content: bytes, content_type: str) -> None:
+        self._write(path, content)
+
+    async def create_if_absent(self, path: str, content: bytes, content_type: str) -> bool:
+        target = self._path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(target, "xb") as f:
+                f.write(content)
+        except FileExistsError:
+            return False
+        return True
+
+    async def list_blob_names(self, prefix: str) -> List[str]:
+        folder = self._path(prefix)
+        if folder.is_file():
+            # A prefix naming one object lists that object, as in GCS
+            return [prefix]
+        if not folder.exists():
+            return []
+        return sorted(file.relative_to(self.root).as_posix() for file in folder.rglob("*") if file.is_file())
+
+    async def list_blob_versions(self, prefix: str) -> Dict[str, Tuple[int, int]]:
+        # The modification time stands in for the object generation
+        versions = {}
+        for name in await self.list_blob_names(prefix):
+            stat = self._path(name).stat()
+            versions[name] = (stat.st_mtime_ns, stat.st_size)
+        return versions
+
+    async def download_bytes(self, path: str) -> bytes:
+        return self._path(path).read_bytes()
+
+    async def download_text(self, path: str) -> Optional[str]:
+        file = self._path(path)
+        return file.read_text() if file.exists() else None
+
+    async def delete_if_generation(self, path: str, generation: int) -> bool:
+        file = self._path(path)
+        try:
+            if file.stat().st_mtime_ns != generation:
+                return False
+            file.unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+    async def delete_blobs(self, paths: List[str]) -> None:
+        for path in paths:
+            self._path(path).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class LocalBigQueryHandler:
+    """Same interface as BigQueryHandler, the DDL statements are only recorded."""
+    def __init__(self, project_id: str = "local", location: str = "EU") -> None:
+        self.project_id = project_id
+        self.location = location
+        self.datasets: List[str] = []
+        self.statements: List[str] = []
+
+    def create_dataset_if_not_exists(self, dataset_id: str) -> None:
+        if dataset_id not in self.datasets:
+            self.datasets.append(dataset_id)
+
+    def execute_ddl(self, ddl: str) -> None:
+        self.statements.append(ddl)
+
+    def create_external_table_via_sql(self, dataset_id: str, table_id: str, **options: Any) -> None:
+        self.execute_ddl(f"CREATE OR REPLACE EXTERNAL TABLE {dataset_id}.{table_id} {options}")
+
+
+# Tables a statement writes to (the SQL templates quote their destination)
+WRITTEN_TABLE = re.compile(r"(?:CREATE (?:OR REPLACE )?TABLE(?: IF NOT EXISTS)?|MERGE|INSERT INTO)\s+`([^`]+)`")
+WATERMARK_QUERY = re.compile(r"SELECT MAX\(\w+\) AS watermark FROM `([^`]+)`")
+
+
+class LocalQueryJob:
+    """A query job that completes latency seconds after it was submitted."""
+    def __init__(self, rows: List[Any], latency: float) -> None:
+        self.rows = rows
+        self.done_at = time.monotonic() + latency
+        self.total_bytes_processed = 0
+        self.slot_millis = int(latency * 1000)
+
+    def done(self) -> bool:
+        return time.monotonic() >= self.done_at
+
+    def result(self) -> List[Any]:
+        time.sleep(max(0.0, self.done_at - time.monotonic()))
+        return self.rows
+
+
+class LocalBigQueryClient:
+    """
+    Stands in for bigquery.Client in DataTransformation: the rendered SQL of every job is
+    written under root/jobs and the tables it writes are recorded in root/tables.json with
+    the time of the write (used as their watermark). Queries are not executed.
+    """
+    def __init__(self, root: str, job_latency_ms: float = 0.0, tables: Optional[List[str]] = None) -> None:
+        self.root = Path(root)
+        (self.root / "jobs").mkdir(parents=True, exist_ok=True)
+        self.job_latency = job_latency_ms / 1000
+        self.datasets: List[str] = []
+        self.jobs = 0
+        self.tables: Dict[str, str] = {}
+        if (self.root / "tables.json").exists():
+            self.tables = json.loads((self.root / "tables.json").read_text())
+        for table_id in tables or []:
+            self._write_table(table_id)
+
+    def _write_table(self, table_id: str) -> None:
+        self.tables[table_id] = datetime.now(timezone.utc).isoformat()
+        (self.root / "tables.json").write_text(json.dumps(self.tables, indent=2))
+
+    def get_dataset(self, dataset_id: str) -> Any:
+        from google.api_core.exceptions import NotFound
+        if dataset_id not in self.datasets:
+            raise NotFound(f"Dataset {dataset_id}")
+        return SimpleNamespace(dataset_id=dataset_id)
+
+    def create_dataset(self, dataset: Any) -> Any:
+        self.datasets.append(f"{dataset.project}.{dataset.dataset_id}")
+        return dataset
+
+    def get_table(self, table_id: str) -> Any:
+        from google.api_core.exceptions import NotFound
+        if table_id not in self.tables:
+            raise NotFound(f"Table {table_id}")
+        return SimpleNamespace(table_id=table_id, num_rows=0)
+
+    def query(self, sql: str) -> LocalQueryJob:
+        from google.api_core.exceptions import NotFound
+        self.jobs += 1
+        watermark = WATERMARK_QUERY.search(sql)
+        if watermark:
+            if watermark.group(1) not in self.tables:
+                raise NotFound(f"Table {watermark.group(1)}")
+            return LocalQueryJob([SimpleNamespace(watermark=datetime.fromisoformat(self.tables[watermark.group(1)]))], 0.0)
+
+        (self.root / "jobs" / f"{self.jobs:05d}.sql").write_text(sql)
+        for table_id in WRITTEN_TABLE.findall(sql):
+            self._write_table(table_id)
+        return LocalQueryJob([], self.job_latency)
@@ -15,7 +15,8 @@ WITH PARTITION COLUMNS (
 )
 OPTIONS (
   format = 'NEWLINE_DELIMITED_JSON',
-  uris = ['gs://amusement-park-datalake-v1/layer=bronze/source=queue_times/*'],
+  uris = ['gs://amusement-park-datalake-v1/layer=bronze/source=queue_times/*.json.gz'],
   hive_partition_uri_prefix = 'gs://amusement-park-datalake-v1/layer=bronze/source=queue_times/',
+  compression = 'GZIP',
   ignore_unknown_values = TRUE
 );
\ No newline at end of file
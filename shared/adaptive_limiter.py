@@ -0,0 +1,109 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from statistics import quantiles
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header (delay in seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter for outgoing API requests.
+    The limit grows by one slot per window of fast successful requests and is cut by
+    decrease_factor on rate limiting, server errors or slow responses (at most once per window).
+    A Retry-After sent by the server pauses every new request until it expires.
+    """
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        decrease_factor: float = 0.5,
+        history_size: int = 1000
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latencies: Deque[float] = deque(maxlen=history_size)
+        self._condition = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        """Current number of requests allowed in flight."""
+        return int(self._limit)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Holds one in-flight slot for the duration of a request."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        try:
+            delay = self.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        if latency > self.latency_target:
+            self._decrease("slow response")
+            return
+        # Additive increase: +1 slot once `limit` requests succeeded
+        # Waiters are woken up by the next released slot
+        self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+
+    def on_overload(self, latency: float, retry_after: Optional[float] = None) -> None:
+        """Called on 429 / 5xx responses."""
+        self.latencies.append(latency)
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        self._decrease("overloaded server")
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        # Requests already in flight when the limit was cut must not cut it again
+        if now - self.last_decrease < self.latency_target:
+            return
+        self.last_decrease = now
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        logger.debug("Concurrency limit decreased to %s (%s)", self.limit, reason)
+
+    def stats(self) -> Dict[str, float]:
+        """Current limit and latency percentiles (seconds) of the recent requests."""
+        stats: Dict[str, float] = {"limit": self.limit, "in_flight": self.in_flight, "requests": len(self.latencies)}
+        if len(self.latencies) >= 2:
+            cuts = quantiles(self.latencies, n=100)
+            stats.update({"latency_p50": cuts[49], "latency_p95": cuts[94], "latency_p99": cuts[98]})
+        return stats
@@ -44,15 +44,21 @@ class BigQueryHandler:
         gcs_bucket: str,
         gcs_path_prefix: str,
         data_schema: str,      # SQL definition for data cols: "id INT64, name STRING"
-        partition_schema: str  # SQL definition for partition cols: "year STRING, month STRING"
+        partition_schema: str, # SQL definition for partition cols: "year STRING, month STRING"
+        file_pattern: str = "*", # Object name pattern under the prefix, e.g. "*.json.gz"
+        compression: Optional[str] = None, # e.g. "GZIP" for compressed NDJSON
+        file_format: str = "NEWLINE_DELIMITED_JSON" # or "PARQUET" for compacted files
     ) -> None:
         """
         Creates an external table using Raw SQL DDL.
         This allows strict separation of Data Columns vs Partition Columns.
         """
         full_table_id = f"{self.project_id}.{dataset_id}.{table_id}"
-        uri = f"gs://{gcs_bucket}/{gcs_path_prefix}*"
+        uri = f"gs://{gcs_bucket}/{gcs_path_prefix}{file_pattern}"
         hive_prefix = f"gs://{gcs_bucket}/{gcs_path_prefix}"
+        compression_option = f"compression = '{compression}'," if compression else ""
+        # Self-describing formats (Parquet) do not accept this option
+        unknown_values_option = ",\n            ignore_unknown_values = TRUE" if file_format == "NEWLINE_DELIMITED_JSON" else ""
         
         # Construct the SQL Statement exactly as it worked in the console
         ddl = f"""
@@ -64,10 +70,10 @@ class BigQueryHandler:
             {partition_schema}
         )
         OPTIONS (
-            format = 'NEWLINE_DELIMITED_JSON',
+            format = '{file_format}',
             uris = ['{uri}'],
-            hive_partition_uri_prefix = '{hive_prefix}',
-            ignore_unknown_values = TRUE
+            {compression_option}
+            hive_partition_uri_prefix = '{hive_prefix}'{unknown_values_option}
         );
         """
         
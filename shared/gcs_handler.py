@@ -1,14 +1,20 @@
-from google.cloud import storage
-from google.api_core.exceptions import Conflict
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import contextvars
+import functools
+import gzip
 import json
-from typing import Any, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 
 from tools.logger import get_logger
+from tools.metrics import get_metrics
 
 # Initialize the logger for this module
 logger = get_logger(__name__)
+metrics = get_metrics()
 
 class GCSHandler:
     """
@@ -17,24 +23,59 @@ class GCSHandler:
     
     """
     
-    def __init__(self, project_id: str, bucket_name: str) -> None:
+    def __init__(self, project_id: str, bucket_name: str, max_workers: Optional[int] = None) -> None:
         self.project_id = project_id
         self.bucket_name = bucket_name
-        self.client = storage.Client(project=self.project_id)
-        self.bucket = self.client.bucket(self.bucket_name)
+        self.max_workers = max_workers
+        
+        # Dedicated pool so uploads do not compete with other executor work (None: asyncio default pool)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcs") if max_workers else None
+        
+        # The storage client (heavy import, credentials lookup) is only built on first use,
+        # which happens in an executor thread
+        self._client = None
+        self._bucket = None
+        self._client_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from google.cloud import storage
+                    client = storage.Client(project=self.project_id)
+                    if self.max_workers:
+                        import requests
+                        # Keep one pooled HTTPS connection per worker thread (requests defaults to 10)
+                        adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+                        client._http.mount("https://", adapter)
+                    self._bucket = client.bucket(self.bucket_name)
+                    self._client = client
+        return self._client
+    
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            self.client
+        return self._bucket
+    
+    async def _run(self, func, *args: Any) -> Any:
+        """Runs a blocking call in the pool, in the caller's context (run metrics, log fields)."""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(context.run, func, *args))
         
     async def create_bucket_if_not_exists(self, location: str = "EU") -> None:
         """
         Creates the bucket if it does not exist
         """
-        loop = asyncio.get_running_loop()
         # Run blocking network call in a thread
-        await loop.run_in_executor(None, self._create_bucket_sync, location)
+        await self._run(self._create_bucket_sync, location)
         
     def _create_bucket_sync(self, location: str) -> None:
+        from google.api_core.exceptions import Conflict
         try:
             if not self.bucket.exists():
-                self.bucket = self.client.create_bucket(self.bucket_name, location=location)
+                self._bucket = self.client.create_bucket(self.bucket_name, location=location)
                 logger.info(f"Bucket {self.bucket_name} created in {location}")
             else:
                 logger.info(f"Bucket {self.bucket_name} already exists")
@@ -45,14 +86,13 @@ class GCSHandler:
             logger.error(f"Failed to create bucket: {e}")
             raise e
     
-    async def upload_json_data(self, path: str, data: Any) -> None:
+    async def upload_json_data(self, path: str, data: Any, compress: bool = False) -> None:
         """
         Uploads data (Dict or List) as NDJSON (Newline Delimited JSON) to GCS.
         This is the preferred format for BigQuery.
+        With compress=True the object is stored gzip-compressed (BigQuery reads it with compression = 'GZIP').
         """
         
-        loop = asyncio.get_running_loop()
-        
         # Prepare the received data
         if isinstance(data, list): # List handling
             # Convert list to NDJSON
@@ -61,13 +101,139 @@ class GCSHandler:
             content = json.dumps(data)
         
         # Upload
-        await loop.run_in_executor(None, self._upload_string_sync, path, content)
+        if compress:
+            # Compression is CPU bound, keep it off the event loop together with the upload
+            await self._run(self._upload_gzip_sync, path, content)
+        else:
+            await self._run(self._upload_string_sync, path, content)
+    
+    def _timed_upload(self, path: str, content: Union[str, bytes], content_type: str) -> None:
+        start = time.perf_counter()
+        self.bucket.blob(path).upload_from_string(content, content_type=content_type)
+        metrics.observe("gcs_upload_seconds", time.perf_counter() - start)
+        metrics.increment("gcs_bytes_uploaded", len(content.encode("utf-8") if isinstance(content, str) else content))
     
     def _upload_string_sync(self, path: str, content: str) -> None:
         try:
-            blob = self.bucket.blob(path)
-            blob.upload_from_string(content, content_type="application/x-ndjson")
+            self._timed_upload(path, content, content_type="application/x-ndjson")
         
         except Exception as e:
             logger.error(f"Failed to upload to {path}: {e}")
-            raise e
\ No newline at end of file
+            raise e
+    
+    def _upload_gzip_sync(self, path: str, content: str) -> None:
+        try:
+            # No Content-Encoding header: the object must stay compressed at rest and on read
+            self._timed_upload(path, gzip.compress(content.encode("utf-8")), content_type="application/gzip")
+        
+        except Exception as e:
+            logger.error(f"Failed to upload to {path}: {e}")
+            raise e
+    
+    async def list_blob_names(self, prefix: str) -> List[str]:
+        """
+        Lists the names of the objects under a prefix.
+        """
+        return await self._run(self._list_blob_names_sync, prefix)
+    
+    def _list_blob_names_sync(self, prefix: str) -> List[str]:
+        return [blob.name for blob in self.client.list_blobs(self.bucket_name, prefix=prefix)]
+    
+    async def list_blob_versions(self, prefix: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Lists the objects under a prefix with their (generation, size).
+        The generation changes whenever an object is rewritten.
+        """
+        return await self._run(self._list_blob_versions_sync, prefix)
+    
+    def _list_blob_versions_sync(self, prefix: str) -> Dict[str, Tuple[int, int]]:
+        return {blob.name: (blob.generation, blob.size) for blob in self.client.list_blobs(self.bucket_name, prefix=prefix)}
+    
+    async def download_bytes(self, path: str) -> bytes:
+        """
+        Downloads an object as raw bytes (compressed objects are returned as stored).
+        """
+        return await self._run(self._download_bytes_sync, path)
+    
+    def _download_bytes_sync(self, path: str) -> bytes:
+        try:
+            start = time.perf_counter()
+            content = self.bucket.blob(path).download_as_bytes()
+            metrics.observe("gcs_download_seconds", time.perf_counter() - start)
+            metrics.increment("gcs_bytes_downloaded", len(content))
+            return content
+        except Exception as e:
+            logger.error(f"Failed to download {path}: {e}")
+            raise e
+    
+    async def download_text(self, path: str) -> Optional[str]:
+        """
+        Downloads a small text object (e.g. a state file). Returns None when it does not exist.
+        """
+        return await self._run(self._download_text_sync, path)
+    
+    def _download_text_sync(self, path: str) -> Optional[str]:
+        from google.api_core.exceptions import NotFound
+        try:
+            return self.bucket.blob(path).download_as_text()
+        except NotFound:
+            return None
+        except Exception as e:
+            logger.error(f"Failed to download {path}: {e}")
+            raise e
+    
+    async def upload_bytes(self, path: str, content: bytes, content_type: str) -> None:
+        """
+        Uploads already encoded content (e.g. Parquet files) to GCS.
+        """
+        await self._run(self._upload_bytes_sync, path, content, content_type)
+    
+    def _upload_bytes_sync(self, path: str, content: bytes, content_type: str) -> None:
+        try:
+            self._timed_upload(path, content, content_type=content_type)
+        except Exception as e:
+            logger.error(f"Failed to upload to {path}: {e}")
+            raise e
+    
+    async def create_if_absent(self, path: str, content: bytes, content_type: str) -> bool:
+        """
+        Creates an object only if it does not exist yet (generation precondition).
+        Returns False when another writer created it first: usable as a one-time claim.
+        """
+        return await self._run(self._create_if_absent_sync, path, content, content_type)
+    
+    def _create_if_absent_sync(self, path: str, content: bytes, content_type: str) -> bool:
+        from google.api_core.exceptions import PreconditionFailed
+        try:
+            self.bucket.blob(path).upload_from_string(content, content_type=content_type, if_generation_match=0)
+            return True
+        except PreconditionFailed:
+            return False
+    
+    async def delete_if_generation(self, path: str, generation: int) -> bool:
+        """
+        Deletes an object only if it is still at this generation (generation precondition).
+        Returns False when it was rewritten or deleted in the meantime.
+        """
+        return await self._run(self._delete_if_generation_sync, path, generation)
+    
+    def _delete_if_generation_sync(self, path: str, generation: int) -> bool:
+        from google.api_core.exceptions import NotFound, PreconditionFailed
+        try:
+            self.bucket.blob(path).delete(if_generation_match=generation)
+            return True
+        except (NotFound, PreconditionFailed):
+            return False
+    
+    async def delete_blobs(self, paths: List[str]) -> None:
+        """
+        Deletes a list of objects.
+        """
+        await self._run(self._delete_blobs_sync, paths)
+    
+    def _delete_blobs_sync(self, paths: List[str]) -> None:
+        # Batch requests are limited to 100 calls each
+        for start in range(0, len(paths), 100):
+            with self.client.batch():
+                for path in paths[start:start + 100]:
+                    self.bucket.blob(path).delete()
@@ -0,0 +1,144 @@
+import bisect
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit hash (Python's hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """
+    Assigns parks to workers on a hash ring with virtual nodes. Every process computes
+    the same assignment without talking to the others, and changing the worker count
+    only moves about 1/N of the parks, so most workers keep their change detection state.
+    """
+    def __init__(self, workers: int, virtual_nodes: int = 128) -> None:
+        if workers < 1:
+            raise ValueError(f"A ring needs at least one worker, got {workers}")
+        self.workers = workers
+        points = sorted(
+            (_hash(f"worker-{worker}-{node}"), worker)
+            for worker in range(workers)
+            for node in range(virtual_nodes)
+        )
+        self.keys = [key for key, _ in points]
+        self.owners = [worker for _, worker in points]
+
+    def worker_for(self, park_id: int) -> int:
+        """The worker owning a park: the first ring point clockwise of the park's hash."""
+        index = bisect.bisect(self.keys, _hash(f"park-{park_id}")) % len(self.keys)
+        return self.owners[index]
+
+    def shard(self, park_ids: List[int], worker: int) -> List[int]:
+        """The parks of one worker, in their original order."""
+        return [park_id for park_id in park_ids if self.worker_for(park_id) == worker]
+
+
+def snapshot_minute(now: datetime, interval_minutes: int) -> datetime:
+    """
+    Start of the polling slot holding `now`: workers started independently for the same
+    scheduled run agree on it, so their objects land in the same minute partition.
+    """
+    slot = now.replace(second=0, microsecond=0)
+    return slot - timedelta(minutes=(slot.hour * 60 + slot.minute) % interval_minutes)
+
+
+@dataclass
+class ShardAssignment:
+    """What one worker of a sharded run needs to know about the run."""
+    index: int
+    count: int
+    # Identifies the run across workers (Cloud Run execution name, or the pool's start time)
+    run_id: str
+    # Minute partition this worker writes to (the slot it started in)
+    snapshot_time: datetime
+
+
+class ShardCoordinator:
+    """
+    Completion markers of the shards of one run, under <prefix><run_id>/.
+    The shard that finds every marker claims the run's transformation with a create-only
+    object, so the transformation runs once even when shards finish at the same time.
+    A run still incomplete timeout_minutes after it started lost a worker: the next shard
+    to finish claims it the same way, so it is transformed and its markers deleted.
+    """
+    def __init__(self, gcs: Any, prefix: str, assignment: ShardAssignment, timeout_minutes: int = 60) -> None:
+        self.gcs = gcs
+        self.assignment = assignment
+        self.prefix = prefix
+        self.folder = f"{prefix}{assignment.run_id}/"
+        self.timeout = timedelta(minutes=timeout_minutes)
+        # Folders this shard has to delete once the transformation is done
+        self.claimed_folders: List[str] = []
+
+    async def join(self, now: Optional[datetime] = None) -> None:
+        """
+        Records when the run started (first shard to start), which the stale run check reads.
+        Every shard keeps its own snapshot slot: a retried or slow task writing into the run's
+        first slot could land behind a watermark a later run already moved, and never reach Silver.
+        """
+        started_at = now or datetime.now(timezone.utc)
+        content = json.dumps({"started_at": started_at.isoformat(), "count": self.assignment.count}).encode("utf-8")
+        await self.gcs.create_if_absent(f"{self.folder}run.json", content, content_type="application/json")
+
+    async def finish(self, parks_written: int) -> Optional[int]:
+        """
+        Records this shard as finished. Returns the parks written by the whole run when
+        this shard is the one to transform, None otherwise.
+        """
+        index = self.assignment.index
+        await self.gcs.upload_json_data(f"{self.folder}worker-{index:04d}.json", {"worker": index, "parks_written": parks_written})
+        markers = [name for name in await self.gcs.list_blob_names(self.folder) if name.rsplit("/", 1)[-1].startswith("worker-")]
+        if len(markers) < self.assignment.count:
+            return None
+        claim = json.dumps({"worker": index}).encode("utf-8")
+        if not await self.gcs.create_if_absent(f"{self.folder}transform.json", claim, content_type="application/json"):
+            return None
+        self.claimed_folders.append(self.folder)
+        written = 0
+        for name in markers:
+            written += json.loads(await self.gcs.download_text(name))["parks_written"]
+        return written
+
+    async def claim_stale_runs(self, now: Optional[datetime] = None) -> int:
+        """
+        Claims the other runs started more than the timeout ago and never transformed.
+        What their dead workers wrote is unknown, so a claimed run always needs a transformation.
+        Returns how many runs were claimed.
+        """
+        now = now or datetime.now(timezone.utc)
+        folders: Dict[str, Set[str]] = {}
+        for name in await self.gcs.list_blob_names(self.prefix):
+            folder, _, file = name.rpartition("/")
+            folders.setdefault(f"{folder}/", set()).add(file)
+
+        claimed = 0
+        claim = json.dumps({"worker": self.assignment.index, "stale": True}).encode("utf-8")
+        for folder, files in sorted(folders.items()):
+            # run.json is written before any marker and deleted last
+            if folder == self.folder or "run.json" not in files:
+                continue
+            run = json.loads(await self.gcs.download_text(f"{folder}run.json"))
+            if now - datetime.fromisoformat(run["started_at"]) < self.timeout:
+                continue
+            if "transform.json" in files:
+                # Transformed long ago, only its cleanup failed
+                self.claimed_folders.append(folder)
+            elif await self.gcs.create_if_absent(f"{folder}transform.json", claim, content_type="application/json"):
+                self.claimed_folders.append(folder)
+                claimed += 1
+        return claimed
+
+    async def cleanup(self) -> None:
+        """Deletes the markers of the runs this shard claimed."""
+        for folder in self.claimed_folders:
+            names = await self.gcs.list_blob_names(folder)
+            # run.json last: a cleanup that fails halfway leaves a folder the stale check still finds
+            await self.gcs.delete_blobs([name for name in names if not name.endswith("/run.json")])
+            await self.gcs.delete_blobs([name for name in names if name.endswith("/run.json")])
+        self.claimed_folders = []
@@ -0,0 +1,78 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def payload_hash(content: bytes) -> str:
+    """
+    Stable hash of an encoded queue_times.json payload (QueueTimesPayload.ndjson_line).
+    The typed encoding has a fixed field order, whatever order the API serialises them in.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+class ParkState:
+    """
+    Remembers, per park, the validators (ETag / Last-Modified) and the content hash
+    of the last payload written to Bronze, so unchanged parks can be skipped.
+    Changes are staged during a run and only committed once the snapshot is written.
+    """
+    def __init__(self, parks: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        self.parks: Dict[str, Dict[str, Any]] = parks or {}
+        self.pending: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, park_id: int) -> Dict[str, Any]:
+        return self.parks.get(str(park_id), {})
+
+    def conditional_headers(self, park_id: int) -> Dict[str, str]:
+        """Headers turning the next request into a conditional one when the API sent validators."""
+        state = self.get(park_id)
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+
+    def is_unchanged(self, park_id: int, content_hash: str) -> bool:
+        return self.get(park_id).get("content_hash") == content_hash
+
+    def stage(self, park_id: int, content_hash: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        self.pending[str(park_id)] = {
+            "content_hash": content_hash,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+
+    def commit(self) -> None:
+        self.parks.update(self.pending)
+        self.pending = {}
+
+    def discard(self) -> None:
+        """Drops the changes staged by a run whose snapshot was not written."""
+        self.pending = {}
+
+    def to_json(self) -> str:
+        return json.dumps(self.parks)
+
+    @classmethod
+    def from_json(cls, content: str) -> "ParkState":
+        return cls(json.loads(content))
+
+    @classmethod
+    def load_local(cls, path: str) -> "ParkState":
+        file = Path(path)
+        if not file.exists():
+            logger.info(f"No park state found at {path}, every park is treated as changed")
+            return cls()
+        return cls.from_json(file.read_text())
+
+    def save_local(self, path: str) -> None:
+        file = Path(path)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(self.to_json())
@@ -0,0 +1,61 @@
+from itertools import chain
+from typing import Iterator, List, Optional
+
+from pydantic import BaseModel, ConfigDict, PrivateAttr, TypeAdapter
+
+
+class QueueTimesRide(BaseModel):
+    # Fields the API may add are kept, so Bronze keeps every field the payload had
+    model_config = ConfigDict(extra="allow")
+
+    id: int
+    # Only the ids are required: one ride with a null name or state must not drop its park
+    name: Optional[str] = None
+    is_open: Optional[bool] = None
+    wait_time: Optional[int] = None
+    # Kept as sent: parsed by the transformations, not on the ingestion hot path
+    last_updated: Optional[str] = None
+
+
+class QueueTimesLand(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: int
+    name: Optional[str] = None
+    rides: List[QueueTimesRide] = []
+
+
+class QueueTimesPayload(BaseModel):
+    """
+    Typed queue_times.json payload. Decoded and validated in one pass from the response body
+    (pydantic-core, no intermediate dict tree) and encoded back to an NDJSON line only once.
+    The line is a re-encoding, not the body: compact, with park_id, and with every declared
+    field present (missing lists as [], missing values as null). It flattens to the same records.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    lands: List[QueueTimesLand] = []
+    rides: List[QueueTimesRide] = []
+    park_id: Optional[int] = None
+
+    _line: Optional[bytes] = PrivateAttr(default=None)
+
+    def iter_rides(self) -> Iterator[QueueTimesRide]:
+        """Root rides first, then the rides of every land (the order of flatten_queue_times_payload)."""
+        return chain(self.rides, *(land.rides for land in self.lands))
+
+    def ndjson_line(self) -> bytes:
+        """The payload as one NDJSON line, cached: the content hash and the snapshot share it."""
+        if self._line is None:
+            self._line = _PAYLOAD.dump_json(self) + b"\n"
+        return self._line
+
+
+_PAYLOAD = TypeAdapter(QueueTimesPayload)
+
+
+def decode_queue_times(content: bytes, park_id: int) -> QueueTimesPayload:
+    """Validates a raw response body. Raises pydantic.ValidationError for malformed JSON or fields."""
+    payload = _PAYLOAD.validate_json(content)
+    payload.park_id = park_id
+    return payload
@@ -0,0 +1,99 @@
+import gzip
+import json
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# year=2025/month=11/day=22/hour=14/minute=05/part-00000.json.gz
+MINUTE_PARTITION = re.compile(
+    r"year=(\d{4})/month=(\d{2})/day=(\d{2})/hour=(\d{2})/minute=(\d{2})/"
+)
+
+# Typed columns of a flattened ride record (same names as the Silver table), as pandas dtypes
+RIDE_COLUMNS = {
+    "timestamp": "datetime64[ns, UTC]",
+    "park_id": "Int64",
+    "land_id": "Int64",
+    "land_name": "string",
+    "ride_id": "Int64",
+    "ride_name": "string",
+    "is_open": "boolean",
+    "wait_time": "Int64",
+    "last_updated": "datetime64[ns, UTC]",
+}
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+def _to_timestamp(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+def _ride_record(
+    ride: Dict[str, Any],
+    timestamp: datetime,
+    park_id: int,
+    land_id: Optional[int],
+    land_name: str
+) -> Dict[str, Any]:
+    return {
+        "timestamp": timestamp,
+        "park_id": park_id,
+        "land_id": land_id,
+        "land_name": land_name,
+        "ride_id": _to_int(ride.get("id")),
+        "ride_name": ride.get("name"),
+        "is_open": ride.get("is_open"),
+        "wait_time": _to_int(ride.get("wait_time")),
+        "last_updated": _to_timestamp(ride.get("last_updated")),
+    }
+
+
+def flatten_queue_times_payload(payload: Dict[str, Any], timestamp: datetime) -> List[Dict[str, Any]]:
+    """
+    Flattens one queue_times.json payload into one typed record per ride.
+    Mirrors sql/transform_queue_times.sql: root rides belong to the "General" land,
+    nested rides keep the id and name of their land.
+    """
+    park_id = _to_int(payload.get("park_id"))
+    records = []
+
+    # Rides at the root level
+    for ride in payload.get("rides") or []:
+        records.append(_ride_record(ride, timestamp, park_id, None, "General"))
+
+    # Rides nested inside lands
+    for land in payload.get("lands") or []:
+        land_id = _to_int(land.get("id"))
+        for ride in land.get("rides") or []:
+            records.append(_ride_record(ride, timestamp, park_id, land_id, land.get("name")))
+
+    return records
+
+
+def count_rides(payload: Dict[str, Any]) -> int:
+    """Number of ride records flatten_queue_times_payload produces for a payload."""
+    nested = sum(len(land.get("rides") or []) for land in payload.get("lands") or [])
+    return len(payload.get("rides") or []) + nested
+
+
+def parse_minute_partition(path: str) -> Optional[datetime]:
+    """Returns the UTC minute a Bronze object was written to, None for unexpected paths."""
+    match = MINUTE_PARTITION.search(path)
+    if match is None:
+        return None
+    year, month, day, hour, minute = (int(value) for value in match.groups())
+    return datetime(year, month, day, hour, minute, tzinfo=timezone.utc)
+
+
+def decode_bronze_object(path: str, content: bytes) -> List[Dict[str, Any]]:
+    """Reads the records of a gzip NDJSON snapshot or of a plain JSON/NDJSON object."""
+    if path.endswith(".gz"):
+        content = gzip.decompress(content)
+    return [json.loads(line) for line in content.decode("utf-8").splitlines() if line.strip()]
@@ -0,0 +1,217 @@
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Archive layout version, stored in the file
+FORMAT_VERSION = 1
+
+# Encoding of is_open in the state column
+STATE_CLOSED = 0
+STATE_OPEN = 1
+STATE_UNKNOWN = 2
+
+# Stored for rides without a wait time / without last_updated
+MISSING_WAIT = -1
+MISSING_OFFSET = np.iinfo(np.int32).min
+
+
+def _seconds(values: pd.Series) -> np.ndarray:
+    """UTC timestamps as epoch seconds, NaT as MISSING_OFFSET."""
+    stamps = pd.to_datetime(values, utc=True)
+    seconds = stamps.to_numpy(dtype="datetime64[s]").astype(np.int64)
+    return np.where(stamps.isna().to_numpy(), MISSING_OFFSET, seconds)
+
+
+def _last_rows(first_rows: np.ndarray, total: int) -> np.ndarray:
+    """Last row of every group, given the first row of each (empty without groups)."""
+    if not len(first_rows):
+        return first_rows
+    return np.append(first_rows[1:], total) - 1
+
+
+class RideHistoryArchive:
+    """
+    Compact wait time history: one run per change of (wait_time, is_open) of a ride, instead of
+    one row per sample. Runs are stored in columns: start delta from the previous run of the ride
+    (seconds), span to the last sample of the run, sample count, and the run-length encoded values.
+    A run is also cut when two samples are more than max_gap_seconds apart, so missing data is never
+    filled by the reader.
+    last_updated does not cut runs (the source bumps it on refreshes that change nothing): only the
+    value of the last sample of a run is kept, earlier values are lost.
+    """
+    def __init__(self, arrays: Dict[str, np.ndarray]) -> None:
+        self.arrays = arrays
+
+    @property
+    def ride_count(self) -> int:
+        return len(self.arrays["park_ids"])
+
+    @property
+    def run_count(self) -> int:
+        return len(self.arrays["start_deltas"])
+
+    # ------------------------------------------------------------------
+    # Writer
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_readings(cls, rides: pd.DataFrame, max_gap_seconds: int = 900) -> "RideHistoryArchive":
+        """Encodes Silver-shaped readings (one row per ride and sample), for all rides at once."""
+        frame = rides[rides["ride_id"].notna() & rides["park_id"].notna()]
+        frame = frame.drop_duplicates(["park_id", "ride_id", "timestamp"], keep="last")
+        frame = frame.sort_values(["park_id", "ride_id", "timestamp"], kind="stable").reset_index(drop=True)
+
+        park_ids = frame["park_id"].to_numpy(dtype=np.int64)
+        ride_ids = frame["ride_id"].to_numpy(dtype=np.int64)
+        timestamps = _seconds(frame["timestamp"])
+        wait_times = frame["wait_time"].to_numpy(dtype=np.float64, na_value=np.nan)
+        wait_times = np.where(np.isnan(wait_times), MISSING_WAIT, wait_times).astype(np.int16)
+        is_open = frame["is_open"].astype("boolean")
+        states = np.where(is_open.isna().to_numpy(), STATE_UNKNOWN, is_open.to_numpy(dtype=bool, na_value=False)).astype(np.int8)
+        updated = _seconds(frame["last_updated"])
+
+        # A run starts on a new ride, after a gap, or when the wait time or the state changes
+        new_ride = np.ones(len(frame), dtype=bool)
+        new_ride[1:] = (park_ids[1:] != park_ids[:-1]) | (ride_ids[1:] != ride_ids[:-1])
+        starts_run = new_ride.copy()
+        starts_run[1:] |= (
+            (timestamps[1:] - timestamps[:-1] > max_gap_seconds)
+            | (wait_times[1:] != wait_times[:-1])
+            | (states[1:] != states[:-1])
+        )
+
+        run_rows = np.flatnonzero(starts_run)
+        last_rows = _last_rows(run_rows, len(frame))
+        run_starts = timestamps[run_rows]
+        ride_first_runs = np.flatnonzero(new_ride[run_rows])
+
+        start_deltas = np.zeros(len(run_rows), dtype=np.int64)
+        start_deltas[1:] = run_starts[1:] - run_starts[:-1]
+        start_deltas[ride_first_runs] = 0
+
+        run_ends = timestamps[last_rows]
+        run_updated = updated[last_rows]
+        updated_offsets = np.where(run_updated == MISSING_OFFSET, MISSING_OFFSET, run_ends - run_updated)
+
+        ride_rows = np.flatnonzero(new_ride)
+        # Names and lands as of the last sample of the ride
+        rides_last = frame.iloc[_last_rows(ride_rows, len(frame))]
+        return cls({
+            "version": np.array(FORMAT_VERSION),
+            "max_gap_seconds": np.array(max_gap_seconds),
+            "park_ids": park_ids[ride_rows].astype(np.int32),
+            "ride_ids": ride_ids[ride_rows].astype(np.int32),
+            "land_ids": rides_last["land_id"].to_numpy(dtype=np.float64, na_value=np.nan),
+            "land_names": rides_last["land_name"].fillna("").to_numpy(dtype=str),
+            "ride_names": rides_last["ride_name"].fillna("").to_numpy(dtype=str),
+            "first_timestamps": timestamps[ride_rows],
+            "run_offsets": np.append(ride_first_runs, len(run_rows)).astype(np.int64),
+            "start_deltas": start_deltas.astype(np.uint32),
+            "spans": (run_ends - run_starts).astype(np.uint32),
+            "counts": (last_rows - run_rows + 1).astype(np.uint32),
+            "wait_times": wait_times[run_rows],
+            "states": states[run_rows],
+            "updated_offsets": np.clip(updated_offsets, MISSING_OFFSET, np.iinfo(np.int32).max).astype(np.int32),
+        })
+
+    def save(self, path: str) -> None:
+        """Writes every column to one zlib-compressed .npz file (deltas and runs compress well)."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, **self.arrays)
+
+    # ------------------------------------------------------------------
+    # Reader
+    # ------------------------------------------------------------------
+    @classmethod
+    def load(cls, path: str) -> "RideHistoryArchive":
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        if int(arrays["version"]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported ride history archive version {int(arrays['version'])}")
+        return cls(arrays)
+
+    def _run_rides(self) -> np.ndarray:
+        """Ride row of every run."""
+        return np.repeat(np.arange(self.ride_count), np.diff(self.arrays["run_offsets"]))
+
+    def run_starts(self) -> np.ndarray:
+        """Absolute start (epoch seconds) of every run, rebuilt from the deltas."""
+        rides = self._run_rides()
+        running = np.cumsum(self.arrays["start_deltas"].astype(np.int64))
+        first_runs = self.arrays["run_offsets"][:-1]
+        # Deltas restart at every ride: remove what the previous rides accumulated
+        return self.arrays["first_timestamps"][rides] + running - running[first_runs][rides]
+
+    def runs(self) -> pd.DataFrame:
+        """One row per run with absolute timestamps."""
+        rides = self._run_rides()
+        starts = self.run_starts()
+        ends = starts + self.arrays["spans"]
+        offsets = self.arrays["updated_offsets"].astype(np.int64)
+        wait_times = self.arrays["wait_times"]
+        states = self.arrays["states"]
+        return pd.DataFrame({
+            "park_id": self.arrays["park_ids"][rides],
+            "ride_id": self.arrays["ride_ids"][rides],
+            "start": pd.to_datetime(starts, unit="s", utc=True),
+            "end": pd.to_datetime(ends, unit="s", utc=True),
+            "samples": self.arrays["counts"],
+            "wait_time": pd.array(np.where(wait_times == MISSING_WAIT, None, wait_times), dtype="Int64"),
+            "is_open": pd.array(np.where(states == STATE_UNKNOWN, None, states == STATE_OPEN), dtype="boolean"),
+            "last_updated": pd.to_datetime(np.where(offsets == MISSING_OFFSET, np.nan, ends - offsets), unit="s", utc=True),
+        })
+
+    def regular_series(self, freq: str = "1min", start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> Dict[str, np.ndarray]:
+        """
+        Rebuilds every ride on one regular grid: wait_time (float, NaN without data)
+        and state (int8, -1 without data) of shape (rides, slots), plus the grid times.
+        A run holds its value until the next run of the ride starts, unless the two are more than
+        max_gap_seconds apart; slots outside every run stay empty.
+        An empty archive gives an empty grid unless both start and end are set.
+        """
+        step = int(pd.Timedelta(freq).total_seconds())
+        if not self.run_count and (start is None or end is None):
+            return {
+                "park_ids": self.arrays["park_ids"],
+                "ride_ids": self.arrays["ride_ids"],
+                "times": pd.DatetimeIndex([], tz="UTC"),
+                "wait_time": np.empty((self.ride_count, 0), dtype=np.float32),
+                "state": np.empty((self.ride_count, 0), dtype=np.int8),
+            }
+        starts = self.run_starts()
+        ends = starts + self.arrays["spans"]
+        # Carry each run up to the next sample of the ride (its next run)
+        follows = np.ones(self.run_count, dtype=bool)
+        follows[self.arrays["run_offsets"][1:] - 1] = False
+        follows[:-1] &= starts[1:] - ends[:-1] <= int(self.arrays["max_gap_seconds"])
+        ends[:-1] = np.where(follows[:-1], starts[1:] - 1, ends[:-1])
+
+        first = int(pd.Timestamp(start).timestamp()) if start is not None else int(starts.min()) // step * step
+        last = int(pd.Timestamp(end).timestamp()) if end is not None else int(ends.max())
+        n_slots = (last - first) // step + 1
+
+        first_slots = np.clip(-((first - starts) // step), 0, n_slots)
+        last_slots = np.clip((ends - first) // step, -1, n_slots - 1)
+        lengths = np.maximum(last_slots - first_slots + 1, 0)
+
+        # Expand every run into the slots it covers without a Python loop
+        run_ids = np.repeat(np.arange(self.run_count), lengths)
+        within = np.arange(len(run_ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        slots = first_slots[run_ids] + within
+        rows = self._run_rides()[run_ids]
+
+        wait_times = self.arrays["wait_times"].astype(np.float32)
+        wait_times[self.arrays["wait_times"] == MISSING_WAIT] = np.nan
+        wait_grid = np.full((self.ride_count, n_slots), np.nan, dtype=np.float32)
+        wait_grid[rows, slots] = wait_times[run_ids]
+        state_grid = np.full((self.ride_count, n_slots), -1, dtype=np.int8)
+        state_grid[rows, slots] = self.arrays["states"][run_ids]
+
+        return {
+            "park_ids": self.arrays["park_ids"],
+            "ride_ids": self.arrays["ride_ids"],
+            "times": pd.date_range(pd.Timestamp(first, unit="s", tz="UTC"), periods=n_slots, freq=f"{step}s"),
+            "wait_time": wait_grid,
+            "state": state_grid,
+        }
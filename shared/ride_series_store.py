@@ -0,0 +1,226 @@
+import math
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from shared.queue_times_records import flatten_queue_times_payload
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Stored for rides without a wait time
+MISSING_WAIT = -1
+
+
+class RideSeriesStore:
+    """
+    In-memory recent history of every ride, fed by the ingestion as payloads arrive.
+    Each ride owns one row of preallocated NumPy ring buffers (timestamp, wait_time, is_open),
+    so the memory footprint is fixed: max_rides x window samples (~11 bytes per sample).
+    When every row is used, the ride updated least recently is evicted.
+    """
+    def __init__(self, max_rides: int, window: int, ewma_halflife_seconds: float = 900.0) -> None:
+        self.max_rides = max_rides
+        self.window = window
+        self.ewma_halflife_seconds = ewma_halflife_seconds
+        self.index: Dict[Tuple[int, int], int] = {}
+        self.keys = np.full((max_rides, 2), -1, dtype=np.int64)
+        self.timestamps = np.zeros((max_rides, window), dtype=np.int64)
+        self.wait_times = np.full((max_rides, window), MISSING_WAIT, dtype=np.int16)
+        self.is_open = np.zeros((max_rides, window), dtype=np.bool_)
+        # Next write position and number of valid samples per row
+        self.heads = np.zeros(max_rides, dtype=np.int32)
+        self.counts = np.zeros(max_rides, dtype=np.int32)
+        # Incrementally maintained EWMA of the open wait times
+        self.ewma = np.full(max_rides, np.nan, dtype=np.float64)
+        self.ewma_timestamps = np.zeros(max_rides, dtype=np.int64)
+        # Time of the last reading per row, picks the ride to evict
+        self.last_seen = np.zeros(max_rides, dtype=np.int64)
+        # Appends come from the event loop, queries may come from other threads
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _row(self, key: Tuple[int, int], claimed: Optional[List[int]] = None) -> int:
+        """Row of a ride, claimed for it if new. The rows in `claimed` (same batch) are never evicted."""
+        row = self.index.get(key)
+        if row is not None:
+            return row
+        if len(self.index) < self.max_rides:
+            row = len(self.index)
+        else:
+            # Evict the ride updated least recently
+            last_seen = self.last_seen
+            if claimed:
+                last_seen = last_seen.copy()
+                last_seen[claimed] = np.iinfo(np.int64).max
+            row = int(np.argmin(last_seen))
+            del self.index[(int(self.keys[row, 0]), int(self.keys[row, 1]))]
+            self.heads[row] = self.counts[row] = 0
+            self.ewma[row] = np.nan
+        self.index[key] = row
+        self.keys[row] = key
+        return row
+
+    def append(self, park_id: int, ride_id: int, timestamp: int, wait_time: Optional[int], is_open: Optional[bool]) -> None:
+        """Adds one reading (timestamp in epoch seconds)."""
+        with self._lock:
+            row = self._row((park_id, ride_id))
+            head = self.heads[row]
+            self.timestamps[row, head] = timestamp
+            self.wait_times[row, head] = MISSING_WAIT if wait_time is None else wait_time
+            self.is_open[row, head] = bool(is_open)
+            self.heads[row] = (head + 1) % self.window
+            self.counts[row] = min(self.counts[row] + 1, self.window)
+            self.last_seen[row] = timestamp
+
+            if is_open and wait_time is not None:
+                previous = self.ewma[row]
+                if np.isnan(previous):
+                    self.ewma[row] = wait_time
+                else:
+                    # Irregular sampling: the weight of the new reading depends on the elapsed time
+                    elapsed = max(0, timestamp - self.ewma_timestamps[row])
+                    alpha = 1.0 - math.exp(-elapsed * math.log(2) / self.ewma_halflife_seconds)
+                    self.ewma[row] = previous + alpha * (wait_time - previous)
+                self.ewma_timestamps[row] = timestamp
+
+    def append_payload(self, payload: Dict[str, Any], timestamp: datetime) -> int:
+        """Adds every ride of a queue_times.json payload in one vectorized write. Returns the number of readings."""
+        records = [record for record in flatten_queue_times_payload(payload, timestamp) if record["ride_id"] is not None]
+        if not records:
+            return 0
+        readings = [(r["ride_id"], r["wait_time"], r["is_open"]) for r in records]
+        return self.append_rides(records[0]["park_id"], readings, timestamp)
+
+    def append_rides(self, park_id: int, readings: List[Tuple[int, Optional[int], Optional[bool]]], timestamp: datetime) -> int:
+        """Adds (ride_id, wait_time, is_open) readings of one park in one vectorized write. Returns the number of readings."""
+        if not readings:
+            return 0
+        if len(readings) > self.max_rides:
+            # Every row of the batch is claimed before any is written: the rest cannot be stored
+            logger.warning("Park %s: %s rides, only the last %s are kept", park_id, len(readings), self.max_rides)
+            readings = readings[-self.max_rides:]
+        epoch = int(timestamp.timestamp())
+        wait_times = np.array([MISSING_WAIT if wait_time is None else wait_time for _, wait_time, _ in readings], dtype=np.float64)
+        is_open = np.array([bool(open_) for _, _, open_ in readings], dtype=np.bool_)
+
+        with self._lock:
+            claimed: List[int] = []
+            for ride_id, _, _ in readings:
+                claimed.append(self._row((park_id, ride_id), claimed))
+            rows = np.array(claimed, dtype=np.intp)
+            heads = self.heads[rows]
+            self.timestamps[rows, heads] = epoch
+            self.wait_times[rows, heads] = wait_times
+            self.is_open[rows, heads] = is_open
+            self.heads[rows] = (heads + 1) % self.window
+            self.counts[rows] = np.minimum(self.counts[rows] + 1, self.window)
+            self.last_seen[rows] = epoch
+
+            # Same update as append(), for the open rides with a wait time
+            valid = is_open & (wait_times != MISSING_WAIT)
+            rows, wait_times = rows[valid], wait_times[valid]
+            previous = self.ewma[rows]
+            elapsed = np.maximum(0, epoch - self.ewma_timestamps[rows])
+            alpha = 1.0 - np.exp(-elapsed * math.log(2) / self.ewma_halflife_seconds)
+            self.ewma[rows] = np.where(np.isnan(previous), wait_times, previous + alpha * (wait_times - previous))
+            self.ewma_timestamps[rows] = epoch
+        return len(readings)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def latest(self, park_id: int, ride_id: int) -> Optional[Dict[str, Any]]:
+        """Most recent reading of a ride, None if the ride is unknown."""
+        with self._lock:
+            row = self.index.get((park_id, ride_id))
+            if row is None:
+                return None
+            last = (self.heads[row] - 1) % self.window
+            wait_time = int(self.wait_times[row, last])
+            return {
+                "timestamp": int(self.timestamps[row, last]),
+                "wait_time": None if wait_time == MISSING_WAIT else wait_time,
+                "is_open": bool(self.is_open[row, last]),
+            }
+
+    def recent(self, park_id: int, ride_id: int, seconds: int, now: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Readings of the last `seconds`, oldest first (copies taken under the lock)."""
+        with self._lock:
+            row = self.index.get((park_id, ride_id))
+            if row is None:
+                empty = np.empty(0, dtype=np.int64)
+                return {"timestamp": empty, "wait_time": empty.astype(np.int16), "is_open": empty.astype(np.bool_)}
+            # Unroll the ring so the samples are in chronological order (fancy indexing copies)
+            count, head = self.counts[row], self.heads[row]
+            order = (np.arange(head - count, head)) % self.window
+            timestamps = self.timestamps[row, order]
+            wait_times = self.wait_times[row, order]
+            is_open = self.is_open[row, order]
+        keep = timestamps >= (now if now is not None else int(time.time())) - seconds
+        return {"timestamp": timestamps[keep], "wait_time": wait_times[keep], "is_open": is_open[keep]}
+
+    def rolling_mean(self, park_id: int, ride_id: int, seconds: int, now: Optional[int] = None) -> Optional[float]:
+        """Mean wait time of the open readings of the last `seconds`."""
+        readings = self.recent(park_id, ride_id, seconds, now)
+        valid = readings["is_open"] & (readings["wait_time"] != MISSING_WAIT)
+        if not valid.any():
+            return None
+        return float(readings["wait_time"][valid].mean())
+
+    def ewma_wait(self, park_id: int, ride_id: int) -> Optional[float]:
+        """Exponentially weighted mean of the open wait times (half-life ewma_halflife_seconds)."""
+        with self._lock:
+            row = self.index.get((park_id, ride_id))
+            value = np.nan if row is None else self.ewma[row]
+        return None if np.isnan(value) else float(value)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the buffers."""
+        arrays = (
+            self.keys, self.timestamps, self.wait_times, self.is_open, self.heads, self.counts,
+            self.ewma, self.ewma_timestamps, self.last_seen
+        )
+        return sum(array.nbytes for array in arrays)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def snapshot(self, path: str) -> None:
+        """Writes the buffers to a single .npz file."""
+        file = Path(path)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        # Copied under the lock, written outside it: appends only wait for the copy
+        with self._lock:
+            arrays = {
+                "keys": self.keys, "timestamps": self.timestamps, "wait_times": self.wait_times, "is_open": self.is_open,
+                "heads": self.heads, "counts": self.counts, "ewma": self.ewma, "ewma_timestamps": self.ewma_timestamps,
+                "last_seen": self.last_seen,
+            }
+            arrays = {name: array.copy() for name, array in arrays.items()}
+            rides = len(self.index)
+        # Write to a temporary file first so a crash never leaves a truncated snapshot
+        temporary = file.with_suffix(".tmp.npz")
+        np.savez(temporary, ewma_halflife_seconds=np.array(self.ewma_halflife_seconds), **arrays)
+        temporary.replace(file)
+        logger.info(f"Ride series snapshot written to {path} ({rides} rides)")
+
+    @classmethod
+    def restore(cls, path: str) -> "RideSeriesStore":
+        """Rebuilds a store from a snapshot, with the capacity it was written with."""
+        with np.load(path) as data:
+            max_rides, window = data["timestamps"].shape
+            store = cls(max_rides, window, float(data["ewma_halflife_seconds"]))
+            for name in ("keys", "timestamps", "wait_times", "is_open", "heads", "counts", "ewma", "ewma_timestamps", "last_seen"):
+                getattr(store, name)[...] = data[name]
+        used = np.flatnonzero(store.keys[:, 0] >= 0)
+        store.index = {(int(store.keys[row, 0]), int(store.keys[row, 1])): int(row) for row in used}
+        logger.info(f"Ride series restored from {path} ({len(store.index)} rides)")
+        return store
@@ -0,0 +1,11 @@
+-- Replaces the backfilled days of the Silver table in one transaction: readers see the old or the new days, never a mix
+BEGIN TRANSACTION;
+
+DELETE FROM `{dest_table}`
+WHERE DATE(timestamp) BETWEEN '{first_day}' AND '{last_day}';
+
+INSERT INTO `{dest_table}`
+SELECT * FROM `{source_table}`
+WHERE DATE(timestamp) BETWEEN '{first_day}' AND '{last_day}';
+
+COMMIT TRANSACTION;
@@ -0,0 +1,16 @@
+-- Native staging table of the flattened Bronze rides, appended by batch load jobs
+CREATE TABLE IF NOT EXISTS `{dest_table}` (
+    timestamp TIMESTAMP,
+    park_id INT64,
+    land_id INT64,
+    land_name STRING,
+    ride_id INT64,
+    ride_name STRING,
+    is_open BOOL,
+    wait_time INT64,
+    last_updated TIMESTAMP,
+    -- Bronze object the row was loaded from: the record of the files already staged
+    source_file STRING
+)
+PARTITION BY DATE(timestamp)
+CLUSTER BY park_id, ride_id;
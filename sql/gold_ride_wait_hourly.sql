@@ -0,0 +1,90 @@
+-- Gold: wait time statistics per ride and hour, refreshed from the hours at or after the watermark
+CREATE TABLE IF NOT EXISTS `{dest_table}` (
+    hour_start TIMESTAMP,
+    park_id INT64,
+    ride_id INT64,
+    ride_name STRING,
+    -- Local calendar of the park (DAYOFWEEK: 1 = Sunday)
+    local_day_of_week INT64,
+    local_hour INT64,
+    avg_wait FLOAT64,
+    median_wait INT64,
+    p90_wait INT64,
+    max_wait INT64,
+    open_ratio FLOAT64,
+    sample_count INT64,
+    wait_sample_count INT64,
+    -- KLL sketch of the wait times, merged by the weekly profile for its quantiles
+    wait_time_sketch BYTES,
+    updated_at TIMESTAMP
+)
+PARTITION BY DATE(hour_start)
+CLUSTER BY park_id, ride_id;
+
+MERGE `{dest_table}` T
+USING (
+    WITH park_timezones AS (
+        SELECT
+            park_id,
+            ANY_VALUE(timezone) as timezone
+        FROM `{parks_table}`
+        WHERE timezone IS NOT NULL
+        GROUP BY park_id
+    ),
+
+    -- Only the Silver partitions of the hours to refresh are read
+    new_rows AS (
+        SELECT
+            TIMESTAMP_TRUNC(q.timestamp, HOUR) as hour_start,
+            q.park_id,
+            q.ride_id,
+            q.ride_name,
+            q.is_open,
+            -- Closed rides report 0 minutes: keep them out of the wait statistics
+            IF(q.is_open, q.wait_time, NULL) as open_wait_time,
+            EXTRACT(DAYOFWEEK FROM DATETIME(TIMESTAMP_TRUNC(q.timestamp, HOUR), COALESCE(p.timezone, 'UTC'))) as local_day_of_week,
+            EXTRACT(HOUR FROM DATETIME(TIMESTAMP_TRUNC(q.timestamp, HOUR), COALESCE(p.timezone, 'UTC'))) as local_hour
+        FROM `{source_table}` q
+        LEFT JOIN park_timezones p USING (park_id)
+        WHERE q.timestamp >= TIMESTAMP '{watermark}'
+    )
+
+    SELECT
+        hour_start,
+        park_id,
+        ride_id,
+        ANY_VALUE(ride_name) as ride_name,
+        ANY_VALUE(local_day_of_week) as local_day_of_week,
+        ANY_VALUE(local_hour) as local_hour,
+        AVG(open_wait_time) as avg_wait,
+        APPROX_QUANTILES(open_wait_time, 100 IGNORE NULLS)[SAFE_OFFSET(50)] as median_wait,
+        APPROX_QUANTILES(open_wait_time, 100 IGNORE NULLS)[SAFE_OFFSET(90)] as p90_wait,
+        MAX(open_wait_time) as max_wait,
+        AVG(IF(is_open, 1, 0)) as open_ratio,
+        COUNT(*) as sample_count,
+        COUNT(open_wait_time) as wait_sample_count,
+        KLL_QUANTILES.INIT_INT64(open_wait_time) as wait_time_sketch,
+        CURRENT_TIMESTAMP() as updated_at
+    FROM new_rows
+    GROUP BY hour_start, park_id, ride_id
+) S
+ON T.hour_start = S.hour_start
+    AND T.park_id = S.park_id
+    AND T.ride_id = S.ride_id
+    -- Prune the target scan to the refreshed partitions
+    AND T.hour_start >= TIMESTAMP '{watermark}'
+WHEN MATCHED THEN UPDATE SET
+    ride_name = S.ride_name,
+    local_day_of_week = S.local_day_of_week,
+    local_hour = S.local_hour,
+    avg_wait = S.avg_wait,
+    median_wait = S.median_wait,
+    p90_wait = S.p90_wait,
+    max_wait = S.max_wait,
+    open_ratio = S.open_ratio,
+    sample_count = S.sample_count,
+    wait_sample_count = S.wait_sample_count,
+    wait_time_sketch = S.wait_time_sketch,
+    updated_at = S.updated_at
+WHEN NOT MATCHED THEN
+    INSERT ROW
@@ -0,0 +1,156 @@
+-- Gold: wait time profile per ride, local day of week and local hour.
+-- Each cell keeps running sums, counts and a merged KLL sketch: a run folds in the hours
+-- the hourly table finished since the previous run and never reads the older history
+-- (quantiles stay exact to the KLL error). A rebuild folds every hour again.
+DECLARE rebuild BOOL;
+DECLARE fold_from TIMESTAMP;
+DECLARE fold_until TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS `{dest_table}` (
+    park_id INT64,
+    ride_id INT64,
+    ride_name STRING,
+    local_day_of_week INT64,
+    local_hour INT64,
+    avg_wait FLOAT64,
+    median_wait INT64,
+    p90_wait INT64,
+    max_wait INT64,
+    open_ratio FLOAT64,
+    sample_count INT64,
+    hours_observed INT64,
+    updated_at TIMESTAMP,
+    -- Running state the statistics above are derived from
+    wait_sum FLOAT64,
+    wait_sample_count INT64,
+    open_sum FLOAT64,
+    wait_time_sketch BYTES,
+    -- Last hour folded into the cell
+    last_hour_start TIMESTAMP
+)
+CLUSTER BY park_id, ride_id;
+
+-- A new (empty) table folds the whole history
+SET rebuild = {rebuild} OR (SELECT COUNT(*) = 0 FROM `{dest_table}`);
+SET fold_from = IF(rebuild, TIMESTAMP '1970-01-01 00:00:00+00', TIMESTAMP '{watermark}');
+-- The latest hour is re-aggregated by the next hourly refresh: it is folded once a later hour exists
+SET fold_until = (SELECT MAX(hour_start) FROM `{source_table}` WHERE hour_start >= fold_from);
+
+IF rebuild THEN
+    TRUNCATE TABLE `{dest_table}`;
+END IF;
+
+MERGE `{dest_table}` T
+USING (
+    WITH new_hours AS (
+        -- Constant bounds (script variables): only the partitions of these hours are read
+        SELECT *
+        FROM `{source_table}`
+        WHERE hour_start >= fold_from AND hour_start < fold_until
+    ),
+
+    -- Current state of the touched cells (one row per ride and hour of the week)
+    cells AS (
+        SELECT c.*
+        FROM `{dest_table}` c
+        JOIN (SELECT DISTINCT park_id, ride_id, local_day_of_week, local_hour FROM new_hours)
+            USING (park_id, ride_id, local_day_of_week, local_hour)
+    ),
+
+    contributions AS (
+        SELECT
+            park_id,
+            ride_id,
+            local_day_of_week,
+            local_hour,
+            last_hour_start as hour_start,
+            ride_name,
+            wait_sum,
+            wait_sample_count,
+            open_sum,
+            sample_count,
+            hours_observed,
+            max_wait,
+            wait_time_sketch
+        FROM cells
+
+        UNION ALL
+
+        SELECT
+            n.park_id,
+            n.ride_id,
+            n.local_day_of_week,
+            n.local_hour,
+            n.hour_start,
+            n.ride_name,
+            n.avg_wait * n.wait_sample_count as wait_sum,
+            n.wait_sample_count,
+            n.open_ratio * n.sample_count as open_sum,
+            n.sample_count,
+            1 as hours_observed,
+            n.max_wait,
+            n.wait_time_sketch
+        FROM new_hours n
+        LEFT JOIN cells c USING (park_id, ride_id, local_day_of_week, local_hour)
+        -- Hours already folded into the cell are not counted twice
+        WHERE c.last_hour_start IS NULL OR n.hour_start > c.last_hour_start
+    ),
+
+    folded AS (
+        SELECT
+            park_id,
+            ride_id,
+            local_day_of_week,
+            local_hour,
+            ARRAY_AGG(ride_name ORDER BY hour_start DESC LIMIT 1)[OFFSET(0)] as ride_name,
+            SUM(wait_sum) as wait_sum,
+            SUM(wait_sample_count) as wait_sample_count,
+            SUM(open_sum) as open_sum,
+            SUM(sample_count) as sample_count,
+            SUM(hours_observed) as hours_observed,
+            MAX(max_wait) as max_wait,
+            KLL_QUANTILES.MERGE_PARTIAL(wait_time_sketch) as wait_time_sketch,
+            MAX(hour_start) as last_hour_start
+        FROM contributions
+        GROUP BY park_id, ride_id, local_day_of_week, local_hour
+    )
+
+    SELECT
+        *,
+        wait_sum / NULLIF(wait_sample_count, 0) as avg_wait,
+        KLL_QUANTILES.EXTRACT_POINT_INT64(wait_time_sketch, 0.5) as median_wait,
+        KLL_QUANTILES.EXTRACT_POINT_INT64(wait_time_sketch, 0.9) as p90_wait,
+        open_sum / NULLIF(sample_count, 0) as open_ratio,
+        CURRENT_TIMESTAMP() as updated_at
+    FROM folded
+) S
+ON T.park_id = S.park_id
+    AND T.ride_id = S.ride_id
+    AND T.local_day_of_week = S.local_day_of_week
+    AND T.local_hour = S.local_hour
+WHEN MATCHED THEN UPDATE SET
+    ride_name = S.ride_name,
+    avg_wait = S.avg_wait,
+    median_wait = S.median_wait,
+    p90_wait = S.p90_wait,
+    max_wait = S.max_wait,
+    open_ratio = S.open_ratio,
+    sample_count = S.sample_count,
+    hours_observed = S.hours_observed,
+    updated_at = S.updated_at,
+    wait_sum = S.wait_sum,
+    wait_sample_count = S.wait_sample_count,
+    open_sum = S.open_sum,
+    wait_time_sketch = S.wait_time_sketch,
+    last_hour_start = S.last_hour_start
+WHEN NOT MATCHED THEN
+    INSERT (
+        park_id, ride_id, ride_name, local_day_of_week, local_hour,
+        avg_wait, median_wait, p90_wait, max_wait, open_ratio, sample_count, hours_observed, updated_at,
+        wait_sum, wait_sample_count, open_sum, wait_time_sketch, last_hour_start
+    )
+    VALUES (
+        S.park_id, S.ride_id, S.ride_name, S.local_day_of_week, S.local_hour,
+        S.avg_wait, S.median_wait, S.p90_wait, S.max_wait, S.open_ratio, S.sample_count, S.hours_observed, S.updated_at,
+        S.wait_sum, S.wait_sample_count, S.open_sum, S.wait_time_sketch, S.last_hour_start
+    )
@@ -0,0 +1,63 @@
+-- Per park and local hour of the day: how often the park is open and how often its rides change
+WITH park_timezones AS (
+    SELECT
+        park_id,
+        ANY_VALUE(timezone) as timezone
+    FROM `{parks_table}`
+    WHERE timezone IS NOT NULL
+    GROUP BY park_id
+),
+
+-- One row per park snapshot, its ride states serialised so consecutive snapshots can be compared
+snapshots AS (
+    SELECT
+        q.park_id,
+        q.timestamp,
+        p.timezone,
+        LOGICAL_OR(q.is_open) as any_open,
+        TO_JSON_STRING(ARRAY_AGG(STRUCT(q.ride_id, q.is_open, q.wait_time) ORDER BY q.ride_id)) as state
+    FROM `{source_table}` q
+    JOIN park_timezones p USING (park_id)
+    WHERE q.timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {lookback_days} DAY)
+    GROUP BY q.park_id, q.timestamp, p.timezone
+),
+
+changes AS (
+    SELECT
+        park_id,
+        EXTRACT(HOUR FROM DATETIME(timestamp, timezone)) as local_hour,
+        any_open,
+        state IS DISTINCT FROM LAG(state) OVER w as changed,
+        -- Polling intervals since the park's previous snapshot, more than 1 when it was not polled every run.
+        -- NULL for the first snapshot of the window, which has nothing to be compared with.
+        -- Longer gaps (missed runs) are capped at the slowest tier
+        LEAST(
+            GREATEST(1, ROUND(TIMESTAMP_DIFF(timestamp, LAG(timestamp) OVER w, SECOND) / ({poll_interval_minutes} * 60))),
+            {max_poll_intervals}
+        ) as intervals
+    FROM snapshots
+    WINDOW w AS (PARTITION BY park_id ORDER BY timestamp)
+),
+
+hours AS (
+    SELECT
+        park_id,
+        local_hour,
+        AVG(IF(any_open, 1, 0)) as open_ratio,
+        -- Share of the compared snapshots that changed, each over `intervals` polling intervals
+        SAFE_DIVIDE(COUNTIF(changed AND intervals IS NOT NULL), COUNTIF(intervals IS NOT NULL)) as changed_ratio,
+        AVG(intervals) as mean_intervals,
+        COUNT(*) as samples
+    FROM changes
+    GROUP BY park_id, local_hour
+)
+
+-- change_ratio: probability that the park changes within one polling interval. A snapshot taken k intervals
+-- after the previous one changed with probability 1 - (1 - p)^k, so p does not depend on the park's tier
+SELECT
+    park_id,
+    local_hour,
+    open_ratio,
+    IFNULL(1 - POW(1 - changed_ratio, 1 / mean_intervals), 0) as change_ratio,
+    samples
+FROM hours
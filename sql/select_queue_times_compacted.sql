@@ -0,0 +1,21 @@
+-- Rides already compacted into Parquet (typed columns, no JSON parsing)
+UNION ALL
+SELECT
+    timestamp,
+    park_id,
+    land_id,
+    land_name,
+    ride_id,
+    ride_name,
+    is_open,
+    wait_time,
+    CASE
+        WHEN wait_time = 0 THEN 'None'
+        WHEN wait_time <= 15 THEN 'Short'
+        WHEN wait_time <= 45 THEN 'Medium'
+        WHEN wait_time > 45 THEN 'Long'
+        ELSE 'Unknown'
+    END as wait_time_category,
+    last_updated
+FROM `{compacted_table}`
+WHERE {compacted_filter}
@@ -0,0 +1,86 @@
+-- Queue Times rides of the raw Bronze partitions the partition filter selects, plus the
+-- compacted rides of the same window, flattened and typed with one row per key.
+-- Rendered once and wrapped by the full rebuild, the incremental MERGE and the backfill shards.
+WITH base AS (
+    SELECT
+        -- Construct Timestamp from the Hive partition columns
+        PARSE_TIMESTAMP('%Y-%m-%d %H:%M:%S', 
+            CONCAT(year, '-', month, '-', day, ' ', hour, ':', minute, ':00')
+        ) as timestamp,
+        CAST(park_id AS INT64) as park_id,
+        -- Columns are already native JSON in BigQuery
+        rides as rides_json,
+        lands as lands_json
+    FROM `{source_table}`
+    WHERE {partition_filter}
+),
+
+-- Pipeline A: Extract rides that are at the root level
+root_rides AS (
+    SELECT
+        timestamp,
+        park_id,
+        NULL as land_id,
+        "General" as land_name,
+        -- Extract scalars safely
+        CAST(JSON_VALUE(ride, '$.id') AS INT64) as ride_id,
+        JSON_VALUE(ride, '$.name') as ride_name,
+        CAST(JSON_VALUE(ride, '$.is_open') AS BOOL) as is_open,
+        CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) as wait_time,
+        -- Added logic to categorize the wait times
+        CASE
+            WHEN CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) = 0 THEN 'None'
+            WHEN CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) <= 15 THEN 'Short'
+            WHEN CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) <= 45 THEN 'Medium'
+            WHEN CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) > 45 THEN 'Long'
+            ELSE 'Unknown'
+        END as wait_time_category,
+        CAST(JSON_VALUE(ride, '$.last_updated') AS TIMESTAMP) as last_updated
+    FROM base,
+    -- Unnest directly using JSON_QUERY_ARRAY
+    UNNEST(JSON_QUERY_ARRAY(rides_json)) as ride
+),
+
+-- Pipeline B: Extract rides nested inside lands
+nested_rides AS (
+    SELECT
+        timestamp,
+        park_id,
+        CAST(JSON_VALUE(land, '$.id') AS INT64) as land_id,
+        JSON_VALUE(land, '$.name') as land_name,
+        CAST(JSON_VALUE(ride, '$.id') AS INT64) as ride_id,
+        JSON_VALUE(ride, '$.name') as ride_name,
+        CAST(JSON_VALUE(ride, '$.is_open') AS BOOL) as is_open,
+        CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) as wait_time,
+        -- Added logic to categorize the wait times
+        CASE
+            WHEN CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) = 0 THEN 'None'
+            WHEN CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) <= 15 THEN 'Short'
+            WHEN CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) <= 45 THEN 'Medium'
+            WHEN CAST(JSON_VALUE(ride, '$.wait_time') AS INT64) > 45 THEN 'Long'
+            ELSE 'Unknown'
+        END as wait_time_category,
+        CAST(JSON_VALUE(ride, '$.last_updated') AS TIMESTAMP) as last_updated
+    FROM base,
+    -- First Unnest: Get the lands
+    UNNEST(JSON_QUERY_ARRAY(lands_json)) as land,
+    -- Second Unnest: Get the rides inside the current land
+    UNNEST(JSON_QUERY_ARRAY(land, '$.rides')) as ride
+),
+
+-- Union them together
+all_rides AS (
+    SELECT * FROM root_rides
+    UNION ALL
+    SELECT * FROM nested_rides
+    {compacted_rides}
+)
+
+-- A window both raw and compacted (interrupted or late compaction, re-uploaded file)
+-- must not produce two rows for the same key
+SELECT * FROM all_rides
+WHERE TRUE
+QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY park_id, ride_id, timestamp
+    ORDER BY last_updated DESC
+) = 1
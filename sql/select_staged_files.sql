@@ -0,0 +1,4 @@
+-- Bronze objects already loaded into the staging table, within the days of the candidates
+SELECT DISTINCT source_file
+FROM `{source_table}`
+WHERE DATE(timestamp) BETWEEN '{first_day}' AND '{last_day}'
@@ -0,0 +1,20 @@
+MERGE `{dest_table}` T
+USING (
+    -- Only the Hive partitions written since the watermark
+    {rides}
+) S
+ON T.park_id = S.park_id
+    AND T.ride_id = S.ride_id
+    AND T.timestamp = S.timestamp
+    -- Prune the target scan to the partitions that can actually match
+    AND T.timestamp >= TIMESTAMP '{watermark}'
+WHEN MATCHED THEN UPDATE SET
+    land_id = S.land_id,
+    land_name = S.land_name,
+    ride_name = S.ride_name,
+    is_open = S.is_open,
+    wait_time = S.wait_time,
+    wait_time_category = S.wait_time_category,
+    last_updated = S.last_updated
+WHEN NOT MATCHED THEN
+    INSERT ROW
@@ -0,0 +1,64 @@
+-- Silver from the native staging table: typed, pre-flattened columns, no JSON parsing
+CREATE TABLE IF NOT EXISTS `{dest_table}` (
+    timestamp TIMESTAMP,
+    park_id INT64,
+    land_id INT64,
+    land_name STRING,
+    ride_id INT64,
+    ride_name STRING,
+    is_open BOOL,
+    wait_time INT64,
+    wait_time_category STRING,
+    last_updated TIMESTAMP
+)
+PARTITION BY DATE(timestamp);
+
+MERGE `{dest_table}` T
+USING (
+    WITH all_rides AS (
+        SELECT
+            timestamp,
+            park_id,
+            land_id,
+            land_name,
+            ride_id,
+            ride_name,
+            is_open,
+            wait_time,
+            CASE
+                WHEN wait_time = 0 THEN 'None'
+                WHEN wait_time <= 15 THEN 'Short'
+                WHEN wait_time <= 45 THEN 'Medium'
+                WHEN wait_time > 45 THEN 'Long'
+                ELSE 'Unknown'
+            END as wait_time_category,
+            last_updated
+        FROM `{source_table}`
+        -- Only the staging partitions written since the watermark are read
+        WHERE timestamp >= TIMESTAMP '{watermark}'
+        {compacted_rides}
+    )
+
+    -- Files compacted after being staged appear in both sources
+    SELECT * FROM all_rides
+    WHERE TRUE
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY park_id, ride_id, timestamp
+        ORDER BY last_updated DESC
+    ) = 1
+) S
+ON T.park_id = S.park_id
+    AND T.ride_id = S.ride_id
+    AND T.timestamp = S.timestamp
+    -- Prune the target scan to the partitions that can actually match
+    AND T.timestamp >= TIMESTAMP '{watermark}'
+WHEN MATCHED THEN UPDATE SET
+    land_id = S.land_id,
+    land_name = S.land_name,
+    ride_name = S.ride_name,
+    is_open = S.is_open,
+    wait_time = S.wait_time,
+    wait_time_category = S.wait_time_category,
+    last_updated = S.last_updated
+WHEN NOT MATCHED THEN
+    INSERT ROW
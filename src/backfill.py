@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from data_ingestion import settings
+from tools.logger import get_logger
+from tools.metrics import get_metrics
+
+logger = get_logger(__name__)
+metrics = get_metrics()
+
+
+def day_shards(start: date, end: date) -> List[date]:
+    """One shard per day (inclusive range): the Silver table is partitioned by day, so is Bronze."""
+    if end < start:
+        raise ValueError(f"Backfill range ends ({end}) before it starts ({start})")
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+class BigQueryBackfill:
+    """
+    Rebuilds each day with one query job into its partition of a shadow table
+    (WRITE_TRUNCATE on table$YYYYMMDD, so a re-run shard replaces its own output),
+    then swaps the days into Silver at once.
+    """
+    name = "bigquery"
+    # Shards wait on BigQuery jobs, threads are enough
+    executor_class = ThreadPoolExecutor
+
+    def __init__(self) -> None:
+        from data_transformation import DataTransformation
+        self.transformer = DataTransformation()
+        self.dest_table = f"{settings.GCP_PROJECT_ID}.{settings.DERIVED_DATASET}.{settings.QUEUE_TIMES_SILVER_TABLE}"
+        self.shadow_table = f"{self.dest_table}_backfill"
+
+    def fingerprint(self) -> str:
+        """Changes with the shard SQL: a checkpoint written by other SQL is not resumed."""
+        digest = hashlib.sha256()
+        for path in ("sql/select_queue_times_rides.sql", "sql/select_queue_times_compacted.sql"):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def shard_query(self, day: Optional[date]) -> str:
+        """Query of one day, or a query reading no partition when day is None (schema only)."""
+        from data_transformation import COMPACTED_PARTITION_COLUMNS, build_day_filter
+        if day is None:
+            return self.transformer.get_bronze_rides("FALSE", "")
+        return self.transformer.get_bronze_rides(
+            build_day_filter(day),
+            self.transformer.get_compacted_rides(None, build_day_filter(day, COMPACTED_PARTITION_COLUMNS))
+        )
+
+    def reset(self) -> None:
+        """Drops the shadow table of a previous, different backfill."""
+        self.transformer.client.delete_table(self.shadow_table, not_found_ok=True)
+
+    def prepare(self) -> None:
+        """Creates the shadow table with the schema of the new SQL before shards write to it concurrently."""
+        # The swapped days would lose the history the external table cannot read
+        from rewrite_legacy_bronze import ensure_no_legacy_objects
+        asyncio.run(ensure_no_legacy_objects())
+        self.transformer.setup_dataset(settings.GCP_PROJECT_ID, settings.DERIVED_DATASET, settings.BUCKET_LOCATION)
+        self.transformer.client.query(
+            f"CREATE TABLE IF NOT EXISTS `{self.shadow_table}` PARTITION BY DATE(timestamp) "
+            f"AS SELECT * FROM ({self.shard_query(None)})"
+        ).result()
+
+    def run_shard(self, day: date) -> int:
+        from google.cloud import bigquery
+        job_config = bigquery.QueryJobConfig(
+            destination=f"{self.shadow_table}${day.strftime('%Y%m%d')}",
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+            time_partitioning=bigquery.TimePartitioning(field="timestamp")
+        )
+        job = self.transformer.client.query(self.shard_query(day), job_config=job_config)
+        rows = job.result().total_rows
+        metrics.increment("bigquery_bytes_processed", job.total_bytes_processed or 0)
+        metrics.increment("bigquery_slot_ms", job.slot_millis or 0)
+        return rows
+
+    def swap(self, first_day: date, last_day: date, replace_table: bool) -> None:
+        """
+        Replaces the backfilled days of Silver in one transaction, or the whole table with a
+        copy job (new table, or replace_table). Both are atomic for readers.
+        """
+        from google.api_core.exceptions import NotFound
+        from google.cloud import bigquery
+        client = self.transformer.client
+        shadow = client.get_table(self.shadow_table)
+        try:
+            dest = client.get_table(self.dest_table)
+        except NotFound:
+            dest = None
+
+        if dest is None or replace_table:
+            logger.info(f"Replacing {self.dest_table} with {self.shadow_table}")
+            job_config = bigquery.CopyJobConfig(write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE)
+            client.copy_table(self.shadow_table, self.dest_table, job_config=job_config).result()
+        else:
+            new_schema = [(field.name, field.field_type) for field in shadow.schema]
+            if new_schema != [(field.name, field.field_type) for field in dest.schema]:
+                raise ValueError(f"{self.shadow_table} and {self.dest_table} schemas differ, set BACKFILL_REPLACE_TABLE to replace the table")
+            logger.info(f"Swapping {first_day} to {last_day} into {self.dest_table}")
+            client.query(self.transformer.get_sql(
+                "sql/backfill_swap.sql",
+                self.shadow_table,
+                self.dest_table,
+                first_day=first_day.isoformat(),
+                last_day=last_day.isoformat()
+            )).result()
+        client.delete_table(self.shadow_table, not_found_ok=True)
+
+        # The Gold rollups of the backfilled hours (and of every later hour) are recomputed
+        watermark = "1970-01-01 00:00:00+00" if dest is None or replace_table else f"{first_day.isoformat()} 00:00:00+00"
+        asyncio.run(self.refresh_gold(watermark))
+
+    async def refresh_gold(self, watermark_sql: str) -> None:
+        await self.transformer.transform_gold_hourly(watermark_sql)
+        # Hours already folded into the weekly profile changed: it is rebuilt
+        await self.transformer.transform_gold_profile(watermark_sql, rebuild=True)
+
+
+class LocalBackfill:
+    """
+    Rebuilds each day from the local Bronze mirror into its own Parquet file,
+    then swaps the days into the local Silver table with an atomic file replace.
+    """
+    name = "local"
+    # Flattening JSON is CPU bound: one process per shard
+    executor_class = ProcessPoolExecutor
+
+    def __init__(self, data_dir: Optional[str] = None, output_dir: Optional[str] = None) -> None:
+        self.data_dir = data_dir or settings.LOCAL_DATA_DIR
+        self.output_dir = Path(output_dir or settings.LOCAL_OUTPUT_DIR)
+        self.target = self.output_dir / f"{settings.QUEUE_TIMES_SILVER_TABLE}.parquet"
+        self.shadow_dir = self.output_dir / "_backfill" / settings.QUEUE_TIMES_SILVER_TABLE
+
+    def fingerprint(self) -> str:
+        return self.name
+
+    def reset(self) -> None:
+        shutil.rmtree(self.shadow_dir, ignore_errors=True)
+
+    def prepare(self) -> None:
+        self.shadow_dir.mkdir(parents=True, exist_ok=True)
+
+    def shard_path(self, day: date) -> Path:
+        return self.shadow_dir / f"day={day.isoformat()}.parquet"
+
+    def run_shard(self, day: date) -> int:
+        from local_transformation import LocalTransformation
+        rides = LocalTransformation(data_dir=self.data_dir).transform_queue_times(day)
+        # Written under a temporary name: a killed shard never leaves a partial file behind
+        path = self.shard_path(day)
+        temporary = path.with_suffix(".tmp")
+        rides.to_parquet(temporary, index=False)
+        os.replace(temporary, path)
+        return len(rides)
+
+    def swap(self, first_day: date, last_day: date, replace_table: bool) -> None:
+        days = day_shards(first_day, last_day)
+        rides = pd.concat([pd.read_parquet(self.shard_path(day)) for day in days], ignore_index=True)
+        if self.target.exists() and not replace_table:
+            existing = pd.read_parquet(self.target)
+            if list(existing.columns) != list(rides.columns):
+                raise ValueError(f"{self.target} and the backfilled days have different columns, set BACKFILL_REPLACE_TABLE to replace the table")
+            backfilled = existing["timestamp"].dt.date.between(first_day, last_day)
+            rides = pd.concat([existing[~backfilled], rides], ignore_index=True)
+
+        temporary = self.target.with_suffix(".tmp")
+        rides.to_parquet(temporary, index=False)
+        os.replace(temporary, self.target)
+        logger.info(f"Success: {settings.QUEUE_TIMES_SILVER_TABLE} now holds {len(rides)} rows ({self.target})")
+        self.reset()
+
+
+def _run_shard(engine: Any, day: date) -> Tuple[int, float]:
+    """Runs one shard in a worker, returns its row count and duration."""
+    start = time.perf_counter()
+    rows = engine.run_shard(day)
+    return rows, time.perf_counter() - start
+
+
+class Backfill:
+    """
+    Reprocesses a range of days of Silver queue times in parallel shards.
+    Completed shards are checkpointed: a re-run with the same range and SQL resumes,
+    and the Silver table only changes in the final swap.
+    """
+    def __init__(
+        self,
+        engine: Any,
+        start: date,
+        end: date,
+        concurrency: Optional[int] = None,
+        checkpoint_path: Optional[str] = None
+    ) -> None:
+        self.engine = engine
+        self.start = start
+        self.end = end
+        self.shards = day_shards(start, end)
+        self.concurrency = concurrency or settings.BACKFILL_CONCURRENCY
+        self.checkpoint_path = Path(checkpoint_path or settings.BACKFILL_CHECKPOINT_PATH)
+        self.identity = {
+            "engine": engine.name,
+            "table": settings.QUEUE_TIMES_SILVER_TABLE,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "fingerprint": engine.fingerprint(),
+        }
+
+    def load_checkpoint(self) -> Dict[str, int]:
+        """Rows of the shards completed by a previous run of the same backfill."""
+        if not self.checkpoint_path.exists():
+            return {}
+        checkpoint = json.loads(self.checkpoint_path.read_text())
+        if checkpoint.get("identity") != self.identity:
+            logger.warning(f"Checkpoint {self.checkpoint_path} belongs to another backfill, starting over")
+            return {}
+        return checkpoint["completed"]
+
+    def save_checkpoint(self, completed: Dict[str, int]) -> None:
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.checkpoint_path.with_suffix(".tmp")
+        temporary.write_text(json.dumps({"identity": self.identity, "completed": completed}, indent=2))
+        os.replace(temporary, self.checkpoint_path)
+
+    def executor(self) -> Executor:
+        return self.engine.executor_class(max_workers=self.concurrency)
+
+    def run(self, replace_table: Optional[bool] = None) -> Dict[str, Any]:
+        """Runs the pending shards, then swaps the range into Silver. Returns the run report."""
+        if replace_table is None:
+            replace_table = settings.BACKFILL_REPLACE_TABLE
+        started = time.perf_counter()
+
+        completed = self.load_checkpoint()
+        if not completed:
+            self.engine.reset()
+        self.engine.prepare()
+        pending = [day for day in self.shards if day.isoformat() not in completed]
+        logger.info(
+            f"Backfill of {self.start} to {self.end} ({self.engine.name}): {len(self.shards)} shards, "
+            f"{len(self.shards) - len(pending)} already done, {self.concurrency} at once"
+        )
+
+        rows = 0
+        failures: List[str] = []
+        with self.executor() as pool:
+            futures = {pool.submit(_run_shard, self.engine, day): day for day in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                day = futures[future]
+                try:
+                    shard_rows, seconds = future.result()
+                except Exception as e:
+                    failures.append(day.isoformat())
+                    logger.error(f"Backfill shard {day} failed: {e}")
+                    continue
+                completed[day.isoformat()] = shard_rows
+                self.save_checkpoint(completed)
+                rows += shard_rows
+
+                elapsed = time.perf_counter() - started
+                remaining = len(pending) - done
+                logger.info(
+                    f"Backfill {len(completed)}/{len(self.shards)}: {day} {shard_rows} rows in {seconds:.1f}s | "
+                    f"{rows / elapsed:,.0f} rows/s, ETA {elapsed / done * remaining:.0f}s"
+                )
+
+        metrics.increment("backfill_shards", len(pending) - len(failures))
+        metrics.increment("backfill_rows", rows)
+        if failures:
+            # Completed shards stay checkpointed: the next run only retries these
+            raise RuntimeError(f"{len(failures)}/{len(pending)} backfill shard(s) failed, re-run to resume: {', '.join(sorted(failures))}")
+
+        with metrics.stage("backfill_swap"):
+            self.engine.swap(self.start, self.end, replace_table)
+        self.checkpoint_path.unlink(missing_ok=True)
+
+        seconds = time.perf_counter() - started
+        report = {
+            "shards": len(self.shards),
+            "resumed_shards": len(self.shards) - len(pending),
+            "rows": sum(completed.values()),
+            "rows_this_run": rows,
+            "seconds": seconds,
+            "rows_per_second": rows / seconds if seconds else 0.0,
+        }
+        logger.info(
+            f"Backfill finished: {report['shards']} shards ({report['resumed_shards']} resumed), "
+            f"{report['rows']} rows in {seconds:.1f}s ({report['rows_per_second']:,.0f} rows/s)"
+        )
+        return report
+
+
+def get_engine() -> Any:
+    return LocalBackfill() if settings.TRANSFORM_BACKEND == "local" else BigQueryBackfill()
+
+
+if __name__ == "__main__":
+    if not settings.BACKFILL_START or not settings.BACKFILL_END:
+        raise SystemExit("Set BACKFILL_START and BACKFILL_END (YYYY-MM-DD)")
+    Backfill(
+        get_engine(),
+        date.fromisoformat(settings.BACKFILL_START),
+        date.fromisoformat(settings.BACKFILL_END)
+    ).run()
@@ -0,0 +1,205 @@
+import asyncio
+import io
+from datetime import datetime as dt, timedelta, timezone as tz
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from data_ingestion import settings
+from shared.bigquery_handler import BigQueryHandler
+from shared.gcs_handler import GCSHandler
+from shared.queue_times_records import (
+    RIDE_COLUMNS,
+    count_rides,
+    decode_bronze_object,
+    flatten_queue_times_payload,
+    parse_minute_partition,
+)
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+RAW_PREFIX = "layer=bronze/source=queue_times/"
+COMPACTED_PREFIX = "layer=bronze/source=queue_times_compacted/"
+
+# Key of a ride observation, used to drop rows read twice (e.g. after an interrupted run)
+RECORD_KEY = ["park_id", "ride_id", "timestamp"]
+
+
+def truncate(minute: dt, granularity: str) -> Tuple[dt, dt]:
+    """Returns the start and the (exclusive) end of the compaction window holding a minute."""
+    if granularity == "hour":
+        start = minute.replace(minute=0)
+        return start, start + timedelta(hours=1)
+    if granularity == "day":
+        start = minute.replace(hour=0, minute=0)
+        return start, start + timedelta(days=1)
+    raise ValueError(f"Unsupported compaction granularity: {granularity}")
+
+
+def compacted_path(window_start: dt, granularity: str) -> str:
+    """
+    Compacted files are always partitioned by day so hour and day files share one layout:
+    layer=bronze/source=queue_times_compacted/year=2025/month=11/day=22/hour-14.parquet
+    """
+    filename = f"hour-{window_start.hour:02d}.parquet" if granularity == "hour" else "day.parquet"
+    return (f"{COMPACTED_PREFIX}"
+        f"year={window_start.year}/"
+        f"month={window_start.month:02d}/"
+        f"day={window_start.day:02d}/"
+        f"{filename}")
+
+
+def encode_parquet(records: List[Dict[str, Any]], existing: Optional[bytes]) -> Tuple[bytes, int]:
+    """
+    Encodes ride records (merged with an already compacted file, if any) as Parquet.
+    Returns the file and its row count.
+    """
+    frame = pd.DataFrame.from_records(records, columns=list(RIDE_COLUMNS))
+    frame = frame.astype(RIDE_COLUMNS)
+    if existing is not None:
+        frame = pd.concat([pd.read_parquet(io.BytesIO(existing)), frame], ignore_index=True)
+    frame = frame.drop_duplicates(subset=RECORD_KEY, keep="last").sort_values(RECORD_KEY)
+
+    buffer = io.BytesIO()
+    frame.to_parquet(buffer, index=False, compression="snappy")
+    return buffer.getvalue(), len(frame)
+
+
+def record_keys(records: List[Dict[str, Any]], existing: Optional[bytes]) -> pd.MultiIndex:
+    """Distinct RECORD_KEY values of the new records and of the existing file: the rows the merged file must hold."""
+    keys = pd.DataFrame.from_records(records, columns=list(RIDE_COLUMNS))[RECORD_KEY]
+    keys = keys.astype({column: RIDE_COLUMNS[column] for column in RECORD_KEY})
+    if existing is not None:
+        keys = pd.concat([pd.read_parquet(io.BytesIO(existing), columns=RECORD_KEY), keys], ignore_index=True)
+    return pd.MultiIndex.from_frame(keys.drop_duplicates())
+
+
+def parquet_keys(content: bytes) -> pd.MultiIndex:
+    return pd.MultiIndex.from_frame(pd.read_parquet(io.BytesIO(content), columns=RECORD_KEY))
+
+
+def same_keys(left: pd.MultiIndex, right: pd.MultiIndex) -> bool:
+    return len(left) == len(right) and len(left.difference(right)) == 0
+
+
+class BronzeCompaction:
+    """
+    Rolls the closed minute partitions of the Queue Times Bronze layer into
+    one Parquet file per hour or per day, then deletes the original objects.
+    """
+    def __init__(self, gcs: Optional[GCSHandler] = None, bq: Optional[BigQueryHandler] = None) -> None:
+        self.gcs = gcs or GCSHandler(
+            project_id=settings.GCP_PROJECT_ID,
+            bucket_name=settings.BUCKET_NAME
+        )
+        self.bq = bq or BigQueryHandler(
+            project_id=settings.GCP_PROJECT_ID,
+            location=settings.BUCKET_LOCATION
+        )
+
+    def plan(self, paths: List[str], now: dt) -> Dict[dt, List[str]]:
+        """
+        Groups the Bronze objects by compaction window, keeping only the windows
+        closed for at least COMPACTION_GRACE_MINUTES.
+        """
+        grace = timedelta(minutes=settings.COMPACTION_GRACE_MINUTES)
+        windows: Dict[dt, List[str]] = {}
+        for path in paths:
+            minute = parse_minute_partition(path)
+            if minute is None:
+                logger.warning(f"Skipping object outside the minute layout: {path}")
+                continue
+            start, end = truncate(minute, settings.COMPACTION_GRANULARITY)
+            if end + grace <= now:
+                windows.setdefault(start, []).append(path)
+        return windows
+
+    async def compact_window(self, window_start: dt, paths: List[str], compacted: List[str]) -> None:
+        """Compacts one window, verifying the row counts before deleting the originals."""
+        loop = asyncio.get_running_loop()
+        target = compacted_path(window_start, settings.COMPACTION_GRANULARITY)
+
+        records: List[Dict[str, Any]] = []
+        expected_rows = 0
+        for path in paths:
+            minute = parse_minute_partition(path)
+            for payload in decode_bronze_object(path, await self.gcs.download_bytes(path)):
+                records.extend(flatten_queue_times_payload(payload, minute))
+                expected_rows += count_rides(payload)
+
+        if len(records) != expected_rows:
+            raise ValueError(f"{target}: flattened {len(records)} rows, payloads hold {expected_rows}")
+
+        # Late files of an already compacted window are merged into the existing file
+        existing = await self.gcs.download_bytes(target) if target in compacted else None
+
+        # Parquet encoding is CPU bound, keep it off the event loop
+        expected_keys = await loop.run_in_executor(None, record_keys, records, existing)
+        content, row_count = await loop.run_in_executor(None, encode_parquet, records, existing)
+        if row_count != len(expected_keys):
+            raise ValueError(f"{target}: encoded {row_count} rows, expected {len(expected_keys)} distinct records")
+
+        await self.gcs.upload_bytes(target, content, content_type="application/vnd.apache.parquet")
+
+        # Read the file back: the originals are only deleted once it holds exactly the expected records
+        uploaded_keys = await loop.run_in_executor(None, parquet_keys, await self.gcs.download_bytes(target))
+        if not same_keys(uploaded_keys, expected_keys):
+            raise ValueError(f"{target}: uploaded file holds {len(uploaded_keys)} rows that do not match the {len(expected_keys)} expected records")
+
+        await self.gcs.delete_blobs(paths)
+        logger.info(f"Compacted {len(paths)} object(s) ({len(records)} rows) into {target}")
+
+    def register_external_table(self) -> None:
+        """Registers the Parquet files as an external table read by the Silver transformation."""
+        self.bq.create_external_table_via_sql(
+            dataset_id=settings.RAW_DATASET,
+            table_id=settings.QUEUE_TIMES_COMPACTED_TABLE,
+            gcs_bucket=settings.BUCKET_NAME,
+            gcs_path_prefix=COMPACTED_PREFIX,
+            data_schema="""
+                timestamp TIMESTAMP,
+                park_id INT64,
+                land_id INT64,
+                land_name STRING,
+                ride_id INT64,
+                ride_name STRING,
+                is_open BOOL,
+                wait_time INT64,
+                last_updated TIMESTAMP
+            """,
+            partition_schema="""
+                year STRING,
+                month STRING,
+                day STRING
+            """,
+            file_pattern="*.parquet",
+            file_format="PARQUET"
+        )
+
+    async def run(self, now: Optional[dt] = None) -> int:
+        """Compacts every closed window. Returns the number of windows compacted."""
+        if now is None:
+            now = dt.now(tz.utc)
+        logger.info(f"Starting Bronze compaction ({settings.COMPACTION_GRANULARITY} granularity)...")
+
+        windows = self.plan(await self.gcs.list_blob_names(RAW_PREFIX), now)
+        compacted = await self.gcs.list_blob_names(COMPACTED_PREFIX)
+        if not windows:
+            logger.info("No closed partition to compact")
+            return 0
+
+        failures = 0
+        for window_start in sorted(windows):
+            try:
+                await self.compact_window(window_start, windows[window_start], compacted)
+            except Exception as e:
+                # The originals of a failed window are kept and retried on the next run
+                failures += 1
+                logger.error(f"Failed to compact window {window_start.isoformat()}: {e}")
+
+        self.register_external_table()
+        logger.info(f"Bronze compaction finished: {len(windows) - failures}/{len(windows)} window(s) compacted")
+        return len(windows) - failures
+
+
+if __name__ == "__main__":
+    asyncio.run(BronzeCompaction().run())
@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import io
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+import pandas as pd
+from google.api_core.exceptions import Conflict
+from google.cloud import bigquery
+from data_ingestion import settings
+from shared.gcs_handler import GCSHandler
+from shared.queue_times_records import (
+    RIDE_COLUMNS,
+    decode_bronze_object,
+    flatten_queue_times_payload,
+    parse_minute_partition,
+)
+from tools.logger import get_logger
+from tools.metrics import get_metrics
+
+logger = get_logger(__name__)
+metrics = get_metrics()
+
+RAW_PREFIX = "layer=bronze/source=queue_times/"
+
+STAGING_COLUMNS = {**RIDE_COLUMNS, "source_file": "string"}
+
+
+def encode_staging_batch(records: List[Dict[str, Any]]) -> bytes:
+    """Encodes flattened ride records (with their source_file) as one Parquet load file."""
+    frame = pd.DataFrame.from_records(records, columns=list(STAGING_COLUMNS)).astype(STAGING_COLUMNS)
+    buffer = io.BytesIO()
+    frame.to_parquet(buffer, index=False, compression="snappy")
+    return buffer.getvalue()
+
+
+def day_prefix(day: date) -> str:
+    """Raw objects of one day: layer=bronze/source=queue_times/year=2025/month=11/day=22/"""
+    return f"{RAW_PREFIX}year={day.year}/month={day.month:02d}/day={day.day:02d}/"
+
+
+def load_job_id(paths: List[str]) -> str:
+    """
+    Deterministic job ID of a batch: re-submitting the same files after a crash
+    conflicts with the first job instead of appending them twice.
+    """
+    digest = hashlib.sha256("\n".join(sorted(paths)).encode("utf-8")).hexdigest()[:32]
+    return f"stage_queue_times_{digest}"
+
+
+class BronzeStaging:
+    """
+    Appends the new raw Queue Times objects to a native staging table, partitioned by day
+    and clustered by (park_id, ride_id), with the rides already flattened and typed.
+    Batch load jobs are free, unlike queries over the external JSON table.
+    Every row keeps its source_file, which is how the files already loaded are recognised:
+    a load job is atomic, so a file is either fully staged or not at all. Objects without
+    rides leave no row and are recorded in the bucket instead. One run stages at a time
+    (lock in the bucket), so a load still running is never batched again by another run.
+    After a complete run the newest staged minute is kept as a watermark: later runs only
+    list (and look up in the table) the days from shortly before it.
+    """
+    def __init__(self, client: bigquery.Client, gcs: Optional[GCSHandler] = None) -> None:
+        self.client = client
+        self.gcs = gcs or GCSHandler(
+            project_id=settings.GCP_PROJECT_ID,
+            bucket_name=settings.BUCKET_NAME,
+            max_workers=settings.UPLOAD_CONCURRENCY
+        )
+        self.table_id = f"{settings.GCP_PROJECT_ID}.{settings.RAW_DATASET}.{settings.QUEUE_TIMES_STAGING_TABLE}"
+        self.lock_path = f"{settings.STAGING_STATE_PREFIX}lock.json"
+        self.watermark_path = f"{settings.STAGING_STATE_PREFIX}watermark.json"
+        self.empty_prefix = f"{settings.STAGING_STATE_PREFIX}empty/"
+
+    def _query(self, sql_path: str, **params: str) -> bigquery.table.RowIterator:
+        with open(sql_path, 'r') as f:
+            query = f.read().format(**params)
+        return self.client.query(query).result()
+
+    def ensure_table(self) -> None:
+        self._query("sql/create_queue_times_staging.sql", dest_table=self.table_id)
+
+    def staged_files(self, paths: List[str]) -> Set[str]:
+        """The candidates already present in the staging table (only their days are scanned)."""
+        days = sorted({minute.date() for minute in map(parse_minute_partition, paths) if minute is not None})
+        if not days:
+            return set()
+        rows = self._query(
+            "sql/select_staged_files.sql",
+            source_table=self.table_id,
+            first_day=days[0].isoformat(),
+            last_day=days[-1].isoformat()
+        )
+        return {row.source_file for row in rows}
+
+    async def acquire_lock(self) -> bool:
+        """Takes the run lock. False while another run holds it."""
+        content = json.dumps({"acquired_at": datetime.now(timezone.utc).isoformat()}).encode("utf-8")
+        if await self.gcs.create_if_absent(self.lock_path, content, "application/json"):
+            return True
+        # Generation first: the content read next is of this generation or a newer (fresher) one
+        generation = (await self.gcs.list_blob_versions(self.lock_path)).get(self.lock_path, (None, 0))[0]
+        holder = await self.gcs.download_text(self.lock_path)
+        if holder is None or generation is None:
+            # Released in the meantime
+            return await self.gcs.create_if_absent(self.lock_path, content, "application/json")
+        acquired_at = datetime.fromisoformat(json.loads(holder)["acquired_at"])
+        if datetime.now(timezone.utc) - acquired_at < timedelta(minutes=settings.STAGING_LOCK_TIMEOUT_MINUTES):
+            return False
+        # Left by a crashed run: its load jobs are long done and their rows visible.
+        # Only the run whose delete matches the stale generation takes it over; another run that
+        # read the same stale lock fails here instead of deleting the new holder's lock
+        if not await self.gcs.delete_if_generation(self.lock_path, generation):
+            return False
+        logger.warning(f"Taking over the staging lock acquired at {acquired_at.isoformat()}")
+        return await self.gcs.create_if_absent(self.lock_path, content, "application/json")
+
+    async def release_lock(self) -> None:
+        await self.gcs.delete_blobs([self.lock_path])
+
+    async def load_watermark(self) -> Optional[datetime]:
+        """Newest minute partition of the last complete run, None before the first one."""
+        content = await self.gcs.download_text(self.watermark_path)
+        return datetime.fromisoformat(json.loads(content)["minute"]) if content else None
+
+    async def candidates(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Raw objects that may not be staged yet: every object on the first run, then only the days
+        from STAGING_LATE_MINUTES before the watermark to today, one listing per day.
+        """
+        watermark = await self.load_watermark()
+        if watermark is None:
+            prefixes = [RAW_PREFIX]
+        else:
+            first = (watermark - timedelta(minutes=settings.STAGING_LATE_MINUTES)).date()
+            last = max((now or datetime.now(timezone.utc)).date(), first)
+            prefixes = [day_prefix(first + timedelta(days=offset)) for offset in range((last - first).days + 1)]
+        paths: List[str] = []
+        for prefix in prefixes:
+            paths.extend(path for path in await self.gcs.list_blob_names(prefix) if parse_minute_partition(path) is not None)
+        return paths
+
+    async def empty_files(self, paths: List[str]) -> Set[str]:
+        """
+        The candidates recorded as having no rides (only their days are listed). Records of
+        older days, whose raw objects are gone, are deleted.
+        """
+        days = {minute.date().isoformat() for minute in map(parse_minute_partition, paths) if minute is not None}
+        records = await self.gcs.list_blob_names(self.empty_prefix)
+        found: Set[str] = set()
+        expired = []
+        for record in records:
+            day = record[len(self.empty_prefix):].split("/", 1)[0]
+            if day in days:
+                found.update(json.loads(await self.gcs.download_text(record) or "{}").get("files", []))
+            elif days and day < min(days):
+                expired.append(record)
+        if expired:
+            await self.gcs.delete_blobs(expired)
+        return found
+
+    async def record_empty_files(self, paths: List[str], empty: List[str]) -> None:
+        """
+        Records the objects of a batch without rides, per day. Written after the load: if it is
+        lost, those objects are read again, which appends nothing.
+        """
+        by_day: Dict[str, List[str]] = defaultdict(list)
+        for path in empty:
+            by_day[parse_minute_partition(path).date().isoformat()].append(path)
+        for day, day_paths in by_day.items():
+            await self.gcs.upload_json_data(f"{self.empty_prefix}{day}/{load_job_id(paths)}.json", {"files": day_paths})
+
+    async def read_batch(self, paths: List[str]) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        for path in paths:
+            minute = parse_minute_partition(path)
+            for payload in decode_bronze_object(path, await self.gcs.download_bytes(path)):
+                for record in flatten_queue_times_payload(payload, minute):
+                    record["source_file"] = path
+                    records.append(record)
+        return records
+
+    async def load_batch(self, paths: List[str]) -> int:
+        """Loads one batch of objects with a single load job. Returns the number of rows appended."""
+        records = await self.read_batch(paths)
+        empty = sorted(set(paths) - {record["source_file"] for record in records})
+        if records:
+            await self._load_records(paths, records)
+        if empty:
+            # Objects without rides leave no source_file behind
+            await self.record_empty_files(paths, empty)
+        return len(records)
+
+    async def _load_records(self, paths: List[str], records: List[Dict[str, Any]]) -> None:
+        content = await asyncio.to_thread(encode_staging_batch, records)
+
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+        )
+        job_id = load_job_id(paths)
+        try:
+            job = await asyncio.to_thread(
+                self.client.load_table_from_file, io.BytesIO(content), self.table_id,
+                job_id=job_id, job_config=job_config
+            )
+        except Conflict:
+            # Same batch submitted by an interrupted run: wait for that job instead
+            logger.warning(f"Load job {job_id} already exists, not loading its files again")
+            job = await asyncio.to_thread(self.client.get_job, job_id)
+            if await asyncio.to_thread(job.done) and job.error_result:
+                # That attempt failed and appended nothing: load under a new ID
+                job = await asyncio.to_thread(
+                    self.client.load_table_from_file, io.BytesIO(content), self.table_id,
+                    job_id_prefix=f"{job_id}_retry_", job_config=job_config
+                )
+
+        delay = settings.TRANSFORM_POLL_SECONDS
+        while not await asyncio.to_thread(job.done):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.TRANSFORM_POLL_MAX_SECONDS)
+        await asyncio.to_thread(job.result)
+
+        metrics.increment("staging_rows_loaded", len(records))
+        metrics.increment("staging_bytes_loaded", len(content))
+
+    async def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Stages every raw object not loaded yet, in batches of STAGING_BATCH_FILES files.
+        Skipped while another run stages: Silver then merges what is already staged.
+        """
+        if not await self.acquire_lock():
+            logger.warning("Another run is staging the Bronze objects, staging skipped")
+            return {"files": 0, "rows": 0}
+        try:
+            return await self._run(now)
+        finally:
+            await self.release_lock()
+
+    async def _run(self, now: Optional[datetime]) -> Dict[str, int]:
+        await asyncio.to_thread(self.ensure_table)
+        paths = await self.candidates(now)
+        staged = await asyncio.to_thread(self.staged_files, paths) if paths else set()
+        if paths:
+            staged |= await self.empty_files(paths)
+        pending = sorted(path for path in paths if path not in staged)
+        if not pending:
+            logger.info("No new Bronze object to stage")
+            await self.save_watermark(paths)
+            return {"files": 0, "rows": 0}
+
+        size = settings.STAGING_BATCH_FILES
+        batches = [pending[start:start + size] for start in range(0, len(pending), size)]
+        semaphore = asyncio.Semaphore(settings.STAGING_LOAD_CONCURRENCY)
+
+        async def load(batch: List[str]) -> int:
+            async with semaphore:
+                return await self.load_batch(batch)
+
+        results = await asyncio.gather(*(load(batch) for batch in batches), return_exceptions=True)
+        failed = [result for result in results if isinstance(result, Exception)]
+        files = sum(len(batch) for batch, result in zip(batches, results) if not isinstance(result, Exception))
+        rows = sum(result for result in results if not isinstance(result, Exception))
+        metrics.increment("staging_files_loaded", files)
+        logger.info(f"Staged {files} object(s), {rows} rows, in {len(batches) - len(failed)} load job(s)")
+        if failed:
+            # The files of the failed batches are not in the table and are picked up next time
+            raise RuntimeError(f"{len(failed)}/{len(batches)} staging load job(s) failed: {failed[0]}")
+        await self.save_watermark(paths)
+        return {"files": files, "rows": rows}
+
+    async def save_watermark(self, paths: List[str]) -> None:
+        """Moves the watermark to the newest candidate, once every candidate is staged."""
+        if not paths:
+            return
+        newest = max(parse_minute_partition(path) for path in paths)
+        await self.gcs.upload_json_data(self.watermark_path, {"minute": newest.isoformat()})
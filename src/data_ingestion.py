@@ -1,21 +1,128 @@
-import asyncio
-import json
+import os
 from typing import List, Dict, Any, Optional
 import httpx
+from pydantic import ValidationError
 from pydantic_settings import BaseSettings
-from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type, before_log
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception, before_log, RetryCallState
 from datetime import datetime as dt, timezone as tz
-from tools.logger import get_logger
+import time
+from tools.logger import get_logger, log_context
+from tools.metrics import get_metrics
+from shared.adaptive_limiter import AdaptiveLimiter, parse_retry_after
 from shared.gcs_handler import GCSHandler
+from shared.park_state import ParkState, payload_hash
+from shared.queue_times_codec import QueueTimesPayload, decode_queue_times
 
 logger = get_logger(__name__)
+metrics = get_metrics()
 
 class Settings(BaseSettings):
     # --- API SETTINGS ---
     BASE_API_URL: str = "https://queue-times.com/"
     PARKS_ENDPOINT: str = "parks.json"
     QUEUE_TIMES_ENDPOINT: str = "parks/{park_id}/queue_times.json"
+    # Initial number of requests in flight, adapted between the bounds below (AIMD)
     CONCURRENCY_LIMIT: int = 10
+    CONCURRENCY_MIN: int = 2
+    CONCURRENCY_MAX: int = 50
+    # Responses slower than this (seconds) shrink the concurrency limit
+    LATENCY_TARGET_SECONDS: float = 2.0
+    # Jittered exponential backoff between retries (seconds), unless the API sends Retry-After
+    RETRY_BACKOFF_BASE: float = 0.5
+    RETRY_BACKOFF_MAX: float = 30.0
+    
+    # --- HTTP CLIENT SETTINGS ---
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    # HTTP/2 requires the h2 package (httpx[http2])
+    HTTP2: bool = False
+    KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    
+    # --- BRONZE SNAPSHOT SETTINGS ---
+    # Number of gzip NDJSON objects the queue times of one run are written to
+    SNAPSHOT_SHARDS: int = 1
+    # A shard is split into several objects once its compressed part reaches this size
+    SNAPSHOT_PART_MAX_BYTES: int = 8 * 1024 * 1024
+    
+    # --- STREAMING PIPELINE SETTINGS ---
+    # Payloads waiting to be encoded (back-pressures the fetches)
+    PIPELINE_QUEUE_SIZE: int = 100
+    # Parallel uploads, also the size of the GCS thread and connection pools
+    UPLOAD_CONCURRENCY: int = 4
+    
+    # --- BRONZE COMPACTION SETTINGS ---
+    # "hour" or "day": how many minute partitions are merged into one Parquet file
+    COMPACTION_GRANULARITY: str = "hour"
+    # Only partitions closed for at least this long are compacted (late files must have landed)
+    COMPACTION_GRACE_MINUTES: int = 120
+    
+    # --- CHANGE DETECTION SETTINGS ---
+    # Skip the parks whose payload did not change since the last run. Off by default: Bronze and Silver
+    # then only hold changes, which biases every per-row aggregate downstream (see README)
+    CHANGE_DETECTION: bool = False
+    # "gcs" (object in BUCKET_NAME) or "local" (file on disk)
+    PARK_STATE_BACKEND: str = "gcs"
+    PARK_STATE_PATH: str = "state/queue_times_park_state.json"
+    
+    # --- POLLING SCHEDULER SETTINGS ---
+    # Poll closed or static parks less often, based on their local time and learned activity
+    POLLING_SCHEDULER: bool = False
+    # Cadence of the scheduled runs, used to stagger the parks polled every N runs
+    POLL_INTERVAL_MINUTES: int = 5
+    POLL_STATIC_EVERY_RUNS: int = 3
+    POLL_CLOSED_EVERY_RUNS: int = 12
+    # A local hour counts as open when at least this share of its snapshots had an open ride
+    POLL_OPEN_RATIO_MIN: float = 0.2
+    # An open park is active when its rides change in at least this share of the polling intervals of a local hour
+    POLL_ACTIVE_CHANGE_RATIO: float = 0.3
+    # Local opening hours assumed for parks without history
+    POLL_DEFAULT_OPEN_HOUR: int = 8
+    POLL_DEFAULT_CLOSE_HOUR: int = 23
+    POLL_PROFILE_LOOKBACK_DAYS: int = 28
+    POLL_PROFILE_REFRESH_HOURS: int = 24
+    POLL_PROFILE_PATH: str = "state/park_activity_profiles.json"
+    
+    # --- RIDE SERIES STORE SETTINGS ---
+    # Keep the recent readings of every ride in memory (latest value, rolling mean, EWMA)
+    SERIES_STORE: bool = False
+    # Fixed capacity: rides tracked and samples kept per ride (~11 bytes per sample)
+    SERIES_STORE_MAX_RIDES: int = 20000
+    SERIES_STORE_WINDOW: int = 288
+    SERIES_STORE_EWMA_HALFLIFE_SECONDS: float = 900.0
+    # Local .npz snapshot restored at startup and written after each run (empty: memory only)
+    SERIES_STORE_SNAPSHOT_PATH: str = "state/ride_series.npz"
+    
+    # --- RIDE HISTORY ARCHIVE SETTINGS ---
+    # Also write the local Silver queue times as a run-length encoded archive (changes only)
+    HISTORY_ARCHIVE: bool = False
+    # Samples further apart than this start a new run: the gap stays empty when decoding
+    HISTORY_ARCHIVE_MAX_GAP_SECONDS: int = 900
+    
+    # --- DAEMON SETTINGS ---
+    # "job" (one run per execution) or "daemon" (cycles on a fixed cadence in one process)
+    RUN_MODE: str = "job"
+    DAEMON_INTERVAL_SECONDS: float = 300.0
+    # The parks list is re-fetched (and written to Bronze) at most this often in daemon mode
+    PARKS_LIST_REFRESH_MINUTES: int = 60
+    
+    # --- SHARDED INGESTION SETTINGS ---
+    # Parks are split across workers by consistent hashing. Cloud Run jobs set both per task
+    CLOUD_RUN_TASK_INDEX: int = 0
+    CLOUD_RUN_TASK_COUNT: int = 1
+    # Name of the job execution, shared by its tasks
+    CLOUD_RUN_EXECUTION: str = ""
+    # Local alternative: worker processes started by one job (1: no pool)
+    INGESTION_WORKERS: int = 1
+    SHARD_VIRTUAL_NODES: int = 256
+    # Completion markers of the shards of a run: the last shard to finish triggers the transformation
+    SHARD_MARKER_PREFIX: str = "state/ingestion_shards/"
+    # A run still incomplete this long after it started lost a worker: the next finishing shard transforms it
+    SHARD_RUN_TIMEOUT_MINUTES: int = 60
+    
+    # --- METRICS SETTINGS ---
+    # Local folder of the JSON run reports and of the Prometheus text file
+    METRICS_DIR: str = "metrics"
+    # Bucket prefix the JSON run reports are also kept under (empty: local only)
+    METRICS_GCS_PREFIX: str = "metrics/run_reports/"
     
     # --- GCP INFRASTRUCTURE ---
     GCP_PROJECT_ID: str = "amusement-park-wait-time"
@@ -29,38 +136,216 @@ class Settings(BaseSettings):
     # Table Configs
     QUEUE_TIMES_RAW_TABLE: str = "queue_times"
     QUEUE_TIMES_SILVER_TABLE: str = "queue_times_cleaned"
+    QUEUE_TIMES_COMPACTED_TABLE: str = "queue_times_compacted"
+    QUEUE_TIMES_STAGING_TABLE: str = "queue_times_staging"
     
     PARKS_METADATA_RAW_TABLE: str = "parks_metadata"
     PARKS_METADATA_SILVER_TABLE: str = "parks_metadata_cleaned"
+    
+    # --- BIGQUERY SETTINGS (Gold Layer) ---
+    GOLD_DATASET: str = "amusement_park_gold"
+    GOLD_RIDE_HOURLY_TABLE: str = "ride_wait_hourly"
+    GOLD_RIDE_PROFILE_TABLE: str = "ride_wait_weekly_profile"
+    
+    # --- BRONZE STAGING SETTINGS ---
+    # Load the new raw objects into a native staging table (batch load jobs) and build
+    # Silver from it, instead of querying the external JSON table
+    STAGING_LOAD: bool = False
+    # Objects per load job (BigQuery allows 1,500 load jobs per table and day)
+    STAGING_BATCH_FILES: int = 500
+    STAGING_LOAD_CONCURRENCY: int = 4
+    # Run lock, staged-minute watermark and record of the objects without rides, in the bucket
+    STAGING_STATE_PREFIX: str = "state/staging/"
+    # A lock older than this was left by a crashed run and is taken over
+    STAGING_LOCK_TIMEOUT_MINUTES: int = 60
+    # Only the raw days from this long before the newest staged minute on are listed again
+    # (uploads still landing in an earlier minute are staged by the next run)
+    STAGING_LATE_MINUTES: int = 60
+    
+    # --- TRANSFORMATION JOBS ---
+    # BigQuery job state polling: first delay, doubled up to the max (seconds)
+    TRANSFORM_POLL_SECONDS: float = 1.0
+    TRANSFORM_POLL_MAX_SECONDS: float = 10.0
+    
+    # --- TRANSFORMATION BACKEND ---
+    # "bigquery" (SQL jobs) or "local" (in-process pandas/Arrow over a local Bronze mirror)
+    TRANSFORM_BACKEND: str = "bigquery"
+    LOCAL_DATA_DIR: str = "data"
+    LOCAL_OUTPUT_DIR: str = "data/silver"
+    # Mirror the Bronze objects from GCS before a local transformation
+    LOCAL_DOWNLOAD_BRONZE: bool = True
+    
+    # Rebuild the Silver tables from the whole Bronze history (e.g. after a schema change)
+    # instead of merging only the partitions written since the last watermark
+    FULL_REBUILD: bool = False
+    
+    # --- BACKFILL SETTINGS ---
+    # Days (YYYY-MM-DD, inclusive) of Silver queue times rebuilt by src/backfill.py, one shard per day
+    BACKFILL_START: str = ""
+    BACKFILL_END: str = ""
+    # Shards processed at once (BigQuery jobs in threads, local shards in processes)
+    BACKFILL_CONCURRENCY: int = 8
+    # Completed shards, so an interrupted backfill resumes where it stopped
+    BACKFILL_CHECKPOINT_PATH: str = "state/backfill_checkpoint.json"
+    # Replace the whole Silver table with the backfilled days (needed when its schema changes)
+    BACKFILL_REPLACE_TABLE: bool = False
 
 settings = Settings()
 
+# Rate limiting and server errors are retried, other HTTP errors (e.g. 404) are not
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def _is_retryable(exception: BaseException) -> bool:
+    if isinstance(exception, httpx.HTTPStatusError):
+        return exception.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exception, httpx.RequestError)
+
+_jittered_backoff = wait_random_exponential(multiplier=settings.RETRY_BACKOFF_BASE, max=settings.RETRY_BACKOFF_MAX)
+
+def _wait_before_retry(retry_state: RetryCallState) -> float:
+    """Honours the Retry-After header of the failed response, jittered exponential backoff otherwise."""
+    exception = retry_state.outcome.exception()
+    if isinstance(exception, httpx.HTTPStatusError):
+        retry_after = parse_retry_after(exception.response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return min(retry_after, settings.RETRY_BACKOFF_MAX)
+    return _jittered_backoff(retry_state)
+
+def _count_retry(retry_state: RetryCallState) -> None:
+    metrics.increment("fetch_retries")
+
+def build_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    HTTP client whose connection pool matches the concurrency bounds of the limiter.
+    A transport (e.g. httpx.MockTransport) replaces the network, for local benchmarks.
+    """
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=settings.HTTP_TIMEOUT_SECONDS,
+        http2=settings.HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.CONCURRENCY_MAX,
+            max_keepalive_connections=settings.CONCURRENCY_MAX,
+            keepalive_expiry=settings.KEEPALIVE_EXPIRY_SECONDS
+        )
+    )
+
 class DataIngestion():
-    def __init__(self):
-        # Semaphore to control concurrency
-        self.semaphore = asyncio.Semaphore(settings.CONCURRENCY_LIMIT)
-        # Init GCS Handler
-        self.gcs = GCSHandler(
+    def __init__(self, gcs: Optional[GCSHandler] = None):
+        # Adaptive limit on the requests in flight
+        self.limiter = AdaptiveLimiter(
+            initial_limit=settings.CONCURRENCY_LIMIT,
+            min_limit=settings.CONCURRENCY_MIN,
+            max_limit=settings.CONCURRENCY_MAX,
+            latency_target=settings.LATENCY_TARGET_SECONDS
+        )
+        # Init GCS Handler (a stand-in with the same interface can be injected)
+        self.gcs = gcs or GCSHandler(
             project_id=settings.GCP_PROJECT_ID,
-            bucket_name=settings.BUCKET_NAME
+            bucket_name=settings.BUCKET_NAME,
+            max_workers=settings.UPLOAD_CONCURRENCY
         )
+        # Per park validators and content hashes of the last written payloads
+        self.park_state = ParkState()
+        # Number of parks skipped during the current run because nothing changed
+        self.skipped_parks = 0
+        # Recent readings of every ride, fed with the new payloads as they arrive
+        self.series_store = None
+        if settings.SERIES_STORE:
+            # NumPy is only imported when the store is enabled
+            from shared.ride_series_store import RideSeriesStore
+            self.series_store = RideSeriesStore(
+                max_rides=settings.SERIES_STORE_MAX_RIDES,
+                window=settings.SERIES_STORE_WINDOW,
+                ewma_halflife_seconds=settings.SERIES_STORE_EWMA_HALFLIFE_SECONDS
+            )
         
+    async def _get(self, client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """Single request holding a limiter slot, its latency and status drive the limit"""
+        async with self.limiter.slot():
+            start = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            latency = time.perf_counter() - start
+        metrics.observe("fetch_seconds", latency)
+        # Bytes on the wire: still compressed when the API sent a Content-Encoding
+        metrics.increment("api_bytes_downloaded", response.num_bytes_downloaded)
+        metrics.increment(f"fetch_status_{response.status_code}")
+        
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            self.limiter.on_overload(latency, parse_retry_after(response.headers.get("Retry-After")))
+        else:
+            self.limiter.on_success(latency)
+        # Lazy %-formatting: the message is only built if the record is kept
+        logger.debug("%s answered %s in %.3fs (limit %s)", url, response.status_code, latency, self.limiter.limit)
+        
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+    
 # Fetch the list of parks
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        retry=retry_if_exception_type(httpx.RequestError),
+        wait=_wait_before_retry,
+        retry=retry_if_exception(_is_retryable),
         before=before_log(logger=logger, log_level=1),
+        before_sleep=_count_retry,
         )
     async def _fetch_url(self, client: httpx.AsyncClient, url: str) -> Dict[str, Any]:
         """Fetch a URL asynchronously with retries"""
-        logger.info(f"Fetching URL: {url}")
-        response = await client.get(url)
-        response.raise_for_status()
+        logger.info("Fetching URL: %s", url)
+        response = await self._get(client, url)
         return response.json()
     
     
-    async def process_parks_metadata(self, client: httpx.AsyncClient) -> List[Dict[str, Any]]:
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=_wait_before_retry,
+        retry=retry_if_exception(_is_retryable),
+        before=before_log(logger=logger, log_level=1),
+        before_sleep=_count_retry,
+        )
+    async def _fetch_url_conditional(self, client: httpx.AsyncClient, url: str, headers: Dict[str, str]) -> httpx.Response:
+        """Fetch a URL asynchronously with retries, a 304 Not Modified is returned as is"""
+        logger.info("Fetching URL: %s", url)
+        return await self._get(client, url, headers)
+    
+    async def load_park_state(self) -> None:
+        """Loads the change detection state written by the previous run."""
+        if settings.PARK_STATE_BACKEND == "local":
+            self.park_state = ParkState.load_local(settings.PARK_STATE_PATH)
+        else:
+            content = await self.gcs.download_text(settings.PARK_STATE_PATH)
+            self.park_state = ParkState.from_json(content) if content else ParkState()
+        self.skipped_parks = 0
+    
+    async def save_park_state(self) -> None:
+        """Commits the hashes of the parks written in this run (call once the snapshot is stored)."""
+        self.park_state.commit()
+        if settings.PARK_STATE_BACKEND == "local":
+            self.park_state.save_local(settings.PARK_STATE_PATH)
+        else:
+            await self.gcs.upload_json_data(settings.PARK_STATE_PATH, self.park_state.parks)
+    
+    def load_series_store(self) -> None:
+        """Restores the ride series snapshot, if any, so a restart keeps the recent history."""
+        path = settings.SERIES_STORE_SNAPSHOT_PATH
+        if self.series_store is None or not path or not os.path.exists(path):
+            return
+        try:
+            self.series_store = type(self.series_store).restore(path)
+        except Exception as e:
+            logger.error(f"Failed to restore the ride series snapshot: {e}")
+    
+    def save_series_store(self) -> None:
+        if self.series_store is not None and settings.SERIES_STORE_SNAPSHOT_PATH:
+            self.series_store.snapshot(settings.SERIES_STORE_SNAPSHOT_PATH)
+    
+    def _record_series(self, data: QueueTimesPayload) -> None:
+        if self.series_store is not None:
+            readings = [(ride.id, ride.wait_time, ride.is_open) for ride in data.iter_rides()]
+            self.series_store.append_rides(data.park_id, readings, dt.now(tz.utc))
+    
+    async def process_parks_metadata(self, client: httpx.AsyncClient, upload: bool = True) -> List[Dict[str, Any]]:
         # Construct the URL
         url = settings.BASE_API_URL + settings.PARKS_ENDPOINT
         logger.info(f"Fetching URL: {url}")
@@ -68,11 +353,12 @@ class DataIngestion():
         try:
             data = await self._fetch_url(client, url)
             
-            # Save data to GCS
-            source = "parks_metadata"
-            filename = "parks_list.json"
-            path = self._generate_path(source=source, filename=filename)
-            await self.gcs.upload_json_data(path, data)
+            # Save data to GCS (in sharded runs, only one worker does)
+            if upload:
+                source = "parks_metadata"
+                filename = "parks_list.json"
+                path = self._generate_path(source=source, filename=filename)
+                await self.gcs.upload_json_data(path, data)
             
             # Return the list of parks as raw JSON
             return data
@@ -80,42 +366,69 @@ class DataIngestion():
             logger.error(f"An unexpected error occurred: {e}")
             return []
         
-    async def process_single_queue_time(self, client: httpx.AsyncClient, park_id: int) -> List[Dict[str, Any]]:
+    async def process_single_queue_time(self, client: httpx.AsyncClient, park_id: int) -> Optional[QueueTimesPayload]:
         # Construct the URL
         url = settings.BASE_API_URL + settings.QUEUE_TIMES_ENDPOINT.format(park_id=park_id)
-        logger.info(f"Fetching URL: {url}")
         
-        async with self.semaphore:
-            try:
-                data = await self._fetch_url(client, url)
-                
-                if isinstance(data, dict):
-                    data["park_id"] = park_id
-                
-                # Save data to GCS
-                if data:
-                    source = "queue_times"
-                    filename = f"park_{park_id}.json"
-                    path = self._generate_path(source=source, filename=filename)
-                    await self.gcs.upload_json_data(path, data)
-                
+        with log_context(park_id=park_id):
+            return await self._process_single_queue_time(client, park_id, url)
+    
+    async def _process_single_queue_time(self, client: httpx.AsyncClient, park_id: int, url: str) -> Optional[QueueTimesPayload]:
+        try:
+            if not settings.CHANGE_DETECTION:
+                response = await self._fetch_url_conditional(client, url, {})
+                data = decode_queue_times(response.content, park_id)
+                self._record_series(data)
                 return data
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 404:
-                    logger.warning(f"Park with ID {park_id} not found. Skipping.")
-                    return []
-                else:
-                    logger.error(f"Fetch queue faile for park ID {park_id}: {e}")
-            except Exception as e:
-                logger.error(f"An unexpected error occurred for park ID {park_id}: {e}")
-    
-    def _generate_path(self, source: str, filename: str) -> str:
+            
+            response = await self._fetch_url_conditional(client, url, self.park_state.conditional_headers(park_id))
+            if response.status_code == 304:
+                logger.info("Park %s not modified. Skipping.", park_id)
+                self.skipped_parks += 1
+                return None
+            # Decoded and validated straight from the body, without an intermediate dict tree
+            data = decode_queue_times(response.content, park_id)
+            
+            # The API does not always send validators, the content hash catches the rest
+            content_hash = payload_hash(data.ndjson_line())
+            if self.park_state.is_unchanged(park_id, content_hash):
+                logger.info("Park %s unchanged since last run. Skipping.", park_id)
+                self.skipped_parks += 1
+                return None
+            self.park_state.stage(
+                park_id,
+                content_hash,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+            self._record_series(data)
+            
+            # The payload is uploaded with the rest of the run by the StreamingIngestion stages
+            return data
+        except ValidationError as e:
+            metrics.increment("payloads_invalid")
+            first = e.errors()[0]
+            logger.error(
+                "Invalid queue times payload for park ID %s: %s error(s), first at %s: %s",
+                park_id, e.error_count(), first["loc"], first["msg"]
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                logger.warning("Park with ID %s not found. Skipping.", park_id)
+                return None
+            else:
+                logger.error("Fetch queue faile for park ID %s: %s", park_id, e)
+        except Exception as e:
+            logger.error("An unexpected error occurred for park ID %s: %s", park_id, e)
+    
+    def _generate_path(self, source: str, filename: str, now: Optional[dt] = None) -> str:
         """
         Creates a Hive-style partition path:
         layer=bronze/source=queue_times/year=2025/month=11/day=22/hour=14/filename.json
         """
         
-        now = dt.now(tz.utc)
+        if now is None:
+            now = dt.now(tz.utc)
         
         filepath = (f"layer=bronze/"
             f"source={source}/"
@@ -1,81 +1,321 @@
-from tools.logger import get_logger
+from tools.logger import get_logger, set_log_context
+from tools.metrics import get_metrics, start_run_metrics
 import asyncio
-from data_ingestion import DataIngestion, Settings
-from data_transformation import DataTransformation
+import math
+import signal
+import time
+from typing import Any, Dict, List, Optional
 import httpx
+from data_ingestion import DataIngestion, settings, build_http_client
+from ingestion_pipeline import StreamingIngestion
+from polling_scheduler import PollingScheduler
+from shared.park_sharding import ConsistentHashRing, ShardAssignment, ShardCoordinator
 
 logger = get_logger(__name__)
-
-# Init settings
-settings = Settings()
+metrics = get_metrics()
 
 class DataOrchestration:
-    def __init__(self, data_ingestion: "DataIngestion") -> None:
+    def __init__(
+        self,
+        data_ingestion: "DataIngestion",
+        transformer: Optional[Any] = None,
+        http_transport: Optional[httpx.AsyncBaseTransport] = None,
+        shard: Optional[ShardAssignment] = None
+    ) -> None:
         self.data_ingestion = data_ingestion
-        self.transformer = DataTransformation()
+        # Replaces the network for local runs (e.g. httpx.MockTransport)
+        self.http_transport = http_transport
+        self.streaming = StreamingIngestion(data_ingestion)
+        self.scheduler = PollingScheduler(data_ingestion.gcs)
+        # Both backends expose `async run_dag(full_rebuild=None)`, built on first use
+        self._transformer = transformer
+        # Startup work a daemon only does once (bucket check, park state load)
+        self.bucket_ready = False
+        self.park_state_loaded = False
+        # Transformation of the last cycle that wrote data, awaited unless running as a daemon
+        self.transform_task: Optional[asyncio.Task] = None
+        self.background_transforms = False
+        # Last parks.json payload and when it was fetched (monotonic seconds)
+        self.parks_cache: List[Dict[str, Any]] = []
+        self.parks_fetched_at: Optional[float] = None
+        # Sharded runs: this worker only polls the parks the ring assigns to it
+        self.shard = shard
+        self.ring = ConsistentHashRing(shard.count, settings.SHARD_VIRTUAL_NODES) if shard else None
+        self.coordinator = ShardCoordinator(
+            data_ingestion.gcs, settings.SHARD_MARKER_PREFIX, shard, settings.SHARD_RUN_TIMEOUT_MINUTES
+        ) if shard else None
+        if shard:
+            self.streaming.worker = shard.index
         logger.info("DataOrchestration initialized")
     
-    async def run_pipeline(self) -> None:
+    @property
+    def transformer(self) -> Any:
+        """
+        The transformation backend. Its module (BigQuery client or pandas) is only imported
+        when a run actually transforms, which keeps it out of the job's startup.
+        """
+        if self._transformer is None:
+            if settings.TRANSFORM_BACKEND == "local":
+                from local_transformation import LocalTransformation
+                self._transformer = LocalTransformation()
+            else:
+                from data_transformation import DataTransformation
+                self._transformer = DataTransformation()
+        return self._transformer
+    
+    async def run_pipeline(self, client: Optional[httpx.AsyncClient] = None, cycle_drift: Optional[float] = None) -> None:
+        """One ingestion run. A daemon passes its warm client and how late the cycle started."""
+        # Own metrics per run: a background transformation keeps writing to its cycle's report
+        run_metrics = start_run_metrics()
+        # Every record of this run (and of the tasks it spawns) carries the run_id
+        set_log_context(run_id=run_metrics.started_at.strftime("%Y%m%dT%H%M%SZ"))
+        if cycle_drift is not None:
+            metrics.observe("cycle_drift_seconds", cycle_drift)
+        previous_transform = self.transform_task
+        try:
+            with metrics.stage("total"):
+                if client is not None:
+                    await self._run_pipeline(client)
+                else:
+                    async with build_http_client(self.http_transport) as client:
+                        await self._run_pipeline(client)
+        finally:
+            # A transformation started in the background exports the report once it is done
+            if not (self.background_transforms and self.transform_task is not previous_transform):
+                await self.export_metrics()
+    
+    async def run_daemon(self, interval_seconds: Optional[float] = None, max_cycles: Optional[int] = None) -> None:
+        """
+        Runs a cycle every interval_seconds in this process, reusing the HTTP, GCS and BigQuery
+        clients, the park state and the cached parks list. Cycles are scheduled on a fixed grid:
+        a late cycle does not shift the next ones, and cycles missed entirely are skipped.
+        Transformations run in the background while the next cycles ingest.
+        SIGTERM / SIGINT let the current cycle and transformation finish, then the loop exits.
+        """
+        interval = interval_seconds or settings.DAEMON_INTERVAL_SECONDS
+        loop = asyncio.get_running_loop()
+        stopping = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stopping.set)
+
+        self.background_transforms = True
+        logger.info(f"Daemon started, one cycle every {interval:.0f}s")
+        started = loop.time()
+        slot = cycles = 0
+        try:
+            async with build_http_client(self.http_transport) as client:
+                while not stopping.is_set():
+                    drift = loop.time() - (started + slot * interval)
+                    logger.info(f"Cycle {cycles + 1} starting ({drift:.3f}s after its slot)")
+                    try:
+                        await self.run_pipeline(client, cycle_drift=drift)
+                    except Exception as e:
+                        # One failed cycle must not stop the daemon
+                        logger.error(f"Cycle {cycles + 1} failed: {e}")
+                    cycles += 1
+
+                    # Next slot of the grid still ahead
+                    next_slot = math.ceil((loop.time() - started) / interval)
+                    if next_slot > slot + 1:
+                        logger.warning(f"Cycle overran the interval, {next_slot - slot - 1} slot(s) skipped")
+                    slot = max(slot + 1, next_slot)
+                    if max_cycles is not None and cycles >= max_cycles:
+                        break
+                    try:
+                        await asyncio.wait_for(stopping.wait(), timeout=started + slot * interval - loop.time())
+                    except asyncio.TimeoutError:
+                        pass
+            if self.transform_task is not None and not self.transform_task.done():
+                logger.info("Waiting for the running transformation before stopping")
+                await self.transform_task
+        finally:
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(signum)
+            self.background_transforms = False
+        logger.info(f"Daemon stopped after {cycles} cycle(s)")
+    
+    async def run_transformation(self) -> None:
+        logger.info("Starting to transform data")
+        try:
+            with metrics.stage("transformation"):
+                # Neither backend blocks the event loop: warehouse jobs are polled, in-process work runs in a thread
+                await self.transformer.run_dag()
+        except Exception as e:
+            logger.error(f"Failed to transform data: {e}")
+    
+    async def transform_and_export(self) -> None:
+        """Background transformation of a daemon cycle, then the report of that cycle."""
+        try:
+            await self.run_transformation()
+        finally:
+            await self.export_metrics()
+    
+    async def get_parks(self, client: httpx.AsyncClient) -> List[Dict[str, Any]]:
+        """parks.json, fetched again once the cached list is older than PARKS_LIST_REFRESH_MINUTES."""
+        max_age = settings.PARKS_LIST_REFRESH_MINUTES * 60
+        if self.parks_cache and self.parks_fetched_at is not None and time.monotonic() - self.parks_fetched_at < max_age:
+            logger.info(f"Using the cached parks list ({len(self.parks_cache)} groups)")
+            return self.parks_cache
+        # One copy of parks.json per run in Bronze, even when sharded
+        parks = await self.data_ingestion.process_parks_metadata(client, upload=self.shard is None or self.shard.index == 0)
+        if parks:
+            self.parks_cache, self.parks_fetched_at = parks, time.monotonic()
+        return parks
+    
+    async def complete_shard(self, parks_written: int) -> None:
+        coordinator = self.coordinator
+        run_parks_written = await coordinator.finish(parks_written)
+        # Runs a dead worker left incomplete would otherwise never be transformed
+        stale_runs = await coordinator.claim_stale_runs()
+        if stale_runs:
+            logger.warning(f"Claimed {stale_runs} incomplete run(s) older than {settings.SHARD_RUN_TIMEOUT_MINUTES} minutes")
+        if run_parks_written is None and not coordinator.claimed_folders:
+            logger.info(f"Shard {self.shard.index + 1}/{self.shard.count} done, the last shard to finish transforms")
+            return
+        if run_parks_written is not None:
+            logger.info(f"All {self.shard.count} shards of run {self.shard.run_id} done, {run_parks_written} parks written")
+        if run_parks_written or stale_runs:
+            await self.run_transformation()
+        else:
+            logger.warning("No new or changed queue times. Transformation skipped.")
+        try:
+            await coordinator.cleanup()
+        except Exception as e:
+            # Another shard deleted them first: the next claim retries what is left
+            logger.warning(f"Failed to delete the shard markers: {e}")
+    
+    async def export_metrics(self) -> None:
+        """Writes the run report (JSON) and the Prometheus file, and keeps the report in the bucket."""
+        try:
+            report_path = metrics.write(settings.METRICS_DIR, suffix=f"_worker{self.shard.index:04d}" if self.shard else "")
+            logger.info(f"Run report written to {report_path}")
+            if settings.METRICS_GCS_PREFIX:
+                await self.data_ingestion.gcs.upload_json_data(settings.METRICS_GCS_PREFIX + report_path.name, metrics.report())
+        except Exception as e:
+            logger.error(f"Failed to export the run metrics: {e}")
+    
+    async def _run_pipeline(self, client: httpx.AsyncClient) -> None:
         logger.info("Starting data ingestion pipeline")
         
-        # 0. Access GCS Handler
-        await self.data_ingestion.gcs.create_bucket_if_not_exists(
-            location=settings.BUCKET_LOCATION
-        )
+        # 0. Access GCS Handler (checked once per process)
+        if not self.bucket_ready:
+            await self.data_ingestion.gcs.create_bucket_if_not_exists(
+                location=settings.BUCKET_LOCATION
+            )
+            self.bucket_ready = True
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # 1. Get list of the parks
-            parks = await self.data_ingestion.process_parks_metadata(client)
+        # Register with the run before writing anything
+        if self.shard:
+            await self.coordinator.join()
+        
+        # Load the hashes of the payloads written by the previous run
+        # (a daemon keeps them in memory between cycles)
+        if settings.CHANGE_DETECTION and not self.park_state_loaded:
+            await self.data_ingestion.load_park_state()
+            self.park_state_loaded = True
+        # Changes staged by an earlier cycle that failed before its snapshot was written
+        self.data_ingestion.park_state.discard()
+        self.data_ingestion.skipped_parks = 0
+        
+        # Recent ride readings kept from the previous run (file read off the event loop)
+        if self.data_ingestion.series_store is not None and not self.data_ingestion.series_store.index:
+            await asyncio.to_thread(self.data_ingestion.load_series_store)
+        
+        # 1. Get list of the parks
+        with metrics.stage("parks_metadata"):
+            parks = await self.get_parks(client)
+
+        if not parks:
+            logger.error("Failed to fetch parks metadata.")
+            return
+        logger.info(f"Success to fetch parks metadata")
+        
+        # 2. Extract IDs from the parks list
+        park_ids = []
+        for group in parks:
+            # Check if this group has a 'parks' list (Group or Company)
+            if "parks" in group:
+                group_name = group.get("name", "Unknown Group")
+                for park in group["parks"]:
+                    if "id" in park:
+                        park_ids.append(park["id"])
+            # flat park at the root level (Standalone park)
+            elif "id" in group:
+                park_ids.append(group["id"])
+        
+        # Data validation
+        logger.info("Parsing task complete here are some info:")
+        logger.info(f"Total Individual Parks found: {len(park_ids)}")
+        logger.info(f"Sample IDs: {park_ids[:5]}...")
+        
+        # Only poll the parks the schedule selects for this run
+        if settings.POLLING_SCHEDULER:
+            await self.scheduler.load_profiles()
+            park_ids = self.scheduler.select_parks(parks)
+            logger.info(f"Parks polled this run: {len(park_ids)}")
+        
+        if self.shard:
+            park_ids = self.ring.shard(park_ids, self.shard.index)
+            logger.info(f"Shard {self.shard.index + 1}/{self.shard.count} of run {self.shard.run_id}: {len(park_ids)} parks")
+        
+        # 3. Stream the queue times through the fetch -> encode -> upload stages
+        logger.info(f"Starting the streaming fetch for {len(park_ids)} parks")
+        try:
+            with metrics.stage("ingestion"):
+                summary = await self.streaming.run(client, park_ids, now=self.shard.snapshot_time if self.shard else None)
+        except Exception as e:
+            logger.error(f"Failed to write queue times snapshot: {e}")
+            return
+        parks_written = summary["parks_written"]
+        metrics.increment("parks_polled", len(park_ids))
+        metrics.increment("parks_written", parks_written)
+        metrics.increment("parks_skipped_unchanged", self.data_ingestion.skipped_parks)
+        
+        # Result validation
+        logger.info(f"Pipeline finished. Successfully retrieved {parks_written}/{len(park_ids)} queue datasets.")
+        logger.info(f"Unchanged parks skipped: {self.data_ingestion.skipped_parks}/{len(park_ids)}")
+        logger.info(f"Fetch concurrency: {self.data_ingestion.limiter.stats()}")
+        
+        # 4. Only now are the new payloads safely in Bronze
+        if parks_written and settings.CHANGE_DETECTION:
+            try:
+                await self.data_ingestion.save_park_state()
+            except Exception as e:
+                logger.error(f"Failed to save park state: {e}")
 
-            if not parks:
-                logger.error("Failed to fetch parks metadata.")
-                return
-            logger.info(f"Success to fetch parks metadata")
-            
-            # 2. Extract IDs from the parks list
-            park_ids = []
-            for group in parks:
-                # Check if this group has a 'parks' list (Group or Company)
-                if "parks" in group:
-                    group_name = group.get("name", "Unknown Group")
-                    for park in group["parks"]:
-                        if "id" in park:
-                            park_ids.append(park["id"])
-                # flat park at the root level (Standalone park)
-                elif "id" in group:
-                    park_ids.append(group["id"])
-            
-            # Data validation
-            logger.info("Parsing task complete here are some info:")
-            logger.info(f"Total Individual Parks found: {len(park_ids)}")
-            logger.info(f"Sample IDs: {park_ids[:5]}...")
-            
-            # 3. Create the async task for queue times
-            tasks = []
-            for park_id in park_ids:
-                tasks.append(self.data_ingestion.process_single_queue_time(client, park_id))
-            
-            # 4. Run all tasks
-            logger.info(f"Starting the async fetch for {len(tasks)} parks")
-            results = await asyncio.gather(*tasks)
-            
-            # Result validation
-            valid_results = [r for r in results if r]
-            logger.info(f"Pipeline finished. Successfully retrieved {len(valid_results)}/{len(park_ids)} queue datasets.")
+        if parks_written and self.data_ingestion.series_store is not None:
+            try:
+                # Multi-MB write: off the event loop, where a daemon's transformation is polling
+                await asyncio.to_thread(self.data_ingestion.save_series_store)
+            except Exception as e:
+                logger.error(f"Failed to save the ride series snapshot: {e}")
 
-            # 5. Transform data
-            if valid_results:
-                logger.info("Starting to transform data")
-                try:
-                    self.transformer.process_all()
-                except Exception as e:
-                    logger.error(f"Failed to setup dataset: {e}")
-            else:
-                logger.warning("No valid results found. Transformation skipped.")   
+        # 5. Transform data
+        if self.shard:
+            # Only the last shard of the run to finish transforms, for all of them
+            await self.complete_shard(parks_written)
+        elif not parks_written:
+            logger.warning("No new or changed queue times. Transformation skipped.")
+        elif self.transform_task is not None and not self.transform_task.done():
+            # The incremental transformation picks this cycle's partitions up next time
+            logger.warning("Previous transformation still running. Transformation skipped.")
+        elif self.background_transforms:
+            # A daemon goes on with the next cycles while the warehouse jobs finish
+            self.transform_task = asyncio.create_task(self.transform_and_export())
+        else:
+            self.transform_task = asyncio.create_task(self.run_transformation())
+            await self.transform_task
                 
         logger.info(f"Pipeline finished successfully with {len(park_ids)} parks")
 
 if __name__ == "__main__":
-    ingestion = DataIngestion()
-    orchestrator = DataOrchestration(ingestion)
-    asyncio.run(orchestrator.run_pipeline())
\ No newline at end of file
+    if settings.RUN_MODE != "daemon" and (settings.CLOUD_RUN_TASK_COUNT > 1 or settings.INGESTION_WORKERS > 1):
+        from sharded_ingestion import run_sharded
+        run_sharded()
+    else:
+        ingestion = DataIngestion()
+        orchestrator = DataOrchestration(ingestion)
+        if settings.RUN_MODE == "daemon":
+            asyncio.run(orchestrator.run_daemon())
+        else:
+            asyncio.run(orchestrator.run_pipeline())
\ No newline at end of file
@@ -1,22 +1,70 @@
+import asyncio
 from google.cloud import bigquery
 from google.api_core.exceptions import NotFound
 from tools.logger import get_logger
-from data_ingestion import Settings
+from tools.metrics import get_metrics
+from data_ingestion import settings
+from transform_dag import TransformDAG, TransformStep
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
 import os
 
 logger = get_logger(__name__)
+metrics = get_metrics()
 
 
-# Load settings
-settings = Settings()
+# Hive partition columns of the Bronze layer, from the coarsest to the finest
+PARTITION_COLUMNS = ("year", "month", "day", "hour", "minute")
+
+# Compacted Parquet files are only partitioned down to the day
+COMPACTED_PARTITION_COLUMNS = PARTITION_COLUMNS[:3]
+
+def build_partition_filter(watermark: datetime, columns: Tuple[str, ...] = PARTITION_COLUMNS) -> str:
+    """
+    Builds a SQL predicate selecting the Hive partitions at or after the watermark.
+    Partition values are zero-padded strings, so a lexicographic comparison on each
+    column is equivalent to a chronological one and lets BigQuery prune the files.
+    """
+    values = (
+        f"{watermark.year}",
+        f"{watermark.month:02d}",
+        f"{watermark.day:02d}",
+        f"{watermark.hour:02d}",
+        f"{watermark.minute:02d}",
+    )[:len(columns)]
+
+    # Innermost level: the watermark partition itself is re-read (the MERGE is idempotent)
+    predicate = f"{columns[-1]} >= '{values[-1]}'"
+    for column, value in reversed(list(zip(columns[:-1], values[:-1]))):
+        predicate = f"({column} > '{value}' OR ({column} = '{value}' AND {predicate}))"
+
+    # The leading year filter is redundant but gives the planner a trivial prune
+    return f"year >= '{values[0]}' AND {predicate}"
+
+def build_day_filter(day: date, columns: Tuple[str, ...] = PARTITION_COLUMNS) -> str:
+    """SQL predicate selecting the Hive partitions of one day (year, month and day columns)."""
+    year, month, day_column = columns[:3]
+    return f"{year} = '{day.year}' AND {month} = '{day.month:02d}' AND {day_column} = '{day.day:02d}'"
 
 class DataTransformation():
-    def __init__(self):
-        self.client = bigquery.Client(project=settings.GCP_PROJECT_ID)
-        
+    def __init__(self, client: Optional[bigquery.Client] = None):
+        # Built on the first query: runs that skip the transformation never pay for it
+        # (a stand-in with the same interface can be injected)
+        self._client: Optional[bigquery.Client] = client
+        # Datasets already checked by this instance (a daemon checks them once)
+        self.ready_datasets: Set[str] = set()
+
+    @property
+    def client(self) -> bigquery.Client:
+        if self._client is None:
+            self._client = bigquery.Client(project=settings.GCP_PROJECT_ID)
+        return self._client
+
     def setup_dataset(self, project_id: str, dataset_id: str, location: str) -> None:
         """Ensures the destination dataset exists."""
         dataset_id = f"{project_id}.{dataset_id}"
+        if dataset_id in self.ready_datasets:
+            return
         try:
             self.client.get_dataset(dataset_id)
             logger.info(f"Dataset {dataset_id} already exists")
@@ -26,49 +74,267 @@ class DataTransformation():
             dataset.location = location
             self.client.create_dataset(dataset)
             logger.info(f"Dataset created successfully")
+        self.ready_datasets.add(dataset_id)
 
-    def get_sql(self, path: str, source_table: str, dest_table: str) -> str:
+    def get_sql(self, path: str, source_table: str, dest_table: str, **params: str) -> str:
         with open(path, 'r') as f:
             query = f.read()
-        return query.format(source_table=source_table, dest_table=dest_table)
-    
-    def run_query(self, sql_path: str, source_table_name: str, dest_table_name: str):
-        # Construct full table IDs
-        source_full = f"{settings.GCP_PROJECT_ID}.{settings.RAW_DATASET}.{source_table_name}"
-        dest_full = f"{settings.GCP_PROJECT_ID}.{settings.DERIVED_DATASET}.{dest_table_name}"
-        
+        return query.format(source_table=source_table, dest_table=dest_table, **params)
+
+    async def wait_for_job(self, job: bigquery.QueryJob) -> None:
+        """Polls the job state from a thread with a growing delay, then raises the job error if any."""
+        delay = settings.TRANSFORM_POLL_SECONDS
+        while not await asyncio.to_thread(job.done):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.TRANSFORM_POLL_MAX_SECONDS)
+        await asyncio.to_thread(job.result)
+
+    async def run_query(
+        self,
+        sql_path: str,
+        source_table_name: str,
+        dest_table_name: str,
+        source_dataset: Optional[str] = None,
+        dest_dataset: Optional[str] = None,
+        **params: str
+    ):
+        # Construct full table IDs (Bronze -> Silver unless other datasets are given)
+        source_full = f"{settings.GCP_PROJECT_ID}.{source_dataset or settings.RAW_DATASET}.{source_table_name}"
+        dest_full = f"{settings.GCP_PROJECT_ID}.{dest_dataset or settings.DERIVED_DATASET}.{dest_table_name}"
+
         # Prepare SQL (Injecting source and destination table names)
-        query = self.get_sql(sql_path, source_full, dest_full)
-        
+        query = self.get_sql(sql_path, source_full, dest_full, **params)
+
         logger.info(f"Running transformation: {source_table_name} -> {dest_table_name}")
         try:
-            job = self.client.query(query)
-            job.result() # Wait for completion
-            destination_table = self.client.get_table(dest_full)
-            logger.info(f"Success: Loaded {destination_table.num_rows} rows into {dest_table_name}")
+            with metrics.stage(f"transform_{dest_table_name}"):
+                job = await asyncio.to_thread(self.client.query, query)
+                await self.wait_for_job(job)
+            metrics.increment("bigquery_bytes_processed", job.total_bytes_processed or 0)
+            metrics.increment("bigquery_slot_ms", job.slot_millis or 0)
+            destination_table = await asyncio.to_thread(self.client.get_table, dest_full)
+            logger.info(f"Success: {dest_table_name} now holds {destination_table.num_rows} rows")
         except Exception as e:
             logger.error(f"Transformation failed: {e}")
             raise
 
-    def process_all(self):
-        """Main entry point to run all transformations"""
-        logger.info("Starting Silver Layer Transformation...")
-        
-        # Ensure target dataset exists
-        self.setup_dataset(project_id=settings.GCP_PROJECT_ID, dataset_id=settings.DERIVED_DATASET, location=settings.BUCKET_LOCATION)
-        
-        # 1. Transform Queue Times
-        logger.info("Transforming Queue Times...")
-        self.run_query(
-            sql_path="sql/transform_queue_times.sql",
+    def get_watermark(self, dest_table_name: str, column: str = "timestamp", dataset: Optional[str] = None) -> Optional[datetime]:
+        """
+        Returns the latest snapshot timestamp already present in a Silver (or Gold) table.
+        None means the table is missing or empty and must be fully built.
+        """
+        dest_full = f"{settings.GCP_PROJECT_ID}.{dataset or settings.DERIVED_DATASET}.{dest_table_name}"
+        try:
+            rows = self.client.query(f"SELECT MAX({column}) AS watermark FROM `{dest_full}`").result()
+        except NotFound:
+            logger.info(f"Table {dest_full} not found, no watermark available")
+            return None
+        return next(iter(rows)).watermark
+
+    def get_compacted_rides(self, watermark: Optional[datetime], compacted_filter: Optional[str] = None) -> str:
+        """
+        Returns the SQL branch reading the compacted Parquet rides, or an empty string
+        while the compaction job has not registered its external table yet.
+        An explicit compacted_filter replaces the one derived from the watermark.
+        """
+        compacted_full = f"{settings.GCP_PROJECT_ID}.{settings.RAW_DATASET}.{settings.QUEUE_TIMES_COMPACTED_TABLE}"
+        try:
+            self.client.get_table(compacted_full)
+        except NotFound:
+            return ""
+
+        if compacted_filter is None and watermark is None:
+            compacted_filter = "TRUE"
+        elif compacted_filter is None:
+            compacted_filter = (f"{build_partition_filter(watermark, COMPACTED_PARTITION_COLUMNS)} "
+                f"AND timestamp >= TIMESTAMP '{watermark.strftime('%Y-%m-%d %H:%M:%S+00')}'")
+
+        with open("sql/select_queue_times_compacted.sql", 'r') as f:
+            return f.read().format(compacted_table=compacted_full, compacted_filter=compacted_filter)
+
+    def get_bronze_rides(self, partition_filter: str, compacted_rides: str) -> str:
+        """
+        The flattened, deduplicated Queue Times rides of the selected Bronze partitions
+        (sql/select_queue_times_rides.sql), wrapped by the rebuild, MERGE and backfill statements.
+        """
+        source_full = f"{settings.GCP_PROJECT_ID}.{settings.RAW_DATASET}.{settings.QUEUE_TIMES_RAW_TABLE}"
+        return self.get_sql(
+            "sql/select_queue_times_rides.sql", source_full, "",
+            partition_filter=partition_filter, compacted_rides=compacted_rides
+        )
+
+    def get_park_activity(self, lookback_days: int) -> List[Dict[str, Any]]:
+        """Per park and local hour open ratio and change ratio per polling interval (sql/park_activity_profile.sql)."""
+        query = self.get_sql(
+            "sql/park_activity_profile.sql",
+            source_table=f"{settings.GCP_PROJECT_ID}.{settings.DERIVED_DATASET}.{settings.QUEUE_TIMES_SILVER_TABLE}",
+            dest_table="",
+            parks_table=f"{settings.GCP_PROJECT_ID}.{settings.DERIVED_DATASET}.{settings.PARKS_METADATA_SILVER_TABLE}",
+            lookback_days=str(lookback_days),
+            poll_interval_minutes=str(settings.POLL_INTERVAL_MINUTES),
+            max_poll_intervals=str(settings.POLL_CLOSED_EVERY_RUNS)
+        )
+        return [dict(row.items()) for row in self.client.query(query).result()]
+
+    async def transform_queue_times(self, full_rebuild: bool) -> None:
+        """
+        Loads the Queue Times Silver table.
+        Incremental runs only read the Bronze partitions written since the watermark
+        and MERGE them on (park_id, ride_id, timestamp).
+        """
+        watermark = None if full_rebuild else await asyncio.to_thread(self.get_watermark, settings.QUEUE_TIMES_SILVER_TABLE)
+
+        if settings.STAGING_LOAD:
+            await self.transform_queue_times_staged(watermark)
+            return
+
+        if watermark is None:
+            # CREATE OR REPLACE: history the external table cannot read would be lost
+            from rewrite_legacy_bronze import ensure_no_legacy_objects
+            await ensure_no_legacy_objects()
+            logger.info("Full rebuild of Queue Times from the whole Bronze history")
+            await self.run_query(
+                sql_path="sql/transform_queue_times.sql",
+                source_table_name=settings.QUEUE_TIMES_RAW_TABLE,
+                dest_table_name=settings.QUEUE_TIMES_SILVER_TABLE,
+                rides=self.get_bronze_rides("TRUE", await asyncio.to_thread(self.get_compacted_rides, None))
+            )
+            return
+
+        logger.info(f"Incremental merge of Queue Times from watermark {watermark.isoformat()}")
+        await self.run_query(
+            sql_path="sql/transform_queue_times_incremental.sql",
             source_table_name=settings.QUEUE_TIMES_RAW_TABLE,
-            dest_table_name=settings.QUEUE_TIMES_SILVER_TABLE
+            dest_table_name=settings.QUEUE_TIMES_SILVER_TABLE,
+            rides=self.get_bronze_rides(
+                build_partition_filter(watermark), await asyncio.to_thread(self.get_compacted_rides, watermark)
+            ),
+            watermark=watermark.strftime("%Y-%m-%d %H:%M:%S+00")
+        )
+
+    async def transform_queue_times_staged(self, watermark: Optional[datetime]) -> None:
+        """
+        MERGEs the staging rows since the watermark (all of them without one) into Silver:
+        typed columns, pruned by the staging table partitions, no JSON parsing.
+        """
+        watermark_sql = watermark.strftime("%Y-%m-%d %H:%M:%S+00") if watermark else "1970-01-01 00:00:00+00"
+        logger.info(f"Merge of the staged Queue Times from {watermark_sql}")
+        await self.run_query(
+            sql_path="sql/transform_queue_times_staged.sql",
+            source_table_name=settings.QUEUE_TIMES_STAGING_TABLE,
+            dest_table_name=settings.QUEUE_TIMES_SILVER_TABLE,
+            compacted_rides=await asyncio.to_thread(self.get_compacted_rides, watermark),
+            watermark=watermark_sql
+        )
+
+    def get_gold_watermark(self, full_rebuild: bool = False) -> str:
+        """
+        The Gold rollups are refreshed from the Silver rows of the hours at or after the
+        last hour already aggregated (that hour may have been partial). A full rebuild re-aggregates every hour.
+        """
+        watermark = None if full_rebuild else self.get_watermark(settings.GOLD_RIDE_HOURLY_TABLE, column="hour_start", dataset=settings.GOLD_DATASET)
+        return watermark.strftime("%Y-%m-%d %H:%M:%S+00") if watermark else "1970-01-01 00:00:00+00"
+
+    async def transform_gold_hourly(self, watermark_sql: str) -> None:
+        logger.info(f"Refreshing Gold rollups from {watermark_sql}")
+        await self.run_query(
+            sql_path="sql/gold_ride_wait_hourly.sql",
+            source_table_name=settings.QUEUE_TIMES_SILVER_TABLE,
+            dest_table_name=settings.GOLD_RIDE_HOURLY_TABLE,
+            source_dataset=settings.DERIVED_DATASET,
+            dest_dataset=settings.GOLD_DATASET,
+            parks_table=f"{settings.GCP_PROJECT_ID}.{settings.DERIVED_DATASET}.{settings.PARKS_METADATA_SILVER_TABLE}",
+            watermark=watermark_sql
+        )
+
+    async def transform_gold_profile(self, watermark_sql: str, rebuild: bool = False) -> None:
+        """
+        Folds the hours finished since the watermark into the weekly profile cells.
+        A rebuild (e.g. after past hours changed) folds the whole hourly table again.
+        """
+        await self.run_query(
+            sql_path="sql/gold_ride_wait_weekly_profile.sql",
+            source_table_name=settings.GOLD_RIDE_HOURLY_TABLE,
+            dest_table_name=settings.GOLD_RIDE_PROFILE_TABLE,
+            source_dataset=settings.GOLD_DATASET,
+            dest_dataset=settings.GOLD_DATASET,
+            watermark=watermark_sql,
+            rebuild="TRUE" if rebuild else "FALSE"
         )
-        
-        # 2. Transform Parks Metadata
-        logger.info("Transforming Parks Metadata...")
-        self.run_query(
-            sql_path="sql/transform_parks_metadata.sql",
-            source_table_name=settings.PARKS_METADATA_RAW_TABLE,
-            dest_table_name=settings.PARKS_METADATA_SILVER_TABLE
-        )
\ No newline at end of file
+
+    def build_dag(self, full_rebuild: bool) -> TransformDAG:
+        """
+        Silver queue times and parks metadata only depend on Bronze and run concurrently,
+        the Gold rollups wait for both. With STAGING_LOAD, Silver queue times waits for the staging load.
+        """
+        def table(dataset: str, name: str) -> str:
+            return f"{dataset}.{name}"
+
+        raw_queue_times = table(settings.RAW_DATASET, settings.QUEUE_TIMES_RAW_TABLE)
+        raw_compacted = table(settings.RAW_DATASET, settings.QUEUE_TIMES_COMPACTED_TABLE)
+        raw_staging = table(settings.RAW_DATASET, settings.QUEUE_TIMES_STAGING_TABLE)
+        raw_parks = table(settings.RAW_DATASET, settings.PARKS_METADATA_RAW_TABLE)
+        silver_queue_times = table(settings.DERIVED_DATASET, settings.QUEUE_TIMES_SILVER_TABLE)
+        silver_parks = table(settings.DERIVED_DATASET, settings.PARKS_METADATA_SILVER_TABLE)
+        gold_hourly = table(settings.GOLD_DATASET, settings.GOLD_RIDE_HOURLY_TABLE)
+        gold_profile = table(settings.GOLD_DATASET, settings.GOLD_RIDE_PROFILE_TABLE)
+
+        # Both Gold steps use the watermark read before the hourly MERGE moves it
+        gold_watermark: Dict[str, str] = {}
+
+        async def setup_datasets() -> None:
+            for dataset_id in (settings.DERIVED_DATASET, settings.GOLD_DATASET):
+                await asyncio.to_thread(self.setup_dataset, settings.GCP_PROJECT_ID, dataset_id, settings.BUCKET_LOCATION)
+
+        async def parks_metadata() -> None:
+            # Small enough to always be rebuilt
+            await self.run_query(
+                sql_path="sql/transform_parks_metadata.sql",
+                source_table_name=settings.PARKS_METADATA_RAW_TABLE,
+                dest_table_name=settings.PARKS_METADATA_SILVER_TABLE
+            )
+
+        async def gold_hourly_step() -> None:
+            gold_watermark["value"] = await asyncio.to_thread(self.get_gold_watermark, full_rebuild)
+            await self.transform_gold_hourly(gold_watermark["value"])
+
+        async def gold_profile_step() -> None:
+            await self.transform_gold_profile(gold_watermark["value"], rebuild=full_rebuild)
+
+        async def stage_queue_times() -> None:
+            from bronze_staging import BronzeStaging
+            await BronzeStaging(self.client).run()
+
+        steps = [TransformStep("setup_datasets", setup_datasets, outputs=(settings.DERIVED_DATASET, settings.GOLD_DATASET))]
+        if settings.STAGING_LOAD:
+            # Silver reads the staging table, loaded from the raw objects first
+            steps.append(TransformStep("stage_queue_times", stage_queue_times, inputs=(raw_queue_times,), outputs=(raw_staging,)))
+        queue_times_source = raw_staging if settings.STAGING_LOAD else raw_queue_times
+
+        return TransformDAG(steps + [
+            TransformStep(
+                "silver_queue_times",
+                lambda: self.transform_queue_times(full_rebuild=full_rebuild),
+                inputs=(settings.DERIVED_DATASET, queue_times_source, raw_compacted),
+                outputs=(silver_queue_times,)
+            ),
+            TransformStep("silver_parks_metadata", parks_metadata, inputs=(settings.DERIVED_DATASET, raw_parks), outputs=(silver_parks,)),
+            TransformStep(
+                "gold_ride_wait_hourly",
+                gold_hourly_step,
+                inputs=(settings.GOLD_DATASET, silver_queue_times, silver_parks),
+                outputs=(gold_hourly,)
+            ),
+            TransformStep("gold_ride_wait_weekly_profile", gold_profile_step, inputs=(gold_hourly,), outputs=(gold_profile,)),
+        ])
+
+    async def run_dag(self, full_rebuild: Optional[bool] = None) -> Dict[str, Dict[str, Any]]:
+        """Runs all transformations without blocking the event loop, returns the per-step report."""
+        logger.info("Starting Silver Layer Transformation...")
+        if full_rebuild is None:
+            full_rebuild = settings.FULL_REBUILD
+        return await self.build_dag(full_rebuild).run()
+
+    def process_all(self, full_rebuild: Optional[bool] = None) -> Dict[str, Dict[str, Any]]:
+        """Main entry point to run all transformations (from synchronous code)"""
+        return asyncio.run(self.run_dag(full_rebuild))
@@ -0,0 +1,161 @@
+import asyncio
+import zlib
+from datetime import datetime as dt, timezone as tz
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from data_ingestion import DataIngestion, settings
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Marks the end of the items of a queue
+_DONE = None
+
+
+class SnapshotShard:
+    """
+    Incrementally gzip-compresses the NDJSON lines of one snapshot shard.
+    Only the compressed bytes of the current part are kept in memory.
+    """
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.part = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        # wbits=31: gzip container, readable by BigQuery with compression = 'GZIP'
+        self.compressor = zlib.compressobj(wbits=31)
+        self.chunks: List[bytes] = []
+        self.size = 0
+        self.parks = 0
+
+    def add(self, line: bytes) -> None:
+        chunk = self.compressor.compress(line)
+        if chunk:
+            self.chunks.append(chunk)
+            self.size += len(chunk)
+        self.parks += 1
+
+    def close_part(self) -> Tuple[int, bytes]:
+        """Returns the finished part (index, gzip content) and starts a new one."""
+        self.chunks.append(self.compressor.flush())
+        part, content = self.part, b"".join(self.chunks)
+        self.part += 1
+        self._reset()
+        return part, content
+
+
+class StreamingIngestion:
+    """
+    Bounded fetch -> encode -> upload pipeline for the queue times of one run.
+    Each stage has its own concurrency and the stages are linked by bounded queues,
+    so slow uploads back-pressure the fetches and memory does not grow with the park count.
+    """
+    def __init__(self, data_ingestion: DataIngestion) -> None:
+        self.data_ingestion = data_ingestion
+        self.failed_uploads: List[str] = []
+        self.written_paths: List[str] = []
+        self.parks_written = 0
+        # Index of this worker in a sharded run: its objects are named after it
+        self.worker: Optional[int] = None
+
+    async def run(self, client: httpx.AsyncClient, park_ids: List[int], now: Optional[dt] = None) -> Dict[str, Any]:
+        """
+        Streams every park of the run into the Bronze snapshot. Returns a summary of the run.
+        Sharded runs pass the snapshot time shared by all their workers.
+        """
+        # One timestamp for the whole snapshot so all the parts land in the same partition
+        now = now or dt.now(tz.utc)
+        self.failed_uploads, self.written_paths, self.parks_written = [], [], 0
+
+        park_queue: asyncio.Queue = asyncio.Queue()
+        for park_id in park_ids:
+            park_queue.put_nowait(park_id)
+        payload_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+        upload_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.UPLOAD_CONCURRENCY * 2)
+
+        # A failing stage cancels the others: fetchers blocked on a full queue would otherwise wait forever
+        try:
+            async with asyncio.TaskGroup() as group:
+                # The limiter bounds the requests in flight, the workers only need to cover its maximum
+                fetchers = [
+                    group.create_task(self._fetch_worker(client, park_queue, payload_queue))
+                    for _ in range(min(settings.CONCURRENCY_MAX, max(1, len(park_ids))))
+                ]
+                encoder = group.create_task(self._encode_worker(payload_queue, upload_queue, now))
+                uploaders = [
+                    group.create_task(self._upload_worker(upload_queue))
+                    for _ in range(settings.UPLOAD_CONCURRENCY)
+                ]
+                group.create_task(self._close_stages(fetchers, encoder, uploaders, payload_queue, upload_queue))
+        except ExceptionGroup as errors:
+            # Surface the error of the stage that failed first
+            raise errors.exceptions[0]
+
+        if self.failed_uploads:
+            raise RuntimeError(f"Failed to upload {len(self.failed_uploads)} snapshot part(s): {self.failed_uploads}")
+
+        logger.info(f"Snapshot of {self.parks_written} parks written to {len(self.written_paths)} object(s)")
+        return {"parks_written": self.parks_written, "paths": self.written_paths}
+
+    async def _close_stages(
+        self,
+        fetchers: List[asyncio.Task],
+        encoder: asyncio.Task,
+        uploaders: List[asyncio.Task],
+        payload_queue: asyncio.Queue,
+        upload_queue: asyncio.Queue
+    ) -> None:
+        """Ends each stage once the one before it is done."""
+        await asyncio.gather(*fetchers)
+        await payload_queue.put(_DONE)
+        await encoder
+        for _ in uploaders:
+            await upload_queue.put(_DONE)
+
+    async def _fetch_worker(self, client: httpx.AsyncClient, park_queue: asyncio.Queue, payload_queue: asyncio.Queue) -> None:
+        while True:
+            try:
+                park_id = park_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            payload = await self.data_ingestion.process_single_queue_time(client, park_id)
+            if payload:
+                # Blocks while the encoder (and therefore the uploads) lag behind
+                await payload_queue.put(payload)
+
+    async def _encode_worker(self, payload_queue: asyncio.Queue, upload_queue: asyncio.Queue, now: dt) -> None:
+        loop = asyncio.get_running_loop()
+        shard_count = max(1, settings.SNAPSHOT_SHARDS)
+        shards = [SnapshotShard(index) for index in range(shard_count)]
+
+        while (payload := await payload_queue.get()) is not _DONE:
+            shard = shards[payload.park_id % shard_count]
+            # Already encoded by the content hash when change detection is on
+            line = payload.ndjson_line()
+            # zlib releases the GIL, compress off the event loop
+            await loop.run_in_executor(None, shard.add, line)
+            self.parks_written += 1
+            if shard.size >= settings.SNAPSHOT_PART_MAX_BYTES:
+                await upload_queue.put(self._close_part(shard, now))
+
+        for shard in shards:
+            if shard.parks:
+                await upload_queue.put(self._close_part(shard, now))
+
+    def _close_part(self, shard: SnapshotShard, now: dt) -> Tuple[str, bytes]:
+        part, content = shard.close_part()
+        filename = f"part-{shard.index:05d}-{part:04d}.json.gz"
+        if self.worker is not None:
+            filename = f"worker-{self.worker:04d}-{filename}"
+        return self.data_ingestion._generate_path(source="queue_times", filename=filename, now=now), content
+
+    async def _upload_worker(self, upload_queue: asyncio.Queue) -> None:
+        while (item := await upload_queue.get()) is not _DONE:
+            path, content = item
+            try:
+                await self.data_ingestion.gcs.upload_bytes(path, content, content_type="application/gzip")
+                self.written_paths.append(path)
+            except Exception as e:
+                logger.error(f"Failed to upload snapshot part {path}: {e}")
+                self.failed_uploads.append(path)
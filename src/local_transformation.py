@@ -0,0 +1,307 @@
+import asyncio
+import json
+from datetime import date, datetime as dt, timezone as tz
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pa_json
+from data_ingestion import settings
+from shared.gcs_handler import GCSHandler
+from shared.queue_times_records import (
+    RIDE_COLUMNS,
+    decode_bronze_object,
+    parse_minute_partition,
+)
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+QUEUE_TIMES_PREFIX = "layer=bronze/source=queue_times/"
+COMPACTED_PREFIX = "layer=bronze/source=queue_times_compacted/"
+PARKS_METADATA_PREFIX = "layer=bronze/source=parks_metadata/"
+
+# Generation and size of every mirrored object, kept in data_dir
+MIRROR_MANIFEST = ".bronze_manifest.json"
+
+# Key of a ride observation in Silver
+RECORD_KEY = ["park_id", "ride_id", "timestamp"]
+
+# Fields of a queue_times.json payload read by Arrow, other fields of the objects are ignored
+ARROW_RIDE = pa.struct([
+    ("id", pa.int64()),
+    ("name", pa.string()),
+    ("is_open", pa.bool_()),
+    ("wait_time", pa.int64()),
+    ("last_updated", pa.string()),
+])
+ARROW_PAYLOAD = pa.schema([
+    ("park_id", pa.int64()),
+    ("rides", pa.list_(ARROW_RIDE)),
+    ("lands", pa.list_(pa.struct([("id", pa.int64()), ("name", pa.string()), ("rides", pa.list_(ARROW_RIDE))]))),
+])
+ARROW_RIDE_COLUMNS = pa.schema([
+    ("timestamp", pa.timestamp("ns", tz="UTC")),
+    ("park_id", pa.int64()),
+    ("land_id", pa.int64()),
+    ("land_name", pa.string()),
+    ("ride_id", pa.int64()),
+    ("ride_name", pa.string()),
+    ("is_open", pa.bool_()),
+    ("wait_time", pa.int64()),
+    ("last_updated", pa.timestamp("ns", tz="UTC")),
+])
+# Arrow to pandas nullable dtypes, so the frame has the RIDE_COLUMNS dtypes without a copy per column
+PANDAS_DTYPES = {pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype(), pa.string(): pd.StringDtype()}
+
+PARKS_METADATA_COLUMNS = {
+    "company_id": "Int64",
+    "company_name": "string",
+    "park_id": "Int64",
+    "park_name": "string",
+    "continent": "string",
+    "country": "string",
+    "latitude": "Float64",
+    "longitude": "Float64",
+    "timezone": "string",
+    "loaded_at": "datetime64[ns, UTC]",
+}
+
+
+def categorize_wait_times(wait_time: pd.Series) -> pd.Series:
+    """Vectorized equivalent of the wait_time_category CASE of the Silver SQL."""
+    values = wait_time.astype("Float64").to_numpy(dtype=float, na_value=np.nan)
+    categories = np.select(
+        [values == 0, values <= 15, values <= 45, values > 45],
+        ["None", "Short", "Medium", "Long"],
+        default="Unknown"
+    )
+    return pd.Series(categories, index=wait_time.index, dtype="string")
+
+
+def _ride_columns(
+    rides: pa.StructArray,
+    payload_index: pa.Array,
+    park_id: pa.Array,
+    land_id: pa.Array,
+    land_name: pa.Array
+) -> Dict[str, pa.Array]:
+    return {
+        "payload_index": payload_index,
+        "park_id": park_id,
+        "land_id": land_id,
+        "land_name": land_name,
+        "ride_id": rides.field("id"),
+        "ride_name": rides.field("name"),
+        "is_open": rides.field("is_open"),
+        "wait_time": rides.field("wait_time"),
+        "last_updated": pc.cast(rides.field("last_updated"), pa.timestamp("ns", tz="UTC")),
+    }
+
+
+def flatten_queue_times_table(payloads: pa.Table, timestamp: dt) -> pa.Table:
+    """
+    Unnests the rides of a table of queue_times.json payloads with Arrow compute.
+    Same rows and order as flatten_queue_times_payload over every payload: root rides in the "General" land,
+    then the rides of each land with its id and name.
+    """
+    park_ids = payloads["park_id"].combine_chunks()
+    root = payloads["rides"].combine_chunks()
+    lands = payloads["lands"].combine_chunks()
+
+    # Rides at the root level
+    root_parents = pc.list_parent_indices(root)
+    root_rides = pc.list_flatten(root)
+    root_columns = _ride_columns(
+        root_rides, root_parents, park_ids.take(root_parents),
+        pa.nulls(len(root_rides), pa.int64()), pa.repeat(pa.scalar("General"), len(root_rides))
+    )
+
+    # Rides nested inside lands: ride -> land -> payload
+    land_parents = pc.list_parent_indices(lands)
+    land_items = pc.list_flatten(lands)
+    land_rides = land_items.field("rides")
+    ride_lands = pc.list_parent_indices(land_rides)
+    nested_parents = land_parents.take(ride_lands)
+    nested_columns = _ride_columns(
+        pc.list_flatten(land_rides), nested_parents, park_ids.take(nested_parents),
+        land_items.field("id").take(ride_lands), land_items.field("name").take(ride_lands)
+    )
+
+    rides = pa.concat_tables([pa.table(root_columns), pa.table(nested_columns)])
+    # Stable sort: the root rides of a payload stay before its nested rides
+    rides = rides.take(pc.sort_indices(rides, sort_keys=[("payload_index", "ascending")]))
+    rides = rides.drop_columns(["payload_index"])
+    rides = rides.add_column(0, "timestamp", pa.repeat(pa.scalar(timestamp, ARROW_RIDE_COLUMNS.field("timestamp").type), len(rides)))
+    return rides.cast(ARROW_RIDE_COLUMNS)
+
+
+def read_queue_times_rides(path: Path, timestamp: dt) -> pa.Table:
+    """Reads a Bronze NDJSON object (gzip or plain) with the Arrow JSON reader and flattens its rides."""
+    with pa.input_stream(str(path)) as stream:
+        content = stream.read()
+    if not content.strip():
+        # The Arrow reader rejects an object without any payload
+        return ARROW_RIDE_COLUMNS.empty_table()
+    options = pa_json.ParseOptions(explicit_schema=ARROW_PAYLOAD, unexpected_field_behavior="ignore")
+    return flatten_queue_times_table(pa_json.read_json(pa.BufferReader(content), parse_options=options), timestamp)
+
+
+def to_float(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+def flatten_parks_metadata(group: Dict[str, Any], loaded_at: dt) -> List[Dict[str, Any]]:
+    """Unnests the parks of one company, like the UNNEST of sql/transform_parks_metadata.sql."""
+    return [
+        {
+            "company_id": group.get("id"),
+            "company_name": group.get("name"),
+            "park_id": park.get("id"),
+            "park_name": park.get("name"),
+            "continent": park.get("continent"),
+            "country": park.get("country"),
+            "latitude": to_float(park.get("latitude")),
+            "longitude": to_float(park.get("longitude")),
+            "timezone": park.get("timezone"),
+            "loaded_at": loaded_at,
+        }
+        for park in group.get("parks") or []
+    ]
+
+
+class LocalTransformation:
+    """
+    In-process alternative to DataTransformation.
+    Reads a local mirror of the Bronze layer and writes the Silver tables as Parquet
+    (same schemas as queue_times_cleaned / parks_metadata_cleaned), without any BigQuery job.
+    """
+    def __init__(self, data_dir: Optional[str] = None, output_dir: Optional[str] = None) -> None:
+        self.data_dir = Path(data_dir or settings.LOCAL_DATA_DIR)
+        self.output_dir = Path(output_dir or settings.LOCAL_OUTPUT_DIR)
+
+    async def download_bronze(self, prefixes: Optional[List[str]] = None, gcs: Optional[GCSHandler] = None) -> int:
+        """
+        Syncs the local mirror with the Bronze objects in GCS: downloads new and rewritten objects
+        (generation or size changed, e.g. compacted files after a late merge) and deletes the local files
+        of objects that are gone (e.g. minute objects after compaction). Returns the number of objects downloaded.
+        """
+        gcs = gcs or GCSHandler(project_id=settings.GCP_PROJECT_ID, bucket_name=settings.BUCKET_NAME)
+        manifest_path = self.data_dir / MIRROR_MANIFEST
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        downloaded = pruned = 0
+        for prefix in prefixes or [QUEUE_TIMES_PREFIX, COMPACTED_PREFIX, PARKS_METADATA_PREFIX]:
+            versions = await gcs.list_blob_versions(prefix)
+            for name, version in versions.items():
+                target = self.data_dir / name
+                if target.exists() and manifest.get(name) == list(version):
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(await gcs.download_bytes(name))
+                manifest[name] = list(version)
+                downloaded += 1
+
+            root = self.data_dir / prefix
+            local_files = [path for path in root.rglob("*") if path.is_file()] if root.exists() else []
+            for path in local_files:
+                name = path.relative_to(self.data_dir).as_posix()
+                if name not in versions:
+                    path.unlink()
+                    manifest.pop(name, None)
+                    pruned += 1
+
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(manifest))
+        logger.info(f"Downloaded {downloaded} Bronze object(s) into {self.data_dir}, removed {pruned} deleted one(s)")
+        return downloaded
+
+    def _bronze_files(self, prefix: str, pattern: str, day: Optional[date] = None) -> List[Path]:
+        """Bronze files under a prefix, only those of one day partition when a day is given."""
+        root = self.data_dir / prefix
+        if day is not None:
+            root = root / f"year={day.year}" / f"month={day.month:02d}" / f"day={day.day:02d}"
+        return sorted(root.glob(f"**/{pattern}"))
+
+    def load_rides(self, day: Optional[date] = None) -> pd.DataFrame:
+        """Flattens every raw queue_times object (of one day if given) and appends the already compacted rides."""
+        tables = [ARROW_RIDE_COLUMNS.empty_table()]
+        for path in self._bronze_files(QUEUE_TIMES_PREFIX, "*.json*", day):
+            minute = parse_minute_partition(path.as_posix())
+            if minute is None:
+                continue
+            tables.append(read_queue_times_rides(path, minute))
+        frames = [pa.concat_tables(tables).to_pandas(types_mapper=PANDAS_DTYPES.get)]
+
+        frames.extend(pd.read_parquet(path).astype(RIDE_COLUMNS) for path in self._bronze_files(COMPACTED_PREFIX, "*.parquet", day))
+        return pd.concat(frames, ignore_index=True)
+
+    def transform_queue_times(self, day: Optional[date] = None) -> pd.DataFrame:
+        # A window being compacted can be read both raw and compacted, like the MERGE key of the Silver SQL
+        rides = self.load_rides(day).drop_duplicates(RECORD_KEY, keep="last").reset_index(drop=True)
+        rides.insert(rides.columns.get_loc("wait_time") + 1, "wait_time_category", categorize_wait_times(rides["wait_time"]))
+        return rides
+
+    def transform_parks_metadata(self) -> pd.DataFrame:
+        records: List[Dict[str, Any]] = []
+        for path in self._bronze_files(PARKS_METADATA_PREFIX, "*.json*"):
+            loaded_at = parse_minute_partition(path.as_posix())
+            if loaded_at is None:
+                continue
+            for group in decode_bronze_object(path.name, path.read_bytes()):
+                records.extend(flatten_parks_metadata(group, loaded_at))
+
+        parks = pd.DataFrame.from_records(records, columns=list(PARKS_METADATA_COLUMNS)).astype(PARKS_METADATA_COLUMNS)
+        parks["has_coordinates"] = (parks["latitude"].notna() & parks["longitude"].notna()).astype("boolean")
+        parks["has_timezone"] = parks["timezone"].notna().astype("boolean")
+        parks["processed_at"] = pd.Timestamp(dt.now(tz.utc))
+        return parks
+
+    def _write(self, frame: pd.DataFrame, table_name: str) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{table_name}.parquet"
+        frame.to_parquet(path, index=False)
+        logger.info(f"Success: {table_name} now holds {len(frame)} rows ({path})")
+        return path
+
+    def _write_archive(self, rides: pd.DataFrame, table_name: str) -> Path:
+        """Writes the rides as a compact history archive next to the Parquet table."""
+        from shared.ride_history_archive import RideHistoryArchive
+
+        path = self.output_dir / f"{table_name}_history.npz"
+        archive = RideHistoryArchive.from_readings(rides, max_gap_seconds=settings.HISTORY_ARCHIVE_MAX_GAP_SECONDS)
+        archive.save(str(path))
+        logger.info(f"Success: {table_name} history archived as {archive.run_count} runs for {len(rides)} rows ({path})")
+        return path
+
+    async def run_dag(self, full_rebuild: Optional[bool] = None) -> None:
+        """
+        Same entry point as DataTransformation.run_dag: syncs the Bronze mirror (unless LOCAL_DOWNLOAD_BRONZE=false),
+        then runs the in-process transformations in a thread so they do not block the event loop.
+        """
+        if settings.LOCAL_DOWNLOAD_BRONZE:
+            await self.download_bronze()
+        await asyncio.to_thread(self.process_all, full_rebuild)
+
+    def process_all(self, full_rebuild: Optional[bool] = None) -> None:
+        """
+        Runs the transformations on the current mirror, same signature as DataTransformation.process_all.
+        Local tables are small enough to always be rebuilt, full_rebuild is ignored.
+        """
+        logger.info(f"Starting local Silver Layer Transformation from {self.data_dir}...")
+
+        logger.info("Transforming Queue Times...")
+        rides = self.transform_queue_times()
+        self._write(rides, settings.QUEUE_TIMES_SILVER_TABLE)
+        if settings.HISTORY_ARCHIVE:
+            self._write_archive(rides, settings.QUEUE_TIMES_SILVER_TABLE)
+
+        logger.info("Transforming Parks Metadata...")
+        self._write(self.transform_parks_metadata(), settings.PARKS_METADATA_SILVER_TABLE)
+
+
+if __name__ == "__main__":
+    asyncio.run(LocalTransformation().run_dag())
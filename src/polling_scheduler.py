@@ -0,0 +1,177 @@
+import asyncio
+import json
+from dataclasses import dataclass, field
+from datetime import datetime as dt, timedelta, timezone as tz
+from typing import Any, Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from data_ingestion import settings
+from shared.gcs_handler import GCSHandler
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Polling tiers, from the most to the least frequently polled
+TIER_ACTIVE = "active"
+TIER_STATIC = "static"
+TIER_CLOSED = "closed"
+
+
+@dataclass
+class ParkProfile:
+    """Learned activity of a park per local hour of the day (0-23)."""
+    open_ratio: Dict[int, float] = field(default_factory=dict)
+    # Probability that the park changes within one polling interval, whatever its tier
+    change_ratio: Dict[int, float] = field(default_factory=dict)
+
+    def is_open(self, local_hour: int) -> bool:
+        return self.open_ratio.get(local_hour, 0.0) >= settings.POLL_OPEN_RATIO_MIN
+
+    def is_volatile(self, local_hour: int) -> bool:
+        return self.change_ratio.get(local_hour, 0.0) >= settings.POLL_ACTIVE_CHANGE_RATIO
+
+
+def build_profiles(rows: Iterable[Dict[str, Any]]) -> Dict[int, ParkProfile]:
+    """Builds the profiles from the rows of sql/park_activity_profile.sql."""
+    profiles: Dict[int, ParkProfile] = {}
+    for row in rows:
+        profile = profiles.setdefault(int(row["park_id"]), ParkProfile())
+        hour = int(row["local_hour"])
+        profile.open_ratio[hour] = float(row["open_ratio"])
+        profile.change_ratio[hour] = float(row["change_ratio"])
+    return profiles
+
+
+def extract_park_timezones(parks: List[Dict[str, Any]]) -> Dict[int, Optional[str]]:
+    """Maps every park of a parks.json payload to its timezone."""
+    timezones: Dict[int, Optional[str]] = {}
+    for group in parks:
+        for park in group.get("parks", [group]):
+            if "id" in park:
+                timezones[park["id"]] = park.get("timezone")
+    return timezones
+
+
+def local_hour(now: dt, timezone_name: Optional[str]) -> Optional[int]:
+    if not timezone_name:
+        return None
+    try:
+        return now.astimezone(ZoneInfo(timezone_name)).hour
+    except ZoneInfoNotFoundError:
+        return None
+
+
+def park_tier(park_id: int, timezone_name: Optional[str], profile: Optional[ParkProfile], now: dt) -> str:
+    """
+    Active parks are polled every run, open but static parks and closed parks only every few runs.
+    Parks without a known timezone are always treated as active.
+    """
+    hour = local_hour(now, timezone_name)
+    if hour is None:
+        return TIER_ACTIVE
+
+    if profile is None:
+        # Nothing learned yet: assume usual opening hours and that an open park changes
+        is_open = settings.POLL_DEFAULT_OPEN_HOUR <= hour < settings.POLL_DEFAULT_CLOSE_HOUR
+        return TIER_ACTIVE if is_open else TIER_CLOSED
+
+    if not profile.is_open(hour):
+        return TIER_CLOSED
+    return TIER_ACTIVE if profile.is_volatile(hour) else TIER_STATIC
+
+
+def poll_every(tier: str) -> int:
+    return {
+        TIER_ACTIVE: 1,
+        TIER_STATIC: settings.POLL_STATIC_EVERY_RUNS,
+        TIER_CLOSED: settings.POLL_CLOSED_EVERY_RUNS,
+    }[tier]
+
+
+def run_slot(now: dt) -> int:
+    """Index of the scheduled run holding a time, the same for every run of a slot."""
+    return int(now.timestamp() // 60) // max(1, settings.POLL_INTERVAL_MINUTES)
+
+
+def plan_polling(
+    timezones: Dict[int, Optional[str]],
+    profiles: Dict[int, ParkProfile],
+    now: dt
+) -> Dict[str, List[int]]:
+    """
+    Returns the parks to poll in the run at `now`, grouped by tier.
+    Parks of a tier polled every N runs are staggered on their ID so the calls spread evenly.
+    Pure function of its inputs: the plan can be computed offline for any time.
+    """
+    slot = run_slot(now)
+    plan: Dict[str, List[int]] = {TIER_ACTIVE: [], TIER_STATIC: [], TIER_CLOSED: []}
+    for park_id, timezone_name in timezones.items():
+        tier = park_tier(park_id, timezone_name, profiles.get(park_id), now)
+        if (slot + park_id) % poll_every(tier) == 0:
+            plan[tier].append(park_id)
+    return plan
+
+
+def estimate_savings(
+    timezones: Dict[int, Optional[str]],
+    profiles: Dict[int, ParkProfile],
+    start: dt,
+    runs: int
+) -> Dict[str, float]:
+    """Replays the plan over `runs` consecutive runs and compares it with polling every park every run."""
+    planned_calls = 0
+    for index in range(runs):
+        now = start + timedelta(minutes=index * settings.POLL_INTERVAL_MINUTES)
+        planned_calls += sum(len(parks) for parks in plan_polling(timezones, profiles, now).values())
+    baseline_calls = runs * len(timezones)
+    return {
+        "baseline_calls": baseline_calls,
+        "planned_calls": planned_calls,
+        "saved_ratio": 1 - planned_calls / baseline_calls if baseline_calls else 0.0,
+    }
+
+
+class PollingScheduler:
+    """
+    Decides which parks a run polls.
+    The profiles are learned from the Silver tables and cached in the bucket,
+    they are only recomputed every POLL_PROFILE_REFRESH_HOURS.
+    """
+    def __init__(self, gcs: GCSHandler) -> None:
+        self.gcs = gcs
+        self.profiles: Dict[int, ParkProfile] = {}
+
+    def _query_profile_rows(self) -> List[Dict[str, Any]]:
+        # Imported here: only runs that refresh the profiles need a BigQuery client
+        from data_transformation import DataTransformation
+
+        return DataTransformation().get_park_activity(settings.POLL_PROFILE_LOOKBACK_DAYS)
+
+    async def load_profiles(self) -> Dict[int, ParkProfile]:
+        content = await self.gcs.download_text(settings.POLL_PROFILE_PATH)
+        cached = json.loads(content) if content else None
+        if cached and any("change_ratio" not in row for row in cached["rows"]):
+            # Cached before the change ratio replaced the changes per hour: recomputed like a missing cache
+            cached = None
+        refreshed_at = dt.fromisoformat(cached["refreshed_at"]) if cached else None
+
+        if refreshed_at is None or dt.now(tz.utc) - refreshed_at > timedelta(hours=settings.POLL_PROFILE_REFRESH_HOURS):
+            try:
+                loop = asyncio.get_running_loop()
+                rows = await loop.run_in_executor(None, self._query_profile_rows)
+                cached = {"refreshed_at": dt.now(tz.utc).isoformat(), "rows": rows}
+                await self.gcs.upload_json_data(settings.POLL_PROFILE_PATH, cached)
+                logger.info(f"Park activity profiles refreshed ({len(rows)} rows)")
+            except Exception as e:
+                # Stale (or default) profiles are better than polling nothing
+                logger.warning(f"Failed to refresh park activity profiles: {e}")
+
+        self.profiles = build_profiles(cached["rows"]) if cached else {}
+        return self.profiles
+
+    def select_parks(self, parks: List[Dict[str, Any]], now: Optional[dt] = None) -> List[int]:
+        """Returns the IDs of the parks to poll in this run."""
+        if now is None:
+            now = dt.now(tz.utc)
+        plan = plan_polling(extract_park_timezones(parks), self.profiles, now)
+        logger.info(f"Polling plan: {', '.join(f'{len(ids)} {tier}' for tier, ids in plan.items())}")
+        return [park_id for ids in plan.values() for park_id in ids]
@@ -0,0 +1,87 @@
+import asyncio
+import gzip
+import json
+import re
+from typing import Dict, List, Optional
+from data_ingestion import settings
+from shared.gcs_handler import GCSHandler
+from shared.queue_times_records import decode_bronze_object
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+RAW_PREFIX = "layer=bronze/source=queue_times/"
+
+# One plain JSON object per park and poll, written before the gzip NDJSON snapshots
+LEGACY_OBJECT = re.compile(r"/park_\d+\.json$")
+
+# Name of the rewritten object of a minute partition (matches the *.json.gz external table URI)
+REWRITTEN_FILENAME = "part-legacy-00000.json.gz"
+
+
+def is_legacy_object(path: str) -> bool:
+    return LEGACY_OBJECT.search(path) is not None
+
+
+async def find_legacy_objects(gcs: GCSHandler) -> List[str]:
+    """Legacy per-park objects still in the Bronze layer (the queue_times external table does not read them)."""
+    return [path for path in await gcs.list_blob_names(RAW_PREFIX) if is_legacy_object(path)]
+
+
+async def ensure_no_legacy_objects(gcs: Optional[GCSHandler] = None) -> None:
+    """
+    Refuses a rebuild of Silver from the external table while legacy objects exist:
+    their history would silently disappear from the rebuilt table.
+    """
+    if gcs is None:
+        gcs = GCSHandler(project_id=settings.GCP_PROJECT_ID, bucket_name=settings.BUCKET_NAME)
+    legacy = await find_legacy_objects(gcs)
+    if legacy:
+        raise RuntimeError(
+            f"{len(legacy)} legacy park_*.json object(s) in Bronze (e.g. {legacy[0]}) are not read by the "
+            f"queue_times external table. Run `python src/rewrite_legacy_bronze.py` before rebuilding Silver."
+        )
+
+
+class LegacyBronzeRewrite:
+    """
+    One-off rewrite of the legacy per-park objects into the current layout:
+    one gzip NDJSON object per minute partition, then the originals are deleted.
+    """
+    def __init__(self, gcs: Optional[GCSHandler] = None) -> None:
+        self.gcs = gcs or GCSHandler(project_id=settings.GCP_PROJECT_ID, bucket_name=settings.BUCKET_NAME)
+
+    async def rewrite_partition(self, folder: str, paths: List[str]) -> int:
+        """Rewrites the legacy objects of one minute partition. Returns the number of payloads."""
+        lines = []
+        for path in sorted(paths):
+            for payload in decode_bronze_object(path, await self.gcs.download_bytes(path)):
+                lines.append(json.dumps(payload))
+
+        target = f"{folder}{REWRITTEN_FILENAME}"
+        await self.gcs.upload_bytes(target, gzip.compress("\n".join(lines).encode("utf-8")), content_type="application/gzip")
+
+        # Read the object back: the originals are only deleted once the rewrite is verified
+        written = decode_bronze_object(target, await self.gcs.download_bytes(target))
+        if len(written) != len(lines):
+            raise ValueError(f"{target}: holds {len(written)} payload(s), expected {len(lines)}")
+
+        await self.gcs.delete_blobs(paths)
+        return len(lines)
+
+    async def run(self) -> int:
+        """Rewrites every minute partition holding legacy objects. Returns the number of payloads rewritten."""
+        partitions: Dict[str, List[str]] = {}
+        for path in await find_legacy_objects(self.gcs):
+            partitions.setdefault(path.rsplit("/", 1)[0] + "/", []).append(path)
+        logger.info(f"Rewriting legacy objects of {len(partitions)} minute partition(s)...")
+
+        payloads = 0
+        for folder in sorted(partitions):
+            payloads += await self.rewrite_partition(folder, partitions[folder])
+        logger.info(f"Rewrote {payloads} legacy payload(s) into {len(partitions)} object(s)")
+        return payloads
+
+
+if __name__ == "__main__":
+    asyncio.run(LegacyBronzeRewrite().run())
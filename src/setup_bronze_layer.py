@@ -20,6 +20,8 @@ class InfrastructureSettings(BaseSettings):
     # Table 2: Queue Times
     TABLE_QUEUES: str = "queue_times"
     PATH_QUEUES: str = "layer=bronze/source=queue_times/"
+    # One gzip NDJSON snapshot (or a few shards) per run
+    FILE_PATTERN_QUEUES: str = "*.json.gz"
 
 settings = InfrastructureSettings()
 
@@ -80,7 +82,9 @@ def infrastructure_setup():
             day STRING,
             hour STRING,
             minute STRING
-        """
+        """,
+        file_pattern=settings.FILE_PATTERN_QUEUES,
+        compression="GZIP"
     )
     
     logger.info(f"Infra setup completed successfully")
@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing
+import time
+from datetime import datetime as dt, timezone as tz
+from pathlib import PurePosixPath
+from typing import Callable, Optional
+from data_ingestion import DataIngestion, settings
+from data_orchestration import DataOrchestration
+from shared.park_sharding import ShardAssignment, snapshot_minute
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def shard_state_path(path: str, index: int) -> str:
+    """Per worker state file: state/park_state.json -> state/park_state.shard-0003.json"""
+    file = PurePosixPath(path)
+    return str(file.with_name(f"{file.stem}.shard-{index:04d}{file.suffix}"))
+
+
+def configure_shard(index: int) -> None:
+    """
+    Gives this worker process its own change detection state and series snapshot.
+    A worker keeps its index when the worker count changes, and with it most of its parks.
+    """
+    settings.PARK_STATE_PATH = shard_state_path(settings.PARK_STATE_PATH, index)
+    if settings.SERIES_STORE_SNAPSHOT_PATH:
+        settings.SERIES_STORE_SNAPSHOT_PATH = shard_state_path(settings.SERIES_STORE_SNAPSHOT_PATH, index)
+
+
+def run_worker(assignment: ShardAssignment) -> None:
+    """One shard of a run, in its own process (Cloud Run task or pool worker)."""
+    configure_shard(assignment.index)
+    orchestrator = DataOrchestration(DataIngestion(), shard=assignment)
+    asyncio.run(orchestrator.run_pipeline())
+
+
+def run_local_pool(workers: int, worker: Callable[[ShardAssignment], None] = run_worker) -> int:
+    """
+    Runs every shard of one run in its own process on this machine.
+    Returns the number of workers that failed.
+    """
+    now = dt.now(tz.utc)
+    run_id = now.strftime("%Y%m%dT%H%M%SZ")
+    snapshot_time = now.replace(second=0, microsecond=0)
+    # Fresh interpreters: no event loop, logging thread or client inherited from this process
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=worker,
+            args=(ShardAssignment(index, workers, run_id, snapshot_time),),
+            name=f"ingestion-shard-{index}"
+        )
+        for index in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    failed = [process.name for process in processes if process.exitcode != 0]
+    if failed:
+        logger.error(f"Shard worker(s) failed: {', '.join(failed)}")
+    logger.info(f"Run {run_id}: {workers - len(failed)}/{workers} shards finished in {time.perf_counter() - start:.2f}s")
+    return len(failed)
+
+
+def cloud_run_assignment(now: Optional[dt] = None) -> ShardAssignment:
+    """
+    The shard of this Cloud Run task. The run is the job execution, shared by all its tasks
+    (a time slot is not: tasks may start on both sides of a boundary). Each task writes into
+    the slot it started in.
+    """
+    if not settings.CLOUD_RUN_EXECUTION:
+        raise ValueError("CLOUD_RUN_EXECUTION is not set: the tasks of a sharded run cannot agree on the run")
+    return ShardAssignment(
+        index=settings.CLOUD_RUN_TASK_INDEX,
+        count=settings.CLOUD_RUN_TASK_COUNT,
+        run_id=settings.CLOUD_RUN_EXECUTION,
+        snapshot_time=snapshot_minute(now or dt.now(tz.utc), settings.POLL_INTERVAL_MINUTES)
+    )
+
+
+def run_sharded() -> None:
+    if settings.CLOUD_RUN_TASK_COUNT > 1:
+        run_worker(cloud_run_assignment())
+    elif run_local_pool(settings.INGESTION_WORKERS):
+        raise SystemExit(1)
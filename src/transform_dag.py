@@ -0,0 +1,112 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from tools.logger import get_logger
+from tools.metrics import get_metrics
+
+logger = get_logger(__name__)
+metrics = get_metrics()
+
+# Step states in the run report
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass
+class TransformStep:
+    """One warehouse step: the tables it reads and writes decide what it waits for."""
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+
+
+class TransformDAG:
+    """
+    Runs steps as soon as the steps producing their inputs are done, so independent
+    steps (e.g. two Silver tables) run concurrently. A failed step skips its dependents.
+    """
+    def __init__(self, steps: List[TransformStep]) -> None:
+        self.steps = {step.name: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("Transform step names must be unique")
+
+        producers: Dict[str, str] = {}
+        for step in steps:
+            for output in step.outputs:
+                if output in producers:
+                    raise ValueError(f"{output} is written by both {producers[output]} and {step.name}")
+                producers[output] = step.name
+        # Inputs nobody produces are external (e.g. the Bronze tables)
+        self.dependencies = {
+            step.name: sorted({producers[table] for table in step.inputs if table in producers} - {step.name})
+            for step in steps
+        }
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        visiting = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Transform steps form a cycle through {name}")
+            visiting.add(name)
+            for dependency in self.dependencies[name]:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.steps:
+            visit(name)
+        return order
+
+    async def run(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Runs every step and returns, per step, its status, duration and start offset (seconds).
+        Raises once all runnable steps are done if any of them failed.
+        """
+        started = time.perf_counter()
+        report: Dict[str, Dict[str, Any]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_step(name: str) -> bool:
+            results = [await tasks[dependency] for dependency in self.dependencies[name]]
+            if not all(results):
+                report[name] = {"status": SKIPPED, "seconds": 0.0, "start_offset": time.perf_counter() - started}
+                logger.warning(f"Transform step {name} skipped, a step it depends on failed")
+                return False
+
+            step_start = time.perf_counter()
+            status = SUCCEEDED
+            try:
+                with metrics.stage(f"transform_step_{name}"):
+                    await self.steps[name].run()
+            except Exception as e:
+                logger.error(f"Transform step {name} failed: {e}")
+                status = FAILED
+            report[name] = {
+                "status": status,
+                "seconds": time.perf_counter() - step_start,
+                "start_offset": step_start - started,
+            }
+            return status == SUCCEEDED
+
+        # Dependencies come first in self.order, so their tasks exist when a step awaits them
+        for name in self.order:
+            tasks[name] = asyncio.create_task(run_step(name))
+        await asyncio.gather(*tasks.values())
+
+        for name in self.order:
+            step = report[name]
+            logger.info(f"Transform step {name}: {step['status']} in {step['seconds']:.2f}s (started at +{step['start_offset']:.2f}s)")
+        logger.info(f"Transform DAG finished in {time.perf_counter() - started:.2f}s")
+
+        failed = [name for name in self.order if report[name]["status"] == FAILED]
+        if failed:
+            raise RuntimeError(f"Transform step(s) failed: {', '.join(failed)}")
+        return report
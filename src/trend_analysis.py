@@ -0,0 +1,226 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+from data_ingestion import settings
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Day of week x hour of day cells of the seasonal profiles (Monday 00h = 0)
+PROFILE_CELLS = 7 * 24
+
+SILVER_COLUMNS = ["timestamp", "park_id", "ride_id", "is_open", "wait_time"]
+
+PARKS_COLUMNS = ["park_id", "timezone"]
+
+
+@dataclass
+class RideGrid:
+    """
+    Wait times of many rides on one regular time grid.
+    values[i, j] is the mean open wait time of ride i in the slot starting at times[j], NaN when unknown.
+    """
+    park_ids: np.ndarray
+    ride_ids: np.ndarray
+    times: pd.DatetimeIndex
+    values: np.ndarray
+    freq: str
+
+    @property
+    def slots_per_week(self) -> int:
+        return int(pd.Timedelta(days=7) / pd.Timedelta(self.freq))
+
+    def to_frame(self, values: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """One column per (park_id, ride_id), one row per slot."""
+        columns = pd.MultiIndex.from_arrays([self.park_ids, self.ride_ids], names=["park_id", "ride_id"])
+        return pd.DataFrame((self.values if values is None else values).T, index=self.times, columns=columns)
+
+
+def load_silver(path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Reads the columns of queue_times_cleaned the analysis needs from a Parquet file or folder
+    (the local backend output or a BigQuery extract).
+    """
+    source = Path(path or Path(settings.LOCAL_OUTPUT_DIR) / f"{settings.QUEUE_TIMES_SILVER_TABLE}.parquet")
+    rides = pd.read_parquet(source, columns=SILVER_COLUMNS)
+    logger.info(f"Loaded {len(rides)} ride readings from {source}")
+    return rides
+
+
+def load_park_timezones(path: Optional[str] = None) -> Dict[int, Optional[str]]:
+    """Timezone of every park from parks_metadata_cleaned (same sources as load_silver)."""
+    source = Path(path or Path(settings.LOCAL_OUTPUT_DIR) / f"{settings.PARKS_METADATA_SILVER_TABLE}.parquet")
+    parks = pd.read_parquet(source, columns=PARKS_COLUMNS).dropna(subset=["park_id"]).drop_duplicates("park_id")
+    timezones = parks["timezone"].astype(object).where(parks["timezone"].notna(), None)
+    return dict(zip(parks["park_id"].astype("int64").tolist(), timezones.tolist()))
+
+
+def build_grid(rides: pd.DataFrame, freq: str = "15min") -> RideGrid:
+    """
+    Resamples the readings of every ride onto one regular grid in a single pass:
+    each reading gets a flat (ride, slot) index and the means come from two bincounts.
+    Closed rides and missing wait times leave their slot empty.
+    Without any timestamped reading the grid has no rides and no slots.
+    """
+    timestamps = pd.to_datetime(rides["timestamp"], utc=True)
+    if timestamps.isna().any():
+        rides, timestamps = rides[timestamps.notna()], timestamps[timestamps.notna()]
+    if rides.empty:
+        return RideGrid(
+            park_ids=np.empty(0, dtype=np.int64),
+            ride_ids=np.empty(0, dtype=np.int64),
+            times=pd.DatetimeIndex([], tz="UTC"),
+            values=np.empty((0, 0), dtype=np.float64),
+            freq=freq
+        )
+    park_ids = rides["park_id"].to_numpy(dtype=np.int64, na_value=-1)
+    ride_ids = rides["ride_id"].to_numpy(dtype=np.int64, na_value=-1)
+
+    # One integer key per ride, factorized into dense row numbers
+    codes, keys = pd.factorize((park_ids << 32) | (ride_ids & 0xFFFFFFFF), sort=True)
+
+    step = pd.Timedelta(freq)
+    start = timestamps.min().floor(freq)
+    slots = ((timestamps - start) // step).to_numpy(dtype=np.int64)
+    n_rides, n_slots = len(keys), int(slots.max()) + 1
+
+    wait_times = rides["wait_time"].to_numpy(dtype=np.float64, na_value=np.nan)
+    is_open = rides["is_open"].to_numpy(dtype=bool, na_value=False)
+    valid = is_open & ~np.isnan(wait_times)
+
+    flat = codes[valid] * n_slots + slots[valid]
+    sums = np.bincount(flat, weights=wait_times[valid], minlength=n_rides * n_slots)
+    counts = np.bincount(flat, minlength=n_rides * n_slots)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = (sums / counts).reshape(n_rides, n_slots)
+
+    return RideGrid(
+        park_ids=keys >> 32,
+        ride_ids=keys & 0xFFFFFFFF,
+        times=pd.date_range(start, periods=n_slots, freq=freq),
+        values=values,
+        freq=freq
+    )
+
+
+def fill_gaps(grid: RideGrid, max_slots: int) -> np.ndarray:
+    """Carries the last known wait time forward over gaps of at most max_slots (e.g. skipped polls)."""
+    return grid.to_frame().ffill(limit=max_slots).to_numpy().T
+
+
+def rolling_percentile(grid: RideGrid, window: int, q: float, min_periods: int = 1) -> np.ndarray:
+    """q-quantile (0-1) of the last `window` slots of every ride, computed for all rides at once."""
+    frame = pd.DataFrame(grid.values.T)
+    return frame.rolling(window, min_periods=min_periods).quantile(q).to_numpy().T
+
+
+def slot_cells(grid: RideGrid, timezones: Optional[Mapping[int, Optional[str]]] = None) -> np.ndarray:
+    """
+    Local day of week x hour cell of every (ride, slot), shape of grid.values.
+    Rides are handled per timezone, parks without one stay in UTC.
+    """
+    cells = np.empty(grid.values.shape, dtype=np.int16)
+    utc_cells = (grid.times.dayofweek * 24 + grid.times.hour).to_numpy(dtype=np.int16)
+    cells[:] = utc_cells
+
+    if timezones:
+        ride_timezones = pd.Series(grid.park_ids).map(timezones)
+        for timezone_name, rows in ride_timezones.groupby(ride_timezones, sort=False).groups.items():
+            try:
+                local = grid.times.tz_convert(timezone_name)
+            except Exception:
+                logger.warning(f"Unknown timezone {timezone_name}, its rides are profiled in UTC")
+                continue
+            cells[np.asarray(rows)] = (local.dayofweek * 24 + local.hour).to_numpy(dtype=np.int16)
+    return cells
+
+
+def seasonal_profile(grid: RideGrid, cells: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Mean, standard deviation and sample count of every ride per local day of week x hour.
+    Each array has the shape (rides, 7, 24).
+    """
+    n_rides = len(grid.park_ids)
+    valid = ~np.isnan(grid.values)
+    rows = np.broadcast_to(np.arange(n_rides)[:, None], grid.values.shape)
+    flat = rows[valid] * PROFILE_CELLS + cells[valid]
+    values = grid.values[valid]
+
+    size = n_rides * PROFILE_CELLS
+    counts = np.bincount(flat, minlength=size)
+    sums = np.bincount(flat, weights=values, minlength=size)
+    squares = np.bincount(flat, weights=values * values, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / counts
+        std = np.sqrt(np.maximum(squares / counts - mean * mean, 0.0))
+
+    shape = (n_rides, 7, 24)
+    return {"mean": mean.reshape(shape), "std": std.reshape(shape), "count": counts.reshape(shape)}
+
+
+def week_over_week(grid: RideGrid) -> pd.DataFrame:
+    """
+    Weekly mean wait time of every ride and its change from the previous week.
+    Weeks are counted in slots from the start of the grid.
+    """
+    n_rides, n_slots = grid.values.shape
+    n_weeks = -(-n_slots // grid.slots_per_week)
+    weeks = np.arange(n_slots) // grid.slots_per_week
+
+    valid = ~np.isnan(grid.values)
+    rows = np.broadcast_to(np.arange(n_rides)[:, None], grid.values.shape)
+    flat = rows[valid] * n_weeks + np.broadcast_to(weeks, grid.values.shape)[valid]
+    sums = np.bincount(flat, weights=grid.values[valid], minlength=n_rides * n_weeks)
+    counts = np.bincount(flat, minlength=n_rides * n_weeks)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums / counts).reshape(n_rides, n_weeks)
+
+    delta = np.full_like(means, np.nan)
+    delta[:, 1:] = means[:, 1:] - means[:, :-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta_pct = np.where(means[:, :-1] > 0, delta[:, 1:] / means[:, :-1] * 100, np.nan)
+
+    return pd.DataFrame({
+        "park_id": np.repeat(grid.park_ids, n_weeks),
+        "ride_id": np.repeat(grid.ride_ids, n_weeks),
+        "week_start": np.tile(grid.times[::grid.slots_per_week], n_rides),
+        "mean_wait": means.ravel(),
+        "delta": delta.ravel(),
+        "delta_pct": np.concatenate([np.full((n_rides, 1), np.nan), delta_pct], axis=1).ravel(),
+    })
+
+
+def anomaly_scores(grid: RideGrid, cells: np.ndarray, profile: Dict[str, np.ndarray], min_std: float = 5.0) -> np.ndarray:
+    """
+    z-score of every slot against the seasonal profile of its ride and cell.
+    The deviation is floored at min_std minutes so quiet cells do not flag every small change.
+    """
+    rows = np.arange(len(grid.park_ids))[:, None]
+    mean = profile["mean"].reshape(len(grid.park_ids), PROFILE_CELLS)[rows, cells]
+    std = profile["std"].reshape(len(grid.park_ids), PROFILE_CELLS)[rows, cells]
+    return (grid.values - mean) / np.maximum(np.nan_to_num(std), min_std)
+
+
+def top_anomalies(grid: RideGrid, scores: np.ndarray, threshold: float = 3.0, limit: int = 20) -> pd.DataFrame:
+    """Slots whose absolute score exceeds the threshold, strongest first."""
+    rows, slots = np.nonzero(np.abs(np.nan_to_num(scores)) >= threshold)
+    found = pd.DataFrame({
+        "park_id": grid.park_ids[rows],
+        "ride_id": grid.ride_ids[rows],
+        "timestamp": grid.times[slots],
+        "wait_time": grid.values[rows, slots],
+        "score": scores[rows, slots],
+    })
+    return found.reindex(found["score"].abs().sort_values(ascending=False).index).head(limit)
+
+
+if __name__ == "__main__":
+    grid = build_grid(load_silver())
+    # Profiles follow each park's local calendar
+    cells = slot_cells(grid, load_park_timezones())
+    profile = seasonal_profile(grid, cells)
+    logger.info(f"Grid: {len(grid.park_ids)} rides x {len(grid.times)} slots of {grid.freq}")
+    logger.info(f"Strongest anomalies:\n{top_anomalies(grid, anomaly_scores(grid, cells, profile))}")
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from shared.adaptive_limiter import AdaptiveLimiter, parse_retry_after
+
+
+def limiter(**options) -> AdaptiveLimiter:
+    return AdaptiveLimiter(**{"initial_limit": 4, "min_limit": 2, "max_limit": 8, "latency_target": 1.0, **options})
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("soon") is None
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(retry_at) <= 30
+
+
+def test_limit_grows_by_one_slot_per_window_of_fast_requests():
+    aimd = limiter()
+    for _ in range(4):
+        aimd.on_success(0.1)
+    assert aimd.limit == 4
+    for _ in range(2):
+        aimd.on_success(0.1)
+    assert aimd.limit == 5
+    for _ in range(100):
+        aimd.on_success(0.1)
+    assert aimd.limit == 8
+
+
+def test_overload_halves_the_limit_once_per_window():
+    aimd = limiter(initial_limit=8)
+    aimd.on_overload(0.1)
+    aimd.on_overload(0.1)
+    assert aimd.limit == 4
+    aimd.last_decrease = 0.0
+    aimd.on_success(5.0)
+    assert aimd.limit == 2
+    aimd.last_decrease = 0.0
+    aimd.on_overload(0.1)
+    assert aimd.limit == 2
+
+
+def test_slots_bound_the_requests_in_flight():
+    aimd = limiter(initial_limit=2)
+    peak = 0
+
+    async def request() -> None:
+        nonlocal peak
+        async with aimd.slot():
+            peak = max(peak, aimd.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run() -> None:
+        await asyncio.gather(*(request() for _ in range(10)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert aimd.in_flight == 0
+
+
+def test_stats_report_latency_percentiles():
+    aimd = limiter()
+    for latency in (0.1, 0.2, 0.3, 0.4):
+        aimd.on_success(latency)
+    stats = aimd.stats()
+    assert stats["requests"] == 4
+    assert 0.1 <= stats["latency_p50"] <= stats["latency_p95"] <= stats["latency_p99"]
@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from backfill import Backfill, day_shards
+
+
+def test_day_shards_cover_the_inclusive_range():
+    assert day_shards(date(2025, 2, 27), date(2025, 3, 2)) == [
+        date(2025, 2, 27), date(2025, 2, 28), date(2025, 3, 1), date(2025, 3, 2)
+    ]
+    assert day_shards(date(2024, 12, 31), date(2024, 12, 31)) == [date(2024, 12, 31)]
+    assert len(day_shards(date(2024, 1, 1), date(2024, 12, 31))) == 366
+
+
+def test_day_shards_reject_a_reversed_range():
+    with pytest.raises(ValueError):
+        day_shards(date(2025, 3, 2), date(2025, 3, 1))
+
+
+class RecordingEngine:
+    """Backfill engine stand-in: one row per day, fails the days in `failing` once."""
+    name = "recording"
+    executor_class = ThreadPoolExecutor
+
+    def __init__(self, failing: set) -> None:
+        self.failing = set(failing)
+        self.runs: list = []
+        self.swaps: list = []
+        self.resets = 0
+
+    def fingerprint(self) -> str:
+        return "v1"
+
+    def reset(self) -> None:
+        self.resets += 1
+
+    def prepare(self) -> None:
+        pass
+
+    def run_shard(self, day: date) -> int:
+        self.runs.append(day)
+        if day in self.failing:
+            self.failing.discard(day)
+            raise RuntimeError("shard failed")
+        return 1
+
+    def swap(self, first_day: date, last_day: date, replace_table: bool) -> None:
+        self.swaps.append((first_day, last_day))
+
+
+def test_a_failed_run_resumes_only_the_missing_shards(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    engine = RecordingEngine(failing={date(2025, 3, 2)})
+    backfill = Backfill(engine, date(2025, 3, 1), date(2025, 3, 3), concurrency=2, checkpoint_path=checkpoint)
+
+    with pytest.raises(RuntimeError, match="2025-03-02"):
+        backfill.run(replace_table=False)
+    assert engine.swaps == []
+
+    engine.runs.clear()
+    report = backfill.run(replace_table=False)
+    assert engine.runs == [date(2025, 3, 2)]
+    assert engine.swaps == [(date(2025, 3, 1), date(2025, 3, 3))]
+    assert report["resumed_shards"] == 2 and report["rows"] == 3
+    # Only the first run started from scratch, and the checkpoint is gone after the swap
+    assert engine.resets == 1
+    assert not (tmp_path / "checkpoint.json").exists()
@@ -0,0 +1,63 @@
+import asyncio
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+import bronze_compaction
+from bronze_compaction import BronzeCompaction, compacted_path
+from local_fakes import LocalBigQueryHandler, LocalGCSHandler
+
+NOW = datetime(2025, 11, 22, 20, 0, tzinfo=timezone.utc)
+HOUR = datetime(2025, 11, 22, 14, 0, tzinfo=timezone.utc)
+
+
+def ride(ride_id: int, wait_time: int) -> dict:
+    return {"id": ride_id, "name": f"Ride {ride_id}", "is_open": True, "wait_time": wait_time, "last_updated": "2025-11-22T14:00:00.000Z"}
+
+
+def write_minute(gcs: LocalGCSHandler, minute: int, payloads: list) -> str:
+    path = f"layer=bronze/source=queue_times/year=2025/month=11/day=22/hour=14/minute={minute:02d}/part-00000.json.gz"
+    asyncio.run(gcs.upload_bytes(path, gzip.compress("\n".join(json.dumps(p) for p in payloads).encode()), "application/gzip"))
+    return path
+
+
+def read_parquet(gcs: LocalGCSHandler, path: str) -> pd.DataFrame:
+    return pd.read_parquet(io.BytesIO(asyncio.run(gcs.download_bytes(path))))
+
+
+@pytest.fixture
+def compaction(tmp_path):
+    return BronzeCompaction(gcs=LocalGCSHandler(str(tmp_path)), bq=LocalBigQueryHandler())
+
+
+def test_compaction_merges_late_files_and_deletes_originals(compaction):
+    gcs = compaction.gcs
+    write_minute(gcs, 0, [{"park_id": 1, "lands": [], "rides": [ride(10, 5), ride(11, 0)]}])
+    assert asyncio.run(compaction.run(now=NOW)) == 1
+
+    # A late object of the same hour, one reading already compacted
+    write_minute(gcs, 5, [{"park_id": 1, "lands": [{"id": 3, "name": "Land", "rides": [ride(12, 15)]}], "rides": [ride(10, 5)]}])
+    assert asyncio.run(compaction.run(now=NOW)) == 1
+
+    target = compacted_path(HOUR, "hour")
+    assert asyncio.run(gcs.list_blob_names("layer=bronze/")) == [target]
+    frame = read_parquet(gcs, target)
+    assert len(frame) == 4
+    assert not frame.duplicated(["park_id", "ride_id", "timestamp"]).any()
+
+
+def test_compaction_keeps_originals_when_rows_are_lost(compaction, monkeypatch):
+    path = write_minute(compaction.gcs, 0, [{"park_id": 1, "lands": [], "rides": [ride(10, 5), ride(11, 0)]}])
+    encode = bronze_compaction.encode_parquet
+
+    def lossy_encode(records, existing):
+        return encode(records[:-1], existing)
+
+    monkeypatch.setattr(bronze_compaction, "encode_parquet", lossy_encode)
+    assert asyncio.run(compaction.run(now=NOW)) == 0
+    assert asyncio.run(compaction.gcs.list_blob_names("layer=bronze/")) == [path]
+
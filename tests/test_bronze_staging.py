@@ -0,0 +1,127 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bronze_staging import BronzeStaging
+from data_ingestion import settings
+from local_fakes import LocalGCSHandler
+
+
+def write_minute(gcs: LocalGCSHandler, day: int, minute: int, payloads: list) -> str:
+    path = f"layer=bronze/source=queue_times/year=2025/month=11/day={day:02d}/hour=14/minute={minute:02d}/part-00000.json.gz"
+    asyncio.run(gcs.upload_bytes(path, gzip.compress("\n".join(json.dumps(p) for p in payloads).encode()), "application/gzip"))
+    return path
+
+
+@pytest.fixture
+def gcs(tmp_path):
+    return LocalGCSHandler(str(tmp_path))
+
+
+@pytest.fixture
+def staging(gcs, monkeypatch):
+    staging = BronzeStaging(client=None, gcs=gcs)
+    loads = []
+
+    async def load_records(paths, records):
+        loads.append(sorted({record["source_file"] for record in records}))
+
+    monkeypatch.setattr(staging, "_load_records", load_records)
+    monkeypatch.setattr(staging, "ensure_table", lambda: None)
+    # The staging table holds the files of the loads done so far
+    monkeypatch.setattr(staging, "staged_files", lambda paths: {path for load in loads for path in load})
+    staging.loads = loads
+    return staging
+
+
+def test_only_one_run_holds_the_lock(gcs, staging):
+    other = BronzeStaging(client=None, gcs=gcs)
+    assert asyncio.run(staging.acquire_lock())
+    assert not asyncio.run(other.acquire_lock())
+
+    asyncio.run(staging.release_lock())
+    assert asyncio.run(other.acquire_lock())
+
+
+def test_a_stale_lock_is_taken_over(gcs, staging):
+    stale = datetime.now(timezone.utc) - timedelta(minutes=settings.STAGING_LOCK_TIMEOUT_MINUTES + 1)
+    asyncio.run(gcs.upload_bytes(staging.lock_path, json.dumps({"acquired_at": stale.isoformat()}).encode(), "application/json"))
+    assert asyncio.run(staging.acquire_lock())
+
+
+def test_run_is_skipped_while_another_run_stages(gcs, staging):
+    write_minute(gcs, 22, 0, [{"park_id": 1, "lands": [], "rides": [{"id": 10, "name": "A", "is_open": True, "wait_time": 5}]}])
+    assert asyncio.run(BronzeStaging(client=None, gcs=gcs).acquire_lock())
+
+    assert asyncio.run(staging.run()) == {"files": 0, "rows": 0}
+    assert staging.loads == []
+
+
+def test_every_object_is_staged_once_even_without_rides(gcs, staging):
+    with_rides = write_minute(gcs, 22, 0, [{"park_id": 1, "lands": [], "rides": [{"id": 10, "name": "A", "is_open": True, "wait_time": 5}]}])
+    without_rides = write_minute(gcs, 22, 5, [{"park_id": 2, "lands": [], "rides": []}])
+
+    assert asyncio.run(staging.run()) == {"files": 2, "rows": 1}
+    assert staging.loads == [[with_rides]]
+    # The object without rides is not read again
+    assert asyncio.run(staging.run()) == {"files": 0, "rows": 0}
+
+    # Once the raw objects of a day are gone, the records of older days are deleted
+    later = write_minute(gcs, 23, 0, [{"park_id": 2, "lands": [], "rides": []}])
+    asyncio.run(gcs.delete_blobs([with_rides, without_rides]))
+    assert asyncio.run(staging.run()) == {"files": 1, "rows": 0}
+    records = asyncio.run(gcs.list_blob_names(staging.empty_prefix))
+    assert [record.split("/")[-2] for record in records] == ["2025-11-23"]
+    assert asyncio.run(staging.empty_files([later])) == {later}
+    # The lock is released after every run
+    assert asyncio.run(gcs.download_text(staging.lock_path)) is None
+
+
+def test_only_one_run_takes_over_a_stale_lock(gcs, staging, monkeypatch):
+    stale = datetime.now(timezone.utc) - timedelta(minutes=settings.STAGING_LOCK_TIMEOUT_MINUTES + 1)
+    asyncio.run(gcs.upload_bytes(staging.lock_path, json.dumps({"acquired_at": stale.isoformat()}).encode(), "application/json"))
+    stale_versions = asyncio.run(gcs.list_blob_versions(staging.lock_path))
+    stale_content = asyncio.run(gcs.download_text(staging.lock_path))
+
+    # Both runs read the stale lock, then the first one takes it over
+    late = BronzeStaging(client=None, gcs=LocalGCSHandler(str(gcs.root)))
+    assert asyncio.run(staging.acquire_lock())
+
+    async def versions(prefix):
+        return stale_versions
+
+    async def download_text(path):
+        return stale_content
+
+    monkeypatch.setattr(late.gcs, "list_blob_versions", versions)
+    monkeypatch.setattr(late.gcs, "download_text", download_text)
+    # The second run's delete no longer matches: it neither removes nor shares the new lock
+    assert not asyncio.run(late.acquire_lock())
+    assert json.loads(asyncio.run(gcs.download_text(staging.lock_path)))["acquired_at"] != stale.isoformat()
+
+
+def test_later_runs_only_list_the_days_from_the_watermark(gcs, staging, monkeypatch):
+    now = datetime(2025, 11, 23, 1, 0, tzinfo=timezone.utc)
+    first = write_minute(gcs, 22, 0, [{"park_id": 1, "lands": [], "rides": [{"id": 10, "name": "A", "is_open": True, "wait_time": 5}]}])
+    assert asyncio.run(staging.run(now)) == {"files": 1, "rows": 1}
+    assert asyncio.run(staging.load_watermark()) == datetime(2025, 11, 22, 14, 0, tzinfo=timezone.utc)
+
+    listed = []
+    list_blob_names = gcs.list_blob_names
+
+    async def spy(prefix):
+        listed.append(prefix)
+        return await list_blob_names(prefix)
+
+    monkeypatch.setattr(gcs, "list_blob_names", spy)
+    # An object of a day long before the watermark is not listed again
+    write_minute(gcs, 10, 0, [{"park_id": 2, "lands": [], "rides": [{"id": 20, "name": "B", "is_open": True, "wait_time": 5}]}])
+    later = write_minute(gcs, 23, 0, [{"park_id": 3, "lands": [], "rides": [{"id": 30, "name": "C", "is_open": True, "wait_time": 5}]}])
+
+    assert asyncio.run(staging.run(now)) == {"files": 1, "rows": 1}
+    assert staging.loads == [[first], [later]]
+    raw = [prefix for prefix in listed if prefix.startswith("layer=bronze/")]
+    assert [prefix.rsplit("/", 2)[-2] for prefix in raw] == ["day=22", "day=23"]
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from data_ingestion import DataIngestion, settings
+from data_orchestration import DataOrchestration
+from local_fakes import LocalGCSHandler, MockQueueTimesAPI
+from tools.metrics import get_metrics
+
+metrics = get_metrics()
+
+
+class SlowTransformation:
+    """Warehouse-like backend whose jobs outlive the ingestion of the next cycle."""
+    async def run_dag(self) -> None:
+        await asyncio.sleep(0.3)
+        metrics.increment("bigquery_bytes_processed", 100)
+
+
+def test_background_transformation_reports_to_its_own_cycle(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "POLLING_SCHEDULER", False)
+    reports = []
+
+    async def export_metrics(self) -> None:
+        reports.append(metrics.report())
+
+    monkeypatch.setattr(DataOrchestration, "export_metrics", export_metrics)
+    api = MockQueueTimesAPI(parks=5, latency_ms=0)
+    orchestrator = DataOrchestration(
+        DataIngestion(gcs=LocalGCSHandler(str(tmp_path))), transformer=SlowTransformation(), http_transport=api.transport()
+    )
+
+    asyncio.run(orchestrator.run_daemon(interval_seconds=0.1, max_cycles=2))
+
+    # Cycle 2 skips its transformation (cycle 1's still runs) and is exported first
+    assert len(reports) == 2
+    second, first = reports
+    assert first["counters"]["bigquery_bytes_processed"] == 100
+    assert "transformation" in first["stages_seconds"]
+    assert "bigquery_bytes_processed" not in second["counters"]
+    assert "transformation" not in second["stages_seconds"]
+    assert first["started_at"] < second["started_at"]
+    assert first["counters"]["parks_written"] == second["counters"]["parks_written"] == 5
+
+
+def test_import_loads_no_cloud_client_or_dataframe_library():
+    # A fresh interpreter: other tests have already imported them in this one
+    script = (
+        "import json, sys\n"
+        "import data_orchestration\n"
+        "heavy = ('google.cloud', 'pandas', 'numpy', 'pyarrow')\n"
+        "print(json.dumps(sorted(name for name in sys.modules if name.startswith(heavy))))\n"
+    )
+    root = Path(__file__).parent.parent
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(root), str(root / "src")]))
+    result = subprocess.run([sys.executable, "-c", script], env=env, cwd=root, check=True, capture_output=True, text=True)
+    assert json.loads(result.stdout.splitlines()[-1]) == []
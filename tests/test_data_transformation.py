@@ -0,0 +1,92 @@
+import asyncio
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from data_ingestion import settings
+from data_transformation import COMPACTED_PARTITION_COLUMNS, DataTransformation, build_day_filter, build_partition_filter
+from local_fakes import LocalBigQueryClient
+from transform_dag import SUCCEEDED
+
+WATERMARK = datetime(2025, 11, 22, 14, 5, tzinfo=timezone.utc)
+
+
+def selected(predicate: str, partitions: list) -> list:
+    """The (year, month, day, hour, minute) partitions a predicate selects, evaluated by SQLite over a partition table."""
+    with closing(sqlite3.connect(":memory:")) as db:
+        db.execute("CREATE TABLE partitions (year TEXT, month TEXT, day TEXT, hour TEXT, minute TEXT)")
+        db.executemany("INSERT INTO partitions VALUES (?, ?, ?, ?, ?)", partitions)
+        return db.execute(f"SELECT * FROM partitions WHERE {predicate} ORDER BY rowid").fetchall()
+
+
+def test_partition_filter_selects_the_partitions_from_the_watermark():
+    predicate = build_partition_filter(WATERMARK)
+    assert predicate.startswith("year >= '2025' AND ")
+
+    after = [
+        ("2025", "11", "22", "14", "05"),
+        ("2025", "11", "22", "14", "06"),
+        ("2025", "11", "22", "15", "00"),
+        ("2025", "12", "01", "00", "00"),
+        ("2026", "01", "01", "00", "00"),
+    ]
+    before = [
+        ("2025", "11", "22", "14", "04"),
+        ("2025", "11", "22", "13", "59"),
+        ("2025", "11", "21", "23", "59"),
+        ("2024", "12", "31", "23", "59"),
+    ]
+    assert selected(predicate, before + after) == after
+
+
+def test_partition_filter_on_day_partitions_keeps_the_watermark_day():
+    predicate = build_partition_filter(WATERMARK, COMPACTED_PARTITION_COLUMNS)
+    assert "hour" not in predicate
+    partitions = [("2025", "11", "21", None, None), ("2025", "11", "22", None, None), ("2025", "12", "01", None, None)]
+    assert selected(predicate, partitions) == partitions[1:]
+
+
+def test_day_filter_selects_one_day():
+    predicate = build_day_filter(date(2025, 3, 7))
+    assert predicate == "year = '2025' AND month = '03' AND day = '07'"
+    day = [("2025", "03", "07", "00", "00"), ("2025", "03", "07", "23", "59")]
+    others = [("2025", "03", "06", "23", "59"), ("2025", "03", "08", "00", "00"), ("2024", "03", "07", "12", "00")]
+    assert selected(predicate, others + day) == day
+    # Same predicate on the day partitions of the compacted objects
+    assert build_day_filter(date(2025, 3, 7), COMPACTED_PARTITION_COLUMNS) == predicate
+
+
+def test_incremental_dag_renders_and_submits_every_step(tmp_path, monkeypatch):
+    monkeypatch.chdir(Path(__file__).parent.parent)
+    monkeypatch.setattr(settings, "TRANSFORM_POLL_SECONDS", 0.01)
+    silver = f"{settings.GCP_PROJECT_ID}.{settings.DERIVED_DATASET}.{settings.QUEUE_TIMES_SILVER_TABLE}"
+    gold_hourly = f"{settings.GCP_PROJECT_ID}.{settings.GOLD_DATASET}.{settings.GOLD_RIDE_HOURLY_TABLE}"
+    client = LocalBigQueryClient(str(tmp_path), tables=[silver, gold_hourly])
+
+    report = asyncio.run(DataTransformation(client=client).run_dag(full_rebuild=False))
+
+    assert all(step["status"] == SUCCEEDED for step in report.values())
+    jobs = [path.read_text() for path in sorted((tmp_path / "jobs").glob("*.sql"))]
+    assert len(jobs) == 4
+    assert any(job.startswith(f"MERGE `{silver}`") for job in jobs)
+    # The incremental merge only reads the partitions from the watermark
+    assert any(f"year >= '{datetime.now(timezone.utc).year}'" in job for job in jobs)
+    assert f"{settings.GCP_PROJECT_ID}.{settings.GOLD_DATASET}.{settings.GOLD_RIDE_PROFILE_TABLE}" in client.tables
+
+
+def test_rebuild_merge_and_backfill_wrap_the_same_rides(tmp_path, monkeypatch):
+    from backfill import BigQueryBackfill
+    monkeypatch.chdir(Path(__file__).parent.parent)
+    transformer = DataTransformation(client=LocalBigQueryClient(str(tmp_path)))
+    rides = transformer.get_bronze_rides("TRUE", "")
+
+    rebuild = transformer.get_sql("sql/transform_queue_times.sql", "", "silver", rides=rides)
+    merge = transformer.get_sql("sql/transform_queue_times_incremental.sql", "", "silver", rides=rides, watermark="w")
+    assert rides in rebuild and rides in merge
+    # Every path drops the duplicate keys of a window both raw and compacted
+    assert "QUALIFY ROW_NUMBER() OVER" in rides
+
+    backfill = BigQueryBackfill.__new__(BigQueryBackfill)
+    backfill.transformer = transformer
+    assert backfill.shard_query(date(2025, 3, 7)) == transformer.get_bronze_rides(build_day_filter(date(2025, 3, 7)), "")
@@ -0,0 +1,45 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+import pytest
+
+import ingestion_pipeline
+from data_ingestion import DataIngestion, settings
+from ingestion_pipeline import StreamingIngestion
+from local_fakes import LocalGCSHandler, MockQueueTimesAPI
+
+
+def run_snapshot(tmp_path, parks: int) -> dict:
+    api = MockQueueTimesAPI(parks=parks, latency_ms=0)
+    streaming = StreamingIngestion(DataIngestion(gcs=LocalGCSHandler(str(tmp_path))))
+
+    async def run() -> dict:
+        async with httpx.AsyncClient(transport=api.transport()) as client:
+            # Bounded: a stuck stage fails the test instead of hanging it
+            return await asyncio.wait_for(streaming.run(client, list(range(1, parks + 1))), timeout=30)
+
+    return asyncio.run(run())
+
+
+def test_every_park_lands_in_the_snapshot(tmp_path):
+    summary = run_snapshot(tmp_path, parks=20)
+
+    assert summary["parks_written"] == 20
+    lines = []
+    for path in summary["paths"]:
+        lines.extend(gzip.decompress((tmp_path / path).read_bytes()).splitlines())
+    assert sorted(json.loads(line)["park_id"] for line in lines) == list(range(1, 21))
+
+
+def test_encoder_failure_is_raised_instead_of_hanging(tmp_path, monkeypatch):
+    def failing_add(self, line: bytes) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ingestion_pipeline.SnapshotShard, "add", failing_add)
+    # More parks than the payload queue holds, so fetchers block on it
+    monkeypatch.setattr(settings, "PIPELINE_QUEUE_SIZE", 2)
+
+    with pytest.raises(OSError, match="disk full"):
+        run_snapshot(tmp_path, parks=20)
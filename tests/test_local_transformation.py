@@ -0,0 +1,93 @@
+import asyncio
+import gzip
+import json
+import os
+
+import pandas as pd
+
+from data_ingestion import settings
+from local_fakes import LocalGCSHandler
+from local_transformation import LocalTransformation, categorize_wait_times
+from shared.queue_times_records import RIDE_COLUMNS, flatten_queue_times_payload
+
+RAW = "layer=bronze/source=queue_times/year=2025/month=11/day=22/hour=14/minute=05/part-00000.json.gz"
+COMPACTED = "layer=bronze/source=queue_times_compacted/year=2025/month=11/day=22/hour-14.parquet"
+
+
+def ride(ride_id: int, wait_time: int) -> dict:
+    return {"id": ride_id, "name": f"Ride {ride_id}", "is_open": True, "wait_time": wait_time, "last_updated": "2025-11-22T14:00:00.000Z"}
+
+
+def raw_object(rides: list) -> bytes:
+    return gzip.compress(json.dumps({"park_id": 1, "lands": [], "rides": rides}).encode())
+
+
+def test_categorize_wait_times():
+    categories = categorize_wait_times(pd.Series([0, 10, 30, 90, None], dtype="Int64"))
+    assert list(categories) == ["None", "Short", "Medium", "Long", "Unknown"]
+
+
+def test_mirror_follows_compaction_without_duplicates(tmp_path):
+    gcs = LocalGCSHandler(str(tmp_path / "bucket"))
+    transformer = LocalTransformation(data_dir=str(tmp_path / "mirror"), output_dir=str(tmp_path / "silver"))
+    asyncio.run(gcs.upload_bytes(RAW, raw_object([ride(10, 5), ride(11, 20)]), "application/gzip"))
+
+    assert asyncio.run(transformer.download_bronze(gcs=gcs)) == 1
+    assert asyncio.run(transformer.download_bronze(gcs=gcs)) == 0
+    assert len(transformer.transform_queue_times()) == 2
+
+    # The window is compacted: the raw object is deleted, the rows now live in Parquet
+    compacted = transformer.load_rides()
+    asyncio.run(gcs.upload_bytes(COMPACTED, compacted.to_parquet(index=False), "application/vnd.apache.parquet"))
+    asyncio.run(gcs.delete_blobs([RAW]))
+    asyncio.run(transformer.download_bronze(gcs=gcs))
+    assert not (tmp_path / "mirror" / RAW).exists()
+    assert len(transformer.transform_queue_times()) == 2
+
+    # A late merge rewrites the compacted file under the same name
+    late = pd.concat([compacted, compacted.assign(ride_id=pd.array([12, 13], dtype="Int64"))], ignore_index=True)
+    asyncio.run(gcs.upload_bytes(COMPACTED, late.to_parquet(index=False), "application/vnd.apache.parquet"))
+    os.utime(tmp_path / "bucket" / COMPACTED, ns=(1, 1))
+    assert asyncio.run(transformer.download_bronze(gcs=gcs)) == 1
+    assert sorted(transformer.transform_queue_times()["ride_id"]) == [10, 11, 12, 13]
+
+
+def test_rows_read_raw_and_compacted_are_kept_once(tmp_path):
+    transformer = LocalTransformation(data_dir=str(tmp_path), output_dir=str(tmp_path / "silver"))
+    (tmp_path / RAW).parent.mkdir(parents=True)
+    (tmp_path / RAW).write_bytes(raw_object([ride(10, 5), ride(11, 20)]))
+    (tmp_path / COMPACTED).parent.mkdir(parents=True)
+    transformer.load_rides().to_parquet(tmp_path / COMPACTED, index=False)
+
+    assert len(transformer.load_rides()) == 4
+    assert len(transformer.transform_queue_times()) == 2
+
+
+def test_arrow_flattening_matches_the_record_flattening(tmp_path):
+    payloads = [
+        {"park_id": 1, "rides": [ride(10, 5)], "lands": [
+            {"id": 100, "name": "Main Street", "rides": [ride(11, 20), ride(12, 0)]},
+            {"id": 101, "name": None, "rides": [{"id": 13, "name": None, "is_open": None, "wait_time": None}]},
+        ]},
+        {"park_id": 2, "lands": [{"id": 200, "name": "Empty", "rides": []}], "rides": [dict(ride(20, 50), queue_type="virtual")]},
+        {"park_id": 3},
+    ]
+    path = tmp_path / RAW
+    path.parent.mkdir(parents=True)
+    path.write_bytes(gzip.compress("\n".join(json.dumps(payload) for payload in payloads).encode()))
+    (path.parent / "part-00001.json.gz").write_bytes(gzip.compress(b""))
+
+    minute = pd.Timestamp("2025-11-22 14:05", tz="UTC").to_pydatetime()
+    records = [record for payload in payloads for record in flatten_queue_times_payload(payload, minute)]
+    expected = pd.DataFrame.from_records(records, columns=list(RIDE_COLUMNS)).astype(RIDE_COLUMNS)
+    pd.testing.assert_frame_equal(LocalTransformation(data_dir=str(tmp_path)).load_rides(), expected)
+
+
+def test_run_dag_writes_the_silver_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_DOWNLOAD_BRONZE", False)
+    monkeypatch.setattr(settings, "HISTORY_ARCHIVE", False)
+    (tmp_path / RAW).parent.mkdir(parents=True)
+    (tmp_path / RAW).write_bytes(raw_object([ride(10, 5), ride(11, 20)]))
+
+    asyncio.run(LocalTransformation(data_dir=str(tmp_path), output_dir=str(tmp_path / "silver")).run_dag())
+    assert len(pd.read_parquet(tmp_path / "silver" / f"{settings.QUEUE_TIMES_SILVER_TABLE}.parquet")) == 2
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from tools import logger as log
+from tools.logger import ContextFilter, JsonFormatter, RateLimitFilter, log_context, set_log_context
+
+
+def record(level: int = logging.INFO, lineno: int = 10, msg: str = "Park %s fetched", args: tuple = (7,)) -> logging.LogRecord:
+    return logging.LogRecord("test", level, "src/data_ingestion.py", lineno, msg, args, None)
+
+
+def test_rate_limit_caps_each_call_site_per_second(monkeypatch):
+    clock = [100.2]
+    monkeypatch.setattr(log.time, "monotonic", lambda: clock[0])
+    limiter = RateLimitFilter(rate_limit=2, debug_sample_rate=1.0)
+
+    assert [limiter.filter(record()) for _ in range(3)] == [True, True, False]
+    # Another call site has its own budget, warnings and errors are never dropped
+    assert limiter.filter(record(lineno=11))
+    assert limiter.filter(record(logging.WARNING)) and limiter.filter(record(logging.ERROR))
+
+    clock[0] = 101.0
+    assert limiter.filter(record())
+    # Unlimited by default
+    assert all(RateLimitFilter(rate_limit=0, debug_sample_rate=1.0).filter(record()) for _ in range(100))
+
+
+def test_debug_records_are_sampled(monkeypatch):
+    draws = iter([0.1, 0.3, 0.9, 0.0])
+    monkeypatch.setattr(log.random, "random", lambda: next(draws))
+    sampler = RateLimitFilter(rate_limit=0, debug_sample_rate=0.25)
+
+    assert [sampler.filter(record(logging.DEBUG)) for _ in range(3)] == [True, False, False]
+    # Only DEBUG is sampled
+    assert sampler.filter(record(logging.INFO))
+    assert not RateLimitFilter(rate_limit=0, debug_sample_rate=0.0).filter(record(logging.DEBUG))
+
+
+def test_context_fields_follow_the_task():
+    context = ContextFilter()
+
+    async def park(park_id: int) -> dict:
+        with log_context(park_id=park_id):
+            await asyncio.sleep(0)
+            entry = record()
+            context.filter(entry)
+            return entry.context
+
+    async def run() -> list:
+        set_log_context(run_id="run-a")
+        return await asyncio.gather(park(1), park(2))
+
+    assert asyncio.run(run()) == [{"run_id": "run-a", "park_id": 1}, {"run_id": "run-a", "park_id": 2}]
+    # Nothing leaks out of the block or the task
+    entry = record()
+    context.filter(entry)
+    assert entry.context == {}
+
+
+def test_json_formatter_writes_one_object_with_the_context():
+    entry = record()
+    entry.context = {"run_id": "run-a", "park_id": 7}
+    line = json.loads(JsonFormatter().format(entry))
+    assert line["message"] == "Park 7 fetched"
+    assert (line["level"], line["logger"], line["run_id"], line["park_id"]) == ("INFO", "test", "run-a", 7)
+    assert "exception" not in line
+
+    try:
+        raise ValueError("bad payload")
+    except ValueError:
+        failed = logging.LogRecord("test", logging.ERROR, __file__, 1, "failed", None, sys.exc_info())
+    assert "ValueError: bad payload" in json.loads(JsonFormatter().format(failed))["exception"]
+
+
+def test_queue_mode_flushes_every_record_at_exit(tmp_path):
+    script = (
+        "from tools.logger import get_logger\n"
+        "logger = get_logger('pipeline_test')\n"
+        "for index in range(2000):\n"
+        "    logger.debug('record %s', index)\n"
+    )
+    env = dict(os.environ, LOG_MODE="queue", LOG_FORMAT="json", LOG_DIR=str(tmp_path))
+    subprocess.run([sys.executable, "-c", script], env=env, cwd=Path(__file__).parent.parent, check=True, capture_output=True)
+
+    lines = (tmp_path / "pipeline.log").read_text().splitlines()
+    assert [json.loads(line)["message"] for line in lines] == [f"record {index}" for index in range(2000)]
@@ -0,0 +1,63 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+
+from data_ingestion import DataIngestion
+from local_fakes import LocalGCSHandler
+from tools.metrics import NAMESPACE, RunMetrics, get_metrics, start_run_metrics
+
+
+def test_histogram_percentiles():
+    metrics = RunMetrics()
+    for value in range(1, 101):
+        metrics.observe("fetch_seconds", value / 100)
+    metrics.observe("gcs_upload_seconds", 0.5)
+
+    histograms = metrics.report()["histograms"]
+    fetch = histograms["fetch_seconds"]
+    assert (fetch["count"], round(fetch["sum"], 6)) == (100, 50.5)
+    assert (round(fetch["p50"], 6), round(fetch["p95"], 6), round(fetch["p99"], 6)) == (0.505, 0.9505, 0.9901)
+    # A single value is every percentile
+    assert histograms["gcs_upload_seconds"] == {"count": 1, "sum": 0.5, "p50": 0.5, "p95": 0.5, "p99": 0.5}
+
+
+def test_prometheus_exposition():
+    metrics = RunMetrics()
+    metrics.stages["ingestion"] = 1.5
+    metrics.observe("fetch_seconds", 0.25)
+    metrics.increment("parks_written", 3)
+
+    assert metrics.to_prometheus().splitlines() == [
+        f"# TYPE {NAMESPACE}_stage_seconds gauge",
+        f'{NAMESPACE}_stage_seconds{{stage="ingestion"}} 1.5',
+        f"# TYPE {NAMESPACE}_fetch_seconds summary",
+        f'{NAMESPACE}_fetch_seconds{{quantile="0.50"}} 0.25',
+        f'{NAMESPACE}_fetch_seconds{{quantile="0.95"}} 0.25',
+        f'{NAMESPACE}_fetch_seconds{{quantile="0.99"}} 0.25',
+        f"{NAMESPACE}_fetch_seconds_sum 0.25",
+        f"{NAMESPACE}_fetch_seconds_count 1",
+        f"# TYPE {NAMESPACE}_parks_written counter",
+        f"{NAMESPACE}_parks_written 3",
+    ]
+    assert RunMetrics().to_prometheus() == f"# TYPE {NAMESPACE}_stage_seconds gauge\n"
+
+
+def test_api_bytes_are_counted_on_the_wire(tmp_path):
+    body = json.dumps({"lands": [], "rides": [{"id": 1, "name": "Train"}] * 50}).encode()
+    wire = gzip.compress(body)
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"Content-Encoding": "gzip"}, stream=httpx.ByteStream(wire))
+
+    async def fetch() -> RunMetrics:
+        run_metrics = start_run_metrics()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as client:
+            response = await DataIngestion(gcs=LocalGCSHandler(str(tmp_path)))._get(client, "https://queue-times.com/parks/1/queue_times.json")
+        assert response.content == body
+        # The module-level proxy updates the metrics of the current run
+        assert get_metrics().counters is run_metrics.counters
+        return run_metrics
+
+    assert asyncio.run(fetch()).counters["api_bytes_downloaded"] == len(wire) < len(body)
@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import sharded_ingestion
+from data_ingestion import DataIngestion, settings
+from data_orchestration import DataOrchestration
+from local_fakes import LocalGCSHandler, MockQueueTimesAPI
+from shared.park_sharding import ConsistentHashRing, ShardAssignment, ShardCoordinator, snapshot_minute
+
+PREFIX = "state/ingestion_shards/"
+SLOT = datetime(2025, 11, 22, 14, 5, tzinfo=timezone.utc)
+
+
+def test_ring_assignment_is_stable_and_balanced():
+    parks = list(range(1, 2001))
+    ring = ConsistentHashRing(4, virtual_nodes=256)
+    shards = [ring.shard(parks, worker) for worker in range(4)]
+
+    # Every park belongs to exactly one worker, in its original order
+    assert sorted(park for shard in shards for park in shard) == parks
+    assert all(shard == sorted(shard) for shard in shards)
+    assert max(len(shard) for shard in shards) < 1.2 * len(parks) / 4
+    # Another process computes the same assignment
+    assert [ConsistentHashRing(4, virtual_nodes=256).worker_for(park) for park in parks] == [ring.worker_for(park) for park in parks]
+
+
+def test_adding_a_worker_moves_only_its_share():
+    parks = list(range(1, 2001))
+    before, after = ConsistentHashRing(4), ConsistentHashRing(5)
+    moved = [park for park in parks if before.worker_for(park) != after.worker_for(park)]
+    # Parks only move to the new worker
+    assert all(after.worker_for(park) == 4 for park in moved)
+    assert len(moved) < 0.3 * len(parks)
+
+    with pytest.raises(ValueError):
+        ConsistentHashRing(0)
+
+
+def test_snapshot_minute_is_the_start_of_the_slot():
+    assert snapshot_minute(datetime(2025, 11, 22, 14, 9, 59, tzinfo=timezone.utc), 5) == SLOT
+    assert snapshot_minute(SLOT, 5) == SLOT
+
+
+def coordinator(gcs: LocalGCSHandler, run_id: str, index: int, count: int = 2, slot: datetime = SLOT) -> ShardCoordinator:
+    return ShardCoordinator(gcs, PREFIX, ShardAssignment(index, count, run_id, slot), timeout_minutes=60)
+
+
+def test_the_last_shard_claims_the_run_once(tmp_path):
+    gcs = LocalGCSHandler(str(tmp_path))
+    first, second = coordinator(gcs, "run-a", 0), coordinator(gcs, "run-a", 1)
+    asyncio.run(first.join())
+    # A task started after the slot boundary (or retried) keeps its own, later slot
+    second.assignment.snapshot_time = SLOT + timedelta(minutes=5)
+    asyncio.run(second.join())
+    assert second.assignment.snapshot_time == SLOT + timedelta(minutes=5)
+
+    assert asyncio.run(first.finish(3)) is None
+    assert asyncio.run(second.finish(4)) == 7
+    # A shard finishing again (retried task) does not claim it a second time
+    assert asyncio.run(coordinator(gcs, "run-a", 1).finish(4)) is None
+
+    asyncio.run(second.cleanup())
+    assert asyncio.run(gcs.list_blob_names(PREFIX)) == []
+
+
+def test_a_run_left_incomplete_is_claimed_after_the_timeout(tmp_path):
+    gcs = LocalGCSHandler(str(tmp_path))
+    now = datetime.now(timezone.utc)
+    # Shard 1 of run-a died before its marker
+    dead = coordinator(gcs, "run-a", 0)
+    asyncio.run(dead.join(now=now - timedelta(minutes=61)))
+    asyncio.run(dead.finish(3))
+    # run-b is incomplete but recent: its shards may still be running
+    asyncio.run(coordinator(gcs, "run-b", 0).join(now=now - timedelta(minutes=5)))
+    # run-0 was transformed, but its cleanup failed after deleting its markers
+    done = coordinator(gcs, "run-0", 0)
+    asyncio.run(done.join(now=now - timedelta(minutes=120)))
+    asyncio.run(gcs.upload_json_data(f"{PREFIX}run-0/transform.json", {"worker": 1}))
+
+    sweeper = coordinator(gcs, "run-c", 0)
+    assert asyncio.run(sweeper.claim_stale_runs(now)) == 1
+    assert sweeper.claimed_folders == [f"{PREFIX}run-0/", f"{PREFIX}run-a/"]
+    # Another shard does not claim them again
+    assert asyncio.run(coordinator(gcs, "run-c", 1).claim_stale_runs(now)) == 0
+
+    asyncio.run(sweeper.cleanup())
+    assert {name.split("/")[2] for name in asyncio.run(gcs.list_blob_names(PREFIX))} == {"run-b"}
+
+
+class CountingTransformation:
+    def __init__(self) -> None:
+        self.runs = 0
+
+    async def run_dag(self) -> None:
+        self.runs += 1
+
+
+def test_a_sharded_run_transforms_its_stale_predecessor(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "POLLING_SCHEDULER", False)
+    monkeypatch.setattr(settings, "CHANGE_DETECTION", False)
+    monkeypatch.setattr(DataOrchestration, "export_metrics", lambda self: asyncio.sleep(0))
+    gcs = LocalGCSHandler(str(tmp_path))
+    transformer = CountingTransformation()
+    api = MockQueueTimesAPI(parks=6, latency_ms=0)
+
+    # A run whose second worker died an hour ago
+    stale = coordinator(gcs, "run-a", 0)
+    asyncio.run(stale.join(now=datetime.now(timezone.utc) - timedelta(minutes=90)))
+    asyncio.run(stale.finish(0))
+
+    runs = []
+    for index in range(2):
+        orchestrator = DataOrchestration(
+            DataIngestion(gcs=gcs), transformer=transformer, http_transport=api.transport(),
+            shard=ShardAssignment(index, 2, "run-b", SLOT)
+        )
+        asyncio.run(orchestrator.run_pipeline())
+        runs.append(transformer.runs)
+
+    # The first shard to finish transforms the stale run, the last one its own run
+    assert runs == [1, 2]
+    assert asyncio.run(gcs.list_blob_names(PREFIX)) == []
+
+
+def test_cloud_run_tasks_share_the_execution_as_run(monkeypatch):
+    monkeypatch.setattr(settings, "CLOUD_RUN_EXECUTION", "ingestion-job-x7k2p")
+    monkeypatch.setattr(settings, "CLOUD_RUN_TASK_INDEX", 2)
+    monkeypatch.setattr(settings, "CLOUD_RUN_TASK_COUNT", 4)
+    assignment = sharded_ingestion.cloud_run_assignment(SLOT + timedelta(minutes=3))
+    assert (assignment.index, assignment.count, assignment.run_id) == (2, 4, "ingestion-job-x7k2p")
+
+    monkeypatch.setattr(settings, "CLOUD_RUN_EXECUTION", "")
+    with pytest.raises(ValueError):
+        sharded_ingestion.cloud_run_assignment()
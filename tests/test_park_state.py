@@ -0,0 +1,40 @@
+from shared.park_state import ParkState, payload_hash
+
+
+def test_payload_hash_depends_only_on_the_content():
+    assert payload_hash(b'{"lands":[]}\n') == payload_hash(b'{"lands":[]}\n')
+    assert payload_hash(b'{"lands":[]}\n') != payload_hash(b'{"lands":[1]}\n')
+    assert len(payload_hash(b"")) == 64
+
+
+def test_staged_changes_only_count_once_committed():
+    state = ParkState()
+    state.stage(7, "abc", etag='"v1"', last_modified=None)
+    assert not state.is_unchanged(7, "abc")
+    assert state.conditional_headers(7) == {}
+
+    state.commit()
+    assert state.is_unchanged(7, "abc")
+    assert state.conditional_headers(7) == {"If-None-Match": '"v1"'}
+
+
+def test_discard_drops_the_run_changes():
+    state = ParkState()
+    state.stage(7, "abc", etag=None, last_modified="Sat, 22 Nov 2025 14:00:00 GMT")
+    state.discard()
+    state.commit()
+    assert state.get(7) == {}
+
+
+def test_local_round_trip(tmp_path):
+    path = str(tmp_path / "state" / "parks.json")
+    assert ParkState.load_local(path).parks == {}
+
+    state = ParkState()
+    state.stage(7, "abc", etag=None, last_modified="Sat, 22 Nov 2025 14:00:00 GMT")
+    state.commit()
+    state.save_local(path)
+
+    loaded = ParkState.load_local(path)
+    assert loaded.is_unchanged(7, "abc")
+    assert loaded.conditional_headers(7) == {"If-Modified-Since": "Sat, 22 Nov 2025 14:00:00 GMT"}
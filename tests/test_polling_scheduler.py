@@ -0,0 +1,101 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from data_ingestion import settings
+from local_fakes import LocalGCSHandler
+from polling_scheduler import (
+    TIER_ACTIVE,
+    TIER_CLOSED,
+    TIER_STATIC,
+    ParkProfile,
+    PollingScheduler,
+    build_profiles,
+    estimate_savings,
+    extract_park_timezones,
+    park_tier,
+    plan_polling,
+)
+
+# 14:00 in Paris, 08:00 in New York, 02:00 in Auckland
+NOW = datetime(2025, 11, 22, 13, 0, tzinfo=timezone.utc)
+
+
+def profile(open_hours: range, volatile_hours: range) -> ParkProfile:
+    return ParkProfile(
+        open_ratio={hour: 1.0 if hour in open_hours else 0.0 for hour in range(24)},
+        change_ratio={hour: 0.8 if hour in volatile_hours else 0.0 for hour in range(24)},
+    )
+
+
+def test_build_profiles_and_timezones():
+    profiles = build_profiles([
+        {"park_id": 1, "local_hour": 14, "open_ratio": 0.9, "change_ratio": 0.5},
+        {"park_id": 1, "local_hour": 3, "open_ratio": 0.0, "change_ratio": 0},
+    ])
+    assert profiles[1].is_open(14) and profiles[1].is_volatile(14)
+    assert not profiles[1].is_open(3)
+
+    parks = [{"id": 1, "name": "Company", "parks": [{"id": 5, "timezone": "Europe/Paris"}, {"id": 6}]}]
+    assert extract_park_timezones(parks) == {5: "Europe/Paris", 6: None}
+
+
+def test_tiers_follow_the_local_hour():
+    busy = profile(range(9, 22), range(11, 18))
+    assert park_tier(1, "Europe/Paris", busy, NOW) == TIER_ACTIVE
+    assert park_tier(1, "Europe/Paris", busy, NOW.replace(hour=19)) == TIER_STATIC
+    assert park_tier(1, "America/New_York", busy, NOW) == TIER_CLOSED
+
+
+def test_tiers_without_profile_or_timezone():
+    assert park_tier(1, None, None, NOW) == TIER_ACTIVE
+    assert park_tier(1, "Not/AZone", None, NOW) == TIER_ACTIVE
+    assert park_tier(1, "Europe/Paris", None, NOW) == TIER_ACTIVE
+    assert park_tier(1, "Pacific/Auckland", None, NOW) == TIER_CLOSED
+
+
+def test_plan_polls_each_tier_at_its_rate_and_staggers_parks():
+    timezones = {park_id: "Europe/Paris" for park_id in range(1, 25)}
+    profiles = {park_id: profile(range(0, 24), range(0, 0)) for park_id in range(1, 13)}
+    profiles.update({park_id: profile(range(0, 0), range(0, 0)) for park_id in range(13, 25)})
+
+    polls: Counter = Counter()
+    per_run = []
+    runs = settings.POLL_STATIC_EVERY_RUNS * settings.POLL_CLOSED_EVERY_RUNS
+    for index in range(runs):
+        plan = plan_polling(timezones, profiles, NOW + timedelta(minutes=index * settings.POLL_INTERVAL_MINUTES))
+        assert plan[TIER_ACTIVE] == []
+        polls.update(plan[TIER_STATIC] + plan[TIER_CLOSED])
+        per_run.append(len(plan[TIER_STATIC]))
+
+    assert all(polls[park_id] == runs // settings.POLL_STATIC_EVERY_RUNS for park_id in range(1, 13))
+    assert all(polls[park_id] == runs // settings.POLL_CLOSED_EVERY_RUNS for park_id in range(13, 25))
+    # Staggered: the static parks are spread over the runs, not polled all at once
+    assert max(per_run) - min(per_run) <= 1
+
+
+def test_estimate_savings():
+    timezones = {1: "Europe/Paris", 2: "Europe/Paris", 3: None}
+    profiles = {1: profile(range(0, 0), range(0, 0)), 2: profile(range(0, 24), range(0, 24))}
+    runs = settings.POLL_CLOSED_EVERY_RUNS
+    savings = estimate_savings(timezones, profiles, NOW, runs)
+
+    assert savings["baseline_calls"] == 3 * runs
+    # Park 1 is closed (1 call), parks 2 and 3 are active (every run)
+    assert savings["planned_calls"] == 1 + 2 * runs
+    assert savings["saved_ratio"] == 1 - (1 + 2 * runs) / (3 * runs)
+    assert estimate_savings({}, {}, NOW, 10)["saved_ratio"] == 0.0
+
+
+def test_profiles_cached_with_changes_per_hour_are_recomputed(tmp_path, monkeypatch):
+    gcs = LocalGCSHandler(str(tmp_path))
+    rows = [{"park_id": 1, "local_hour": 14, "open_ratio": 0.9, "changes_per_hour": 6}]
+    asyncio.run(gcs.upload_json_data(settings.POLL_PROFILE_PATH, {"refreshed_at": NOW.isoformat(), "rows": rows}))
+    scheduler = PollingScheduler(gcs)
+    monkeypatch.setattr(scheduler, "_query_profile_rows", lambda: [
+        {"park_id": 1, "local_hour": 14, "open_ratio": 0.9, "change_ratio": 0.5}
+    ])
+
+    profiles = asyncio.run(scheduler.load_profiles())
+    assert profiles[1].is_volatile(14)
+    assert "change_ratio" in asyncio.run(gcs.download_text(settings.POLL_PROFILE_PATH))
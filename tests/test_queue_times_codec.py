@@ -0,0 +1,58 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from shared.queue_times_codec import decode_queue_times
+from shared.queue_times_records import flatten_queue_times_payload
+
+T0 = datetime(2025, 11, 22, 14, 5, tzinfo=timezone.utc)
+
+BODY = {
+    "lands": [{"id": 10, "name": "Main Street", "rides": [
+        {"id": 100, "name": "Coaster", "is_open": True, "wait_time": 25, "last_updated": "2025-11-22T14:03:00.000Z"},
+        {"id": 101, "name": "Carousel", "is_open": False, "wait_time": 0, "last_updated": "2025-11-22T14:03:00.000Z"},
+    ]}],
+    "rides": [{"id": 200, "name": "Train", "is_open": True, "wait_time": 5, "last_updated": "2025-11-22T14:03:00.000Z"}],
+}
+
+
+def test_line_flattens_to_the_records_of_the_body():
+    payload = decode_queue_times(json.dumps(BODY).encode(), park_id=7)
+    line = json.loads(payload.ndjson_line())
+
+    assert flatten_queue_times_payload(line, T0) == flatten_queue_times_payload(dict(BODY, park_id=7), T0)
+    assert [ride.id for ride in payload.iter_rides()] == [200, 100, 101]
+    # The line is encoded once and shared
+    assert payload.ndjson_line() is payload.ndjson_line()
+
+
+def test_null_fields_keep_the_rest_of_the_park():
+    body = {"lands": [{"id": 10, "name": None, "rides": [
+        {"id": 100, "name": None, "is_open": None, "wait_time": None},
+        {"id": 101, "name": "Carousel", "is_open": True, "wait_time": 10},
+    ]}]}
+    payload = decode_queue_times(json.dumps(body).encode(), park_id=7)
+
+    records = flatten_queue_times_payload(json.loads(payload.ndjson_line()), T0)
+    assert [(r["ride_id"], r["ride_name"], r["is_open"], r["wait_time"]) for r in records] == [
+        (100, None, None, None), (101, "Carousel", True, 10)
+    ]
+
+
+def test_unknown_fields_are_kept_and_missing_ones_added():
+    body = {"rides": [{"id": 200, "name": "Train", "is_open": True, "wait_time": 5, "queue_type": "virtual"}]}
+    line = json.loads(decode_queue_times(json.dumps(body).encode(), park_id=7).ndjson_line())
+
+    assert line["rides"][0]["queue_type"] == "virtual"
+    # Not the body byte for byte: defaults and the park id are written too
+    assert line["lands"] == [] and line["park_id"] == 7
+    assert line["rides"][0]["last_updated"] is None
+
+
+def test_malformed_payloads_are_rejected():
+    with pytest.raises(ValidationError):
+        decode_queue_times(b'{"rides": [{"id": "not-a-number", "name": "Train"}]}', park_id=7)
+    with pytest.raises(ValidationError):
+        decode_queue_times(b'{"rides": [', park_id=7)
@@ -0,0 +1,44 @@
+import gzip
+import json
+from datetime import datetime, timezone
+
+from shared.queue_times_records import (
+    count_rides,
+    decode_bronze_object,
+    flatten_queue_times_payload,
+    parse_minute_partition,
+)
+
+PAYLOAD = {
+    "park_id": 7,
+    "lands": [{"id": 3, "name": "Adventureland", "rides": [
+        {"id": 10, "name": "Jungle Cruise", "is_open": True, "wait_time": 25, "last_updated": "2025-11-22T14:03:00.000Z"},
+        {"id": 11, "name": "Tiki Room", "is_open": False, "wait_time": 0, "last_updated": None},
+    ]}],
+    "rides": [{"id": 12, "name": "Railroad", "is_open": True, "wait_time": "5", "last_updated": "2025-11-22T14:01:00.000Z"}],
+}
+
+
+def test_flatten_puts_root_rides_in_the_general_land():
+    timestamp = datetime(2025, 11, 22, 14, 5, tzinfo=timezone.utc)
+    records = flatten_queue_times_payload(PAYLOAD, timestamp)
+
+    assert len(records) == count_rides(PAYLOAD) == 3
+    root, nested, closed = records
+    assert (root["land_id"], root["land_name"], root["wait_time"]) == (None, "General", 5)
+    assert (nested["park_id"], nested["land_id"], nested["land_name"], nested["ride_id"]) == (7, 3, "Adventureland", 10)
+    assert nested["last_updated"] == datetime(2025, 11, 22, 14, 3, tzinfo=timezone.utc)
+    assert closed["last_updated"] is None
+    assert all(record["timestamp"] == timestamp for record in records)
+
+
+def test_parse_minute_partition():
+    path = "layer=bronze/source=queue_times/year=2025/month=11/day=22/hour=14/minute=05/part-00000.json.gz"
+    assert parse_minute_partition(path) == datetime(2025, 11, 22, 14, 5, tzinfo=timezone.utc)
+    assert parse_minute_partition("layer=bronze/source=queue_times/year=2025/other.json") is None
+
+
+def test_decode_gzip_snapshot_and_plain_object():
+    lines = "\n".join(json.dumps({"park_id": park_id}) for park_id in (1, 2)) + "\n"
+    assert decode_bronze_object("part-00000.json.gz", gzip.compress(lines.encode())) == [{"park_id": 1}, {"park_id": 2}]
+    assert decode_bronze_object("park_1.json", b'{"park_id": 1}') == [{"park_id": 1}]
@@ -0,0 +1,37 @@
+import asyncio
+import json
+
+import pytest
+
+from local_fakes import LocalGCSHandler
+from rewrite_legacy_bronze import (
+    LegacyBronzeRewrite,
+    REWRITTEN_FILENAME,
+    ensure_no_legacy_objects,
+    is_legacy_object,
+)
+from shared.queue_times_records import decode_bronze_object
+
+MINUTE = "layer=bronze/source=queue_times/year=2025/month=11/day=22/hour=14/minute=05/"
+
+
+def test_is_legacy_object():
+    assert is_legacy_object(f"{MINUTE}park_12.json")
+    assert not is_legacy_object(f"{MINUTE}part-00000.json.gz")
+    assert not is_legacy_object(f"{MINUTE}worker-0001-part-00000-0000.json.gz")
+
+
+def test_rewrite_moves_legacy_payloads_into_one_gzip_object(tmp_path):
+    gcs = LocalGCSHandler(str(tmp_path))
+    for park_id in (1, 2):
+        asyncio.run(gcs.upload_json_data(f"{MINUTE}park_{park_id}.json", {"park_id": park_id, "lands": [], "rides": []}))
+
+    with pytest.raises(RuntimeError, match="legacy"):
+        asyncio.run(ensure_no_legacy_objects(gcs))
+
+    assert asyncio.run(LegacyBronzeRewrite(gcs).run()) == 2
+
+    assert asyncio.run(gcs.list_blob_names("layer=bronze/")) == [f"{MINUTE}{REWRITTEN_FILENAME}"]
+    content = asyncio.run(gcs.download_bytes(f"{MINUTE}{REWRITTEN_FILENAME}"))
+    assert [payload["park_id"] for payload in decode_bronze_object(REWRITTEN_FILENAME, content)] == [1, 2]
+    asyncio.run(ensure_no_legacy_objects(gcs))
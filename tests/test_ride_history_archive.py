@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from shared.queue_times_records import RIDE_COLUMNS
+from shared.ride_history_archive import RideHistoryArchive
+
+T0 = pd.Timestamp("2025-11-22 14:00", tz="UTC")
+
+
+def readings(rows: list) -> pd.DataFrame:
+    """Silver-shaped rows from (minute, park_id, ride_id, wait_time, is_open, updated_minute)."""
+    return pd.DataFrame.from_records([
+        {
+            "timestamp": T0 + pd.Timedelta(minutes=minute), "park_id": park_id, "land_id": 10, "land_name": "Main Street",
+            "ride_id": ride_id, "ride_name": f"Ride {ride_id}", "is_open": is_open, "wait_time": wait_time,
+            "last_updated": None if updated is None else T0 + pd.Timedelta(minutes=updated),
+        }
+        for minute, park_id, ride_id, wait_time, is_open, updated in rows
+    ], columns=list(RIDE_COLUMNS)).astype(RIDE_COLUMNS)
+
+
+def test_round_trip_rebuilds_every_sample(tmp_path):
+    rides = readings(
+        [(minute, 1, 7, 10 if minute < 15 else 20, True, minute - 1) for minute in range(0, 30, 5)]
+        + [(minute, 1, 8, None, False if minute < 20 else None, None) for minute in range(0, 30, 5)]
+    )
+    archive = RideHistoryArchive.from_readings(rides)
+    path = str(tmp_path / "history.npz")
+    archive.save(path)
+    loaded = RideHistoryArchive.load(path)
+
+    # Changes only: two wait times for ride 7, two states for ride 8
+    assert loaded.run_count == 4
+    runs = loaded.runs()
+    assert runs["samples"].tolist() == [3, 3, 4, 2]
+    assert runs["wait_time"].tolist() == [10, 20, pd.NA, pd.NA]
+    assert runs["is_open"].tolist() == [True, True, False, pd.NA]
+    # Only the last last_updated of a run is kept
+    assert runs["last_updated"].tolist()[:2] == [T0 + pd.Timedelta(minutes=9), T0 + pd.Timedelta(minutes=24)]
+    assert runs["last_updated"].isna().tolist()[2:] == [True, True]
+
+    series = loaded.regular_series("5min")
+    assert len(series["times"]) == 6
+    assert series["wait_time"][0].tolist() == [10, 10, 10, 20, 20, 20]
+    assert np.isnan(series["wait_time"][1]).all()
+    assert series["state"].tolist() == [[1] * 6, [0, 0, 0, 0, 2, 2]]
+
+
+def test_a_gap_is_not_filled():
+    rides = readings([(0, 1, 7, 10, True, None), (5, 1, 7, 10, True, None), (60, 1, 7, 10, True, None)])
+    archive = RideHistoryArchive.from_readings(rides, max_gap_seconds=900)
+    assert archive.run_count == 2
+
+    series = archive.regular_series("5min")
+    assert len(series["times"]) == 13
+    assert series["state"][0].tolist() == [1, 1] + [-1] * 10 + [1]
+
+
+def test_empty_input_gives_an_empty_archive(tmp_path):
+    archive = RideHistoryArchive.from_readings(readings([]))
+    assert archive.ride_count == archive.run_count == 0
+
+    path = str(tmp_path / "history.npz")
+    archive.save(path)
+    loaded = RideHistoryArchive.load(path)
+    assert loaded.runs().empty
+    series = loaded.regular_series("5min")
+    assert len(series["times"]) == 0
+    assert series["wait_time"].shape == (0, 0)
+    # An explicit range still gives its slots, without rides
+    series = loaded.regular_series("5min", start=T0, end=T0 + pd.Timedelta(minutes=10))
+    assert series["state"].shape == (0, 3)
@@ -0,0 +1,105 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from shared.ride_series_store import RideSeriesStore
+
+T0 = datetime(2025, 11, 22, 14, 0, tzinfo=timezone.utc)
+
+
+def epoch(moment: datetime) -> int:
+    return int(moment.timestamp())
+
+
+def test_eviction_under_pressure_keeps_the_rides_of_the_batch():
+    store = RideSeriesStore(max_rides=3, window=4)
+    store.append_rides(1, [(2, 10, True), (3, 20, True), (4, 30, True)], T0)
+    later = T0 + timedelta(minutes=5)
+    store.append_rides(2, [(4, 40, True), (5, 50, True)], later)
+
+    # The two least recently updated rides make room, not a row claimed by the same batch
+    assert store.index == {(1, 4): 2, (2, 4): 0, (2, 5): 1}
+    assert store.latest(2, 4) == {"timestamp": epoch(later), "wait_time": 40, "is_open": True}
+    assert store.latest(2, 5) == {"timestamp": epoch(later), "wait_time": 50, "is_open": True}
+    assert store.latest(1, 4) == {"timestamp": epoch(T0), "wait_time": 30, "is_open": True}
+    # The evicted ride's readings are gone with it
+    assert store.recent(2, 4, seconds=3600, now=epoch(later))["wait_time"].tolist() == [40]
+
+    # A ride seen again is no longer the eviction candidate
+    store.append(1, 4, epoch(later) + 60, 35, True)
+    store.append_rides(3, [(1, 5, True)], later + timedelta(minutes=5))
+    assert (2, 4) not in store.index
+    assert set(store.index) == {(1, 4), (2, 5), (3, 1)}
+
+
+def test_batch_larger_than_the_store_keeps_the_last_rides():
+    store = RideSeriesStore(max_rides=2, window=4)
+    assert store.append_rides(1, [(1, 10, True), (2, 20, True), (3, 30, True)], T0) == 2
+    assert set(store.index) == {(1, 2), (1, 3)}
+
+
+def test_ring_buffer_and_rolling_mean():
+    store = RideSeriesStore(max_rides=2, window=3)
+    for minute, wait_time in enumerate([10, 20, 30, 40]):
+        store.append_rides(1, [(7, wait_time, True)], T0 + timedelta(minutes=minute))
+    store.append_rides(1, [(7, None, False)], T0 + timedelta(minutes=4))
+
+    now = epoch(T0 + timedelta(minutes=4))
+    readings = store.recent(1, 7, seconds=3600, now=now)
+    # Only the last `window` readings are kept, oldest first
+    assert readings["wait_time"].tolist() == [30, 40, -1]
+    assert readings["is_open"].tolist() == [True, True, False]
+    assert store.rolling_mean(1, 7, seconds=3600, now=now) == 35.0
+    assert store.rolling_mean(1, 7, seconds=30, now=now) is None
+    assert store.latest(1, 8) is None
+
+
+def test_vectorized_and_single_appends_agree():
+    batched = RideSeriesStore(max_rides=4, window=8, ewma_halflife_seconds=600)
+    single = RideSeriesStore(max_rides=4, window=8, ewma_halflife_seconds=600)
+    for minute, wait_time in [(0, 10), (5, 30), (10, None), (20, 50)]:
+        moment = T0 + timedelta(minutes=minute)
+        batched.append_rides(1, [(7, wait_time, wait_time is not None)], moment)
+        single.append(1, 7, epoch(moment), wait_time, wait_time is not None)
+
+    assert np.isclose(batched.ewma_wait(1, 7), single.ewma_wait(1, 7))
+    assert 30 < batched.ewma_wait(1, 7) < 50
+
+
+def test_snapshot_round_trip(tmp_path):
+    store = RideSeriesStore(max_rides=3, window=4)
+    store.append_rides(1, [(2, 10, True), (3, 20, True), (4, 30, True)], T0)
+    store.append_rides(1, [(2, 15, True)], T0 + timedelta(minutes=5))
+    path = str(tmp_path / "series.npz")
+    store.snapshot(path)
+
+    restored = RideSeriesStore.restore(path)
+    assert restored.index == store.index
+    assert restored.latest(1, 2) == store.latest(1, 2)
+    assert restored.ewma_wait(1, 2) == store.ewma_wait(1, 2)
+    # Eviction after a restore still picks the least recently updated ride
+    restored.append_rides(2, [(1, 5, True)], T0 + timedelta(minutes=10))
+    assert (1, 3) not in restored.index and (1, 2) in restored.index
+
+
+def test_queries_wait_for_a_write_in_progress():
+    store = RideSeriesStore(max_rides=2, window=3)
+    store.append_rides(1, [(7, 10, True)], T0)
+    results = {}
+
+    def query():
+        results["latest"] = store.latest(1, 7)
+        results["recent"] = store.recent(1, 7, seconds=3600, now=epoch(T0))
+        results["ewma"] = store.ewma_wait(1, 7)
+
+    # A writer holds the lock: the reader must not see the buffers until it is released
+    with store._lock:
+        reader = threading.Thread(target=query)
+        reader.start()
+        reader.join(timeout=0.1)
+        assert reader.is_alive() and not results
+    reader.join()
+    assert results["latest"]["wait_time"] == 10
+    assert results["recent"]["wait_time"].tolist() == [10]
+    assert results["ewma"] == 10.0
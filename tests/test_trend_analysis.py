@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from trend_analysis import (
+    anomaly_scores,
+    build_grid,
+    load_park_timezones,
+    seasonal_profile,
+    slot_cells,
+    top_anomalies,
+    week_over_week,
+)
+
+# A Monday, 12:00 UTC
+T0 = datetime(2025, 11, 24, 12, 0, tzinfo=timezone.utc)
+
+
+def readings(rows: list) -> pd.DataFrame:
+    frame = pd.DataFrame(rows, columns=["timestamp", "park_id", "ride_id", "is_open", "wait_time"])
+    return frame.astype({"park_id": "Int64", "ride_id": "Int64", "is_open": "boolean", "wait_time": "Int64"})
+
+
+def test_build_grid_averages_open_readings_per_slot():
+    grid = build_grid(readings([
+        (T0, 1, 10, True, 10),
+        (T0 + timedelta(minutes=5), 1, 10, True, 20),
+        (T0 + timedelta(minutes=10), 1, 10, False, 0),
+        (T0 + timedelta(minutes=30), 1, 10, True, 40),
+        (T0 + timedelta(minutes=30), 2, 10, True, None),
+    ]))
+
+    assert grid.park_ids.tolist() == [1, 2] and grid.ride_ids.tolist() == [10, 10]
+    assert len(grid.times) == 3 and grid.times[0] == pd.Timestamp(T0)
+    np.testing.assert_array_equal(grid.values[0], [15.0, np.nan, 40.0])
+    assert np.isnan(grid.values[1]).all()
+
+
+def test_empty_input_gives_an_empty_grid():
+    for rides in (readings([]), readings([(None, 1, 10, True, 5)])):
+        grid = build_grid(rides)
+        assert grid.values.shape == (0, 0) and len(grid.times) == 0
+
+        cells = slot_cells(grid, {1: "Europe/Paris"})
+        profile = seasonal_profile(grid, cells)
+        assert profile["mean"].shape == (0, 7, 24)
+        assert top_anomalies(grid, anomaly_scores(grid, cells, profile)).empty
+        assert week_over_week(grid).empty
+
+
+def test_cells_follow_the_park_timezone():
+    grid = build_grid(readings([(T0, 1, 10, True, 10), (T0, 2, 10, True, 10), (T0, 3, 10, True, 10)]))
+    cells = slot_cells(grid, {1: "Europe/Paris", 2: None, 3: "Not/AZone"})
+    # Monday 13:00 in Paris, 12:00 UTC for the parks without a known timezone
+    assert cells[:, 0].tolist() == [13, 12, 12]
+
+
+def test_park_timezones_from_the_parks_metadata(tmp_path):
+    path = tmp_path / "parks_metadata_cleaned.parquet"
+    pd.DataFrame({
+        "park_id": pd.array([1, 2, 2, None], dtype="Int64"),
+        "timezone": pd.array(["Europe/Paris", None, None, "Asia/Tokyo"], dtype="string"),
+        "park_name": ["A", "B", "B", "C"],
+    }).to_parquet(path, index=False)
+
+    assert load_park_timezones(str(path)) == {1: "Europe/Paris", 2: None}
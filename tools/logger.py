@@ -1,40 +1,175 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
 
-# Define path for the logs
-LOG_DIR = Path(__file__).parent.parent / "logs"
-LOG_DIR.mkdir(exist_ok=True)
+# Logging options, read from the environment since the loggers exist before any Settings
+# Folder of the log files (created with the first file written)
+LOG_DIR = Path(os.environ.get("LOG_DIR", Path(__file__).parent.parent / "logs"))
+# "sync": handlers run in the calling thread, "queue": a background thread formats and writes
+LOG_MODE = os.environ.get("LOG_MODE", "sync")
+# "text" or "json" (one object per line with the context fields)
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+# Max records per second and call site at INFO and below (0: unlimited)
+LOG_RATE_LIMIT = float(os.environ.get("LOG_RATE_LIMIT", "0"))
+# Share of the DEBUG records kept
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "1.0"))
 
-# Create logger
-def get_logger(name: str)-> logging.Logger:
-    # Create an instance of the logger
-    logger = logging.getLogger(name)
-    
-    if logger.hasHandlers():
-        return logger
-    
-    # Set the lowest level of sevirity to lowest to capture all logs
-    logger.setLevel(logging.DEBUG)
-    
-    # Define the format for the logs
-    formatter = logging.Formatter(
+# Fields (run_id, park_id...) attached to every record logged in the current task
+_log_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """Adds context fields to the records logged inside the block (per asyncio task)."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+def set_log_context(**fields: Any) -> None:
+    """Adds context fields for the rest of the current task (e.g. the run_id)."""
+    _log_context.set({**_log_context.get(), **fields})
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "context", {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Captures the context fields when the record is created (the task is unknown in the listener)."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.context = _log_context.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drops DEBUG records according to LOG_DEBUG_SAMPLE_RATE and caps the records per second
+    of each call site at INFO and below, so per-park lines cannot flood the handlers.
+    """
+    def __init__(self, rate_limit: float, debug_sample_rate: float) -> None:
+        super().__init__()
+        self.rate_limit = rate_limit
+        self.debug_sample_rate = debug_sample_rate
+        self._windows: Dict[Tuple[str, int], Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1.0 and random.random() >= self.debug_sample_rate:
+            return False
+        if not self.rate_limit:
+            return True
+
+        site = (record.pathname, record.lineno)
+        second = int(time.monotonic())
+        with self._lock:
+            window, count = self._windows.get(site, (second, 0))
+            if window != second:
+                window, count = second, 0
+            self._windows[site] = (window, count + 1)
+        return count < self.rate_limit
+
+
+class _LazyFileHandler(logging.FileHandler):
+    """Opens its file (and creates LOG_DIR) on the first record instead of at import."""
+    def __init__(self, filename: Path) -> None:
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        LOG_DIR.mkdir(exist_ok=True)
+        return super()._open()
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    def handle(self, record: logging.LogRecord) -> bool:
+        # The caller only enqueues: the SimpleQueue needs no handler lock, and the default
+        # prepare would format the message in the calling thread (the listener does it)
+        self.queue.put_nowait(record)
+        return True
+
+
+def _build_formatter() -> logging.Formatter:
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(
         fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
-    
+
+
+def _build_handlers(name: str) -> Tuple[logging.Handler, logging.Handler]:
+    formatter = _build_formatter()
+
     # Create a handler for the logs
-    file_handler = logging.FileHandler(LOG_DIR / f"{name}.log")
+    file_handler = _LazyFileHandler(LOG_DIR / f"{name}.log")
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(formatter)
-    
+
     # Create a handler for the console
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
     console_handler.setLevel(logging.INFO)
-    
+    return console_handler, file_handler
+
+
+# One listener thread for every logger of the process, started with the first queued logger
+_listener: Optional[logging.handlers.QueueListener] = None
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+
+def _get_listener() -> logging.handlers.QueueListener:
+    global _listener
+    if _listener is None:
+        # In queue mode every module logs to the same file
+        _listener = logging.handlers.QueueListener(_log_queue, *_build_handlers("pipeline"), respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+    return _listener
+
+
+# Create logger
+def get_logger(name: str, mode: Optional[str] = None)-> logging.Logger:
+    # Create an instance of the logger
+    logger = logging.getLogger(name)
+
+    if logger.hasHandlers():
+        return logger
+
+    # Set the lowest level of sevirity to lowest to capture all logs
+    logger.setLevel(logging.DEBUG)
+    logger.addFilter(RateLimitFilter(LOG_RATE_LIMIT, LOG_DEBUG_SAMPLE_RATE))
+    logger.addFilter(ContextFilter())
+
+    if (mode or LOG_MODE) == "queue":
+        # Only the enqueue happens in the calling thread, formatting and I/O run in the listener
+        _get_listener()
+        logger.addHandler(_DeferredQueueHandler(_log_queue))
+        return logger
+
     # Add the configured handlers to the logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    
-    return logger
\ No newline at end of file
+    for handler in _build_handlers(name):
+        logger.addHandler(handler)
+
+    return logger
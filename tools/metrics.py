@@ -0,0 +1,125 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import quantiles
+from typing import Any, Dict, Iterator, List
+
+# Prefix of every exported Prometheus metric
+NAMESPACE = "park_pipeline"
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    if len(values) == 1:
+        return {"p50": values[0], "p95": values[0], "p99": values[0]}
+    cuts = quantiles(values, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+class RunMetrics:
+    """
+    Collects the measurements of one pipeline run: stage wall times, latency
+    histograms and counters. Safe to update from the executor threads.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = datetime.now(timezone.utc)
+            self.stages: Dict[str, float] = {}
+            self.histograms: Dict[str, List[float]] = {}
+            self.counters: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Adds the wall time of the block to the stage (works around awaits too)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self.histograms.setdefault(name, []).append(value)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started_at": self.started_at.isoformat(),
+                "stages_seconds": dict(self.stages),
+                "histograms": {
+                    name: {"count": len(values), "sum": sum(values), **_percentiles(values)}
+                    for name, values in self.histograms.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (e.g. for the node exporter textfile collector)."""
+        report = self.report()
+        lines = [
+            f"# TYPE {NAMESPACE}_stage_seconds gauge",
+            *(f'{NAMESPACE}_stage_seconds{{stage="{name}"}} {value}' for name, value in report["stages_seconds"].items()),
+        ]
+        for name, summary in report["histograms"].items():
+            metric = f"{NAMESPACE}_{name}"
+            lines.append(f"# TYPE {metric} summary")
+            for quantile in ("p50", "p95", "p99"):
+                if quantile in summary:
+                    lines.append(f'{metric}{{quantile="0.{quantile[1:]}"}} {summary[quantile]}')
+            lines.append(f"{metric}_sum {summary['sum']}")
+            lines.append(f"{metric}_count {summary['count']}")
+        for name, value in report["counters"].items():
+            lines.append(f"# TYPE {NAMESPACE}_{name} counter")
+            lines.append(f"{NAMESPACE}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: str, suffix: str = "") -> Path:
+        """
+        Writes the JSON run report (one file per run) and the latest Prometheus file.
+        The suffix keeps the files of parallel workers apart.
+        """
+        folder = Path(directory)
+        folder.mkdir(parents=True, exist_ok=True)
+        report_path = folder / f"run_{self.started_at.strftime('%Y%m%dT%H%M%SZ')}{suffix}.json"
+        report_path.write_text(json.dumps(self.report(), indent=2))
+        (folder / f"pipeline{suffix}.prom").write_text(self.to_prometheus())
+        return report_path
+
+
+class CurrentRunMetrics:
+    """
+    Forwards to the RunMetrics of the current run (per asyncio task, like the log context),
+    so a module-level `metrics = get_metrics()` always updates the run in progress.
+    """
+    def __getattr__(self, name: str) -> Any:
+        return getattr(_run_metrics.get(), name)
+
+
+# Process-wide by default. A run started with start_run_metrics gets its own instance, which
+# tasks created during the run (e.g. a background transformation) keep after the next run starts.
+_run_metrics: contextvars.ContextVar[RunMetrics] = contextvars.ContextVar("run_metrics", default=RunMetrics())
+_metrics = CurrentRunMetrics()
+
+def get_metrics() -> CurrentRunMetrics:
+    return _metrics
+
+def start_run_metrics() -> RunMetrics:
+    """New metrics for the rest of the current task and the tasks it creates."""
+    run_metrics = RunMetrics()
+    _run_metrics.set(run_metrics)
+    return run_metrics